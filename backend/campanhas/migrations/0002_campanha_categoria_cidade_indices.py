@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campanhas', '0001_initial'),
+        ('pessoas', '0009_codigoverificacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campanha',
+            name='categoria',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='campanhas', to='pessoas.categoriainteresse'),
+        ),
+        migrations.AddField(
+            model_name='campanha',
+            name='cidade',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='campanha',
+            index=models.Index(fields=['-data_inicio', '-id'], name='campanha_inicio_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campanha',
+            index=models.Index(fields=['cidade', '-data_inicio'], name='campanha_cidade_inicio_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:08
+
+import datetime
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campanhas', '0002_campanha_categoria_cidade_indices'),
+        ('pessoas', '0012_pessoa_cpf_normalizado_unico'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='campanha',
+            options={'ordering': ['-data_inicio', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='campanha',
+            index=models.Index(fields=['organizadora', '-data_inicio', '-id'], name='campanha_org_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campanha',
+            index=models.Index(fields=['beneficiaria', '-data_inicio', '-id'], name='campanha_benef_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campanha',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('data_fim', models.Value(datetime.date(9999, 12, 31))), models.F('data_inicio'), name='campanha_ativas_idx'),
+        ),
+        migrations.AlterField(
+            model_name='campanha',
+            name='beneficiaria',
+            field=models.ForeignKey(blank=True, db_index=False, limit_choices_to={'tipo': 'beneficiaria'}, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='campanhas_beneficiaria', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='campanha',
+            name='organizadora',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='campanhas', to='campanhas.organizadora'),
+        ),
+    ]
@@ -1,5 +1,15 @@
+from datetime import date
+
 from django.db import models
-from backend.pessoas.models import Pessoa
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThanOrEqual
+from backend.pessoas.models import Pessoa, CategoriaInteresse
+
+# Fim de uma campanha sem data_fim, para que "em andamento" seja um único
+# intervalo sobre o índice campanha_ativas_idx
+FIM_EM_ABERTO = date.max
+FIM_EFETIVO = Coalesce('data_fim', Value(FIM_EM_ABERTO))
 
 class Organizadora(models.Model):
     pessoa = models.OneToOneField(
@@ -16,10 +26,12 @@ class Organizadora(models.Model):
 class Campanha(models.Model):
     titulo = models.CharField(max_length=200)
     descricao = models.TextField()
+    # Sem índice próprio: coberto pelos índices compostos do Meta
     organizadora = models.ForeignKey(
         Organizadora,
         on_delete=models.CASCADE,
-        related_name="campanhas"
+        related_name="campanhas",
+        db_index=False,
     )
     beneficiaria = models.ForeignKey(
         Pessoa,
@@ -27,10 +39,42 @@ class Campanha(models.Model):
         related_name="campanhas_beneficiaria",
         limit_choices_to={"tipo": "beneficiaria"},
         blank=True,
+        null=True,
+        db_index=False,
+    )
+    categoria = models.ForeignKey(
+        CategoriaInteresse,
+        on_delete=models.SET_NULL,
+        related_name="campanhas",
+        blank=True,
         null=True
     )
+    cidade = models.CharField(max_length=100, blank=True, default="")
     data_inicio = models.DateField()
     data_fim = models.DateField(blank=True, null=True)
 
+    class Meta:
+        # Mesma ordem da paginação por cursor e dos índices abaixo
+        ordering = ['-data_inicio', '-id']
+        indexes = [
+            # Índice da paginação por cursor (ordenação -data_inicio, -id)
+            models.Index(fields=['-data_inicio', '-id'], name='campanha_inicio_id_idx'),
+            models.Index(fields=['cidade', '-data_inicio'], name='campanha_cidade_inicio_idx'),
+            # Minhas campanhas / campanhas como beneficiária
+            models.Index(fields=['organizadora', '-data_inicio', '-id'], name='campanha_org_inicio_idx'),
+            models.Index(fields=['beneficiaria', '-data_inicio', '-id'], name='campanha_benef_inicio_idx'),
+            # Campanhas em andamento (ver filtro_ativas)
+            models.Index(FIM_EFETIVO, F('data_inicio'), name='campanha_ativas_idx'),
+        ]
+
     def __str__(self):
-        return self.titulo
\ No newline at end of file
+        return self.titulo
+
+    @staticmethod
+    def filtro_ativas(hoje):
+        """
+        Campanhas em andamento em `hoje`: já começaram e não terminaram.
+        Equivale a data_fim IS NULL OR data_fim >= hoje, escrito sobre a
+        expressão de campanha_ativas_idx para que o índice seja usado.
+        """
+        return Q(GreaterThanOrEqual(FIM_EFETIVO, hoje), data_inicio__lte=hoje)
\ No newline at end of file
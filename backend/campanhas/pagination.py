@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CampanhaCursorPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset) para listagens de campanhas.
+    Cada página é uma consulta indexada em (data_inicio, id), sem OFFSET.
+    """
+    ordering = ('-data_inicio', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
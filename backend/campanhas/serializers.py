@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import Organizadora, Campanha
 from backend.pessoas.serializers import PessoaSerializer
+from backend.doacoes.models import ResumoDoacoes
+from backend.doacoes.serializers import ResumoDoacoesSerializer
 
 class OrganizadoraSerializer(serializers.ModelSerializer):
     pessoa = PessoaSerializer(read_only=True)
@@ -34,6 +36,16 @@ class CampanhaSerializer(serializers.ModelSerializer):
         allow_null=True,
         help_text="ID da beneficiária (opcional)"
     )
+    categoria_id = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        help_text="ID da categoria de interesse da campanha (opcional)"
+    )
+    cidade = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        help_text="Cidade onde a campanha acontece (opcional)"
+    )
     titulo = serializers.CharField(
         help_text="Título da campanha"
     )
@@ -53,7 +65,8 @@ class CampanhaSerializer(serializers.ModelSerializer):
         model = Campanha
         fields = [
             'id', 'titulo', 'descricao', 'organizadora', 'organizadora_id',
-            'beneficiaria', 'beneficiaria_id', 'data_inicio', 'data_fim'
+            'beneficiaria', 'beneficiaria_id', 'categoria_id', 'cidade',
+            'data_inicio', 'data_fim'
         ]
         read_only_fields = ['id']
     
@@ -70,3 +83,81 @@ class CampanhaSerializer(serializers.ModelSerializer):
             validated_data['beneficiaria'] = beneficiaria
         
         return Campanha.objects.create(**validated_data)
+
+
+class CampanhaCardSerializer(serializers.ModelSerializer):
+    """
+    Representação compacta de campanha para listagens.
+    Não aninha perfis de Pessoa: só nome de exibição e avatar de quem organiza
+    e de quem recebe, lidos do mesmo JOIN (consultas fixas por página).
+    Os números de doações vêm de ResumoDoacoes, no mesmo JOIN; em páginas
+    servidas do cache, atualizar_resumos() os renova numa consulta.
+    """
+    organizadora_nome = serializers.SerializerMethodField()
+    organizadora_avatar = serializers.SerializerMethodField()
+    beneficiaria_nome = serializers.SerializerMethodField()
+    beneficiaria_avatar = serializers.SerializerMethodField()
+    resumo_doacoes = serializers.SerializerMethodField()
+
+    # Colunas necessárias para montar o card (usar com .only())
+    CAMPOS_CONSULTA = (
+        'id', 'titulo', 'cidade', 'categoria_id', 'data_inicio', 'data_fim',
+        'organizadora__id',
+        'organizadora__pessoa__nome_social',
+        'organizadora__pessoa__nome_completo',
+        'organizadora__pessoa__avatar',
+        'beneficiaria__nome_social',
+        'beneficiaria__nome_completo',
+        'beneficiaria__avatar',
+        *(f'resumo_doacoes__{campo}' for campo in ResumoDoacoes.CAMPOS_RESUMO),
+    )
+
+    class Meta:
+        model = Campanha
+        fields = [
+            'id', 'titulo', 'cidade', 'categoria_id', 'data_inicio', 'data_fim',
+            'organizadora_nome', 'organizadora_avatar',
+            'beneficiaria_nome', 'beneficiaria_avatar', 'resumo_doacoes',
+        ]
+        read_only_fields = fields
+
+    @classmethod
+    def otimizar_queryset(cls, queryset):
+        """Aplica o JOIN e a projeção de colunas usados pelo card"""
+        return queryset.select_related(
+            'organizadora__pessoa',
+            'beneficiaria',
+            'resumo_doacoes',
+        ).only(*cls.CAMPOS_CONSULTA)
+
+    @staticmethod
+    def atualizar_resumos(cards):
+        """Substitui os resumos de doações de cards já serializados pelos atuais"""
+        if not cards:
+            return cards
+        resumos = ResumoDoacoes.objects.in_bulk([card['id'] for card in cards])
+        for card in cards:
+            resumo = resumos.get(card['id']) or ResumoDoacoes(campanha_id=card['id'])
+            card['resumo_doacoes'] = ResumoDoacoesSerializer(resumo).data
+        return cards
+
+    @staticmethod
+    def _avatar_url(pessoa):
+        if pessoa is None or not pessoa.avatar:
+            return None
+        return pessoa.avatar.url
+
+    def get_organizadora_nome(self, obj):
+        return obj.organizadora.pessoa.nome_exibicao
+
+    def get_organizadora_avatar(self, obj):
+        return self._avatar_url(obj.organizadora.pessoa)
+
+    def get_beneficiaria_nome(self, obj):
+        return obj.beneficiaria.nome_exibicao if obj.beneficiaria else None
+
+    def get_beneficiaria_avatar(self, obj):
+        return self._avatar_url(obj.beneficiaria)
+
+    def get_resumo_doacoes(self, obj):
+        return ResumoDoacoesSerializer.para_campanha(obj)
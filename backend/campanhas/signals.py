@@ -0,0 +1,46 @@
+"""
+Invalidação do cache de campanhas a partir dos sinais dos modelos.
+Nenhuma view precisa lembrar quais chaves apagar.
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from backend.core.cache import NS_CAMPANHAS, ns_campanhas_pessoa, ns_doacoes_campanha, invalidar_apos_commit
+from .models import Organizadora, Campanha
+
+
+def _pessoa_organizadora_id(campanha):
+    if Campanha.organizadora.is_cached(campanha):
+        return campanha.organizadora.pessoa_id
+    return Organizadora.objects.filter(
+        pk=campanha.organizadora_id
+    ).values_list('pessoa_id', flat=True).first()
+
+
+@receiver(pre_save, sender=Campanha)
+def guardar_beneficiaria_anterior(sender, instance, **kwargs):
+    """Guarda a beneficiária anterior para invalidar a listagem dela se mudar"""
+    instance._beneficiaria_anterior_id = None
+    if instance.pk:
+        instance._beneficiaria_anterior_id = Campanha.objects.filter(
+            pk=instance.pk
+        ).values_list('beneficiaria_id', flat=True).first()
+
+
+@receiver(post_save, sender=Campanha)
+@receiver(post_delete, sender=Campanha)
+def invalidar_cache_campanha(sender, instance, **kwargs):
+    pessoas = {
+        _pessoa_organizadora_id(instance),
+        instance.beneficiaria_id,
+        getattr(instance, '_beneficiaria_anterior_id', None),
+    }
+    namespaces = [NS_CAMPANHAS, ns_doacoes_campanha(instance.pk)]
+    namespaces += [ns_campanhas_pessoa(pessoa_id) for pessoa_id in pessoas if pessoa_id]
+    invalidar_apos_commit(*namespaces)
+
+
+@receiver(post_save, sender=Organizadora)
+@receiver(post_delete, sender=Organizadora)
+def invalidar_cache_organizadora(sender, instance, **kwargs):
+    invalidar_apos_commit(NS_CAMPANHAS, ns_campanhas_pessoa(instance.pessoa_id))
@@ -1,3 +1,392 @@
-from django.test import TestCase
+import threading
+import time
+from collections import Counter
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from backend.core.cache import NS_PESSOAS, obter_ou_reconstruir, obter_versoes
+from backend.doacoes.models import Doacao
+from backend.pessoas.models import Pessoa, TipoUsuario, Genero, CategoriaInteresse
+from backend.pessoas.tokens import PessoaRefreshToken
+from .models import Organizadora, Campanha
+
+
+def criar_pessoa(username, tipo, genero, cpf, **extra):
+    return Pessoa.objects.create_user(
+        username=username,
+        password='senha-de-teste',
+        email=f'{username}@teste.com',
+        cpf=cpf,
+        nome_completo=f'Pessoa {username}',
+        nome_social=username,
+        tipo_usuario=tipo,
+        genero=genero,
+        **extra
+    )
+
+
+class CampanhaCardQueryCountTest(TestCase):
+    """O número de consultas das listagens não pode crescer com o tamanho da página"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doadora = TipoUsuario.objects.create(nome='Doadora')
+        cls.beneficiaria = TipoUsuario.objects.create(nome='Beneficiária')
+        genero = Genero.objects.create(nome='Outro')
+        cls.organizadora_pessoa = criar_pessoa('org', cls.doadora, genero, cpf='00000000001')
+        cls.organizadora = Organizadora.objects.create(pessoa=cls.organizadora_pessoa)
+        cls.pessoas_beneficiarias = [
+            criar_pessoa(f'benef{i}', cls.beneficiaria, genero, cpf=f'1000000000{i}')
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizadora_pessoa)
+
+    def _criar_campanhas(self, quantidade):
+        Campanha.objects.bulk_create([
+            Campanha(
+                titulo=f'Campanha {i}',
+                descricao='Descrição longa ' * 50,
+                organizadora=self.organizadora,
+                beneficiaria=self.pessoas_beneficiarias[i % len(self.pessoas_beneficiarias)],
+                data_inicio=date(2025, 1, 1 + i % 28),
+            )
+            for i in range(quantidade)
+        ])
+
+    def _contar_consultas(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        return len(contexto.captured_queries), resposta
+
+    def test_listar_campanhas_consultas_constantes(self):
+        self._criar_campanhas(3)
+        consultas_pequena, _ = self._contar_consultas('/api/campanhas/listar/?page_size=3')
+
+        self._criar_campanhas(60)
+        consultas_grande, resposta = self._contar_consultas('/api/campanhas/listar/?page_size=50')
+
+        self.assertEqual(consultas_pequena, consultas_grande)
+        self.assertEqual(len(resposta.data['results']), 50)
+
+    def test_minhas_e_beneficiaria_consultas_constantes(self):
+        self._criar_campanhas(2)
+        minhas_pequena, _ = self._contar_consultas('/api/campanhas/minhas/')
+        self._criar_campanhas(40)
+        minhas_grande, resposta = self._contar_consultas('/api/campanhas/minhas/')
+        self.assertEqual(minhas_pequena, minhas_grande)
+        self.assertEqual(len(resposta.data), 42)
+
+        self.client.force_authenticate(self.pessoas_beneficiarias[0])
+        consultas, resposta = self._contar_consultas('/api/campanhas/beneficiaria/')
+        self.assertLessEqual(consultas, 1)
+
+    def test_card_nao_expoe_dados_pessoais(self):
+        self._criar_campanhas(1)
+        _, resposta = self._contar_consultas('/api/campanhas/listar/')
+        card = resposta.data['results'][0]
+
+        self.assertEqual(card['organizadora_nome'], 'org')
+        self.assertEqual(card['beneficiaria_nome'], 'benef0')
+        self.assertNotIn('organizadora', card)
+        self.assertNotIn('descricao', card)
+        self.assertNotIn('cpf', str(card))
+
+
+class ListarCampanhasTest(TestCase):
+    """Paginação por cursor e filtros da listagem geral (cada combinação cacheada à parte)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        tipo = TipoUsuario.objects.create(nome='Doadora')
+        genero = Genero.objects.create(nome='Outro')
+        cls.pessoa = criar_pessoa('org', tipo, genero, cpf='00000000001')
+        organizadora = Organizadora.objects.create(pessoa=cls.pessoa)
+        cls.educacao = CategoriaInteresse.objects.create(nome='Educação')
+        cls.saude = CategoriaInteresse.objects.create(nome='Saúde')
+
+        def campanha(titulo, inicio, fim=None, cidade='Recife', categoria=None):
+            return Campanha.objects.create(
+                titulo=titulo, descricao='d', organizadora=organizadora, cidade=cidade,
+                categoria=categoria, data_inicio=inicio, data_fim=fim,
+            )
+
+        cls.encerrada = campanha('Encerrada', date(2025, 1, 1), date(2025, 1, 31), categoria=cls.saude)
+        cls.sem_fim = campanha('Sem fim', date(2025, 2, 1), cidade='Olinda', categoria=cls.educacao)
+        cls.ate_marco = campanha('Até março', date(2025, 2, 10), date(2025, 3, 31), categoria=cls.educacao)
+        cls.mesmo_dia = campanha('Mesmo dia', date(2025, 2, 10), cidade='Olinda')
+        cls.futura = campanha('Futura', date(2025, 6, 1))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.pessoa)
+
+    def _ids(self, url, hoje=date(2025, 3, 1)):
+        with mock.patch('backend.campanhas.views.timezone.localdate', return_value=hoje):
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        return [card['id'] for card in resposta.data['results']]
+
+    def test_cursor_percorre_todas_as_campanhas_sem_repetir(self):
+        ids = []
+        url = '/api/campanhas/listar/?page_size=2'
+        while url:
+            resposta = self.client.get(url)
+            self.assertLessEqual(len(resposta.data['results']), 2)
+            ids += [card['id'] for card in resposta.data['results']]
+            url = resposta.data['next']
+
+        # -data_inicio, -id: o desempate por id mantém a ordem estável entre páginas
+        self.assertEqual(ids, [
+            self.futura.id, self.mesmo_dia.id, self.ate_marco.id, self.sem_fim.id, self.encerrada.id,
+        ])
+
+    def test_filtros(self):
+        self.assertEqual(
+            self._ids('/api/campanhas/listar/?ativas=true'),
+            [self.mesmo_dia.id, self.ate_marco.id, self.sem_fim.id],
+        )
+        self.assertEqual(
+            self._ids('/api/campanhas/listar/?cidade=Olinda'),
+            [self.mesmo_dia.id, self.sem_fim.id],
+        )
+        self.assertEqual(
+            self._ids(f'/api/campanhas/listar/?categoria={self.educacao.id}'),
+            [self.ate_marco.id, self.sem_fim.id],
+        )
+        self.assertEqual(
+            self._ids(f'/api/campanhas/listar/?ativas=1&cidade=Recife&categoria={self.educacao.id}'),
+            [self.ate_marco.id],
+        )
+
+    def test_ativas_nao_serve_pagina_de_outro_dia(self):
+        url = '/api/campanhas/listar/?ativas=true'
+        self.assertIn(self.ate_marco.id, self._ids(url, hoje=date(2025, 3, 31)))
+        # Sem nenhuma escrita (nada invalida o cache), o dia seguinte já exclui a encerrada
+        self.assertNotIn(self.ate_marco.id, self._ids(url, hoje=date(2025, 4, 1)))
+
+
+class CampanhaCacheInvalidacaoTest(TestCase):
+    """Salvar modelos invalida as listagens cacheadas sem apagar chaves manualmente"""
+
+    @classmethod
+    def setUpTestData(cls):
+        tipo = TipoUsuario.objects.create(nome='Doadora')
+        genero = Genero.objects.create(nome='Outro')
+        cls.pessoa = criar_pessoa('org', tipo, genero, cpf='00000000001')
+        cls.outra = criar_pessoa('outra', tipo, genero, cpf='00000000002')
+        cls.organizadora = Organizadora.objects.create(pessoa=cls.pessoa)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.pessoa)
+
+    def _criar_campanha(self, titulo, **extra):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Campanha.objects.create(
+                titulo=titulo,
+                descricao='d',
+                organizadora=self.organizadora,
+                data_inicio=date(2025, 1, 1),
+                **extra
+            )
+
+    def test_nova_campanha_aparece_nas_listagens_cacheadas(self):
+        self._criar_campanha('Primeira')
+        self.assertEqual(len(self.client.get('/api/campanhas/listar/').data['results']), 1)
+        self.assertEqual(len(self.client.get('/api/campanhas/minhas/').data), 1)
+
+        self._criar_campanha('Segunda', beneficiaria=self.outra)
+        self.assertEqual(len(self.client.get('/api/campanhas/listar/').data['results']), 2)
+        self.assertEqual(len(self.client.get('/api/campanhas/minhas/').data), 2)
+
+        self.client.force_authenticate(self.outra)
+        self.assertEqual(len(self.client.get('/api/campanhas/beneficiaria/').data), 1)
+
+    def test_alterar_pessoa_invalida_cards(self):
+        self._criar_campanha('Primeira')
+        card = self.client.get('/api/campanhas/listar/').data['results'][0]
+        self.assertEqual(card['organizadora_nome'], 'org')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pessoa.nome_social = 'Novo Nome'
+            self.pessoa.save()
+
+        card = self.client.get('/api/campanhas/listar/').data['results'][0]
+        self.assertEqual(card['organizadora_nome'], 'Novo Nome')
+
+    def test_campos_fora_dos_cards_nao_invalidam(self):
+        versao = obter_versoes(NS_PESSOAS)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            criar_pessoa('nova', self.pessoa.tipo_usuario, self.pessoa.genero, cpf='00000000003')
+            self.pessoa.mini_bio = 'Outra bio'
+            self.pessoa.save()
+            self.pessoa.nome_social = 'org'
+            self.pessoa.save(update_fields=['nome_social'])
+        self.assertEqual(obter_versoes(NS_PESSOAS)[0], versao)
+
+
+class ReconstrucaoUnicaCacheTest(TransactionTestCase):
+    """
+    Teste de carga das páginas cacheadas: muitos requests simultâneos aos
+    endpoints reais na expiração do cache e o banco vê um único conjunto de
+    consultas de reconstrução, em vez de um por request.
+
+    Cada thread tem sua conexão com o banco; um execute_wrapper em cada uma
+    registra o SQL executado e segura a consulta de reconstrução até todas
+    as threads terem disparado seus requests.
+    """
+    # Abaixo da taxa 'user' (200/min): todas as threads usam a mesma pessoa
+    REQUESTS_SIMULTANEOS = 150
+
+    def setUp(self):
+        cache.clear()
+        tipo = TipoUsuario.objects.create(nome='Doadora')
+        genero = Genero.objects.create(nome='Outro')
+        self.pessoa = criar_pessoa('org', tipo, genero, cpf='00000000001')
+        organizadora = Organizadora.objects.create(pessoa=self.pessoa)
+        self.campanhas = [
+            Campanha.objects.create(
+                titulo=f'Campanha {i}', descricao='d', organizadora=organizadora, data_inicio=date(2025, 1, 1 + i),
+            )
+            for i in range(5)
+        ]
+        Doacao.objects.bulk_create([
+            Doacao(campanha=self.campanhas[0], doador=self.pessoa, tipo='roupa', descricao=f'Item {i}')
+            for i in range(10)
+        ])
+        self.sql = []
+        self.trava = threading.Lock()
+        self.todas_disparadas = threading.Event()
+        self.todas_disparadas.set()
+
+    def _registrar(self, tabela_reconstrucao):
+        def registrar(execute, sql, params, many, context):
+            with self.trava:
+                self.sql.append(sql)
+            if sql.startswith('SELECT') and f'FROM "{tabela_reconstrucao}"' in sql:
+                # Reconstrução em andamento enquanto os demais requests chegam
+                self.todas_disparadas.wait(10)
+            return execute(sql, params, many, context)
+        return registrar
+
+    def _get(self, url, tabela_reconstrucao):
+        """Um request numa conexão própria; retorna o status e o SQL executado"""
+        self.sql = []
+        with connection.execute_wrapper(self._registrar(tabela_reconstrucao)):
+            cliente = APIClient()
+            cliente.force_authenticate(self.pessoa)
+            status = cliente.get(url).status_code
+        return status, self.sql
+
+    def _disparar(self, url, tabela_reconstrucao):
+        """REQUESTS_SIMULTANEOS requests em threads; retorna (status, SQL de todos)"""
+        self.sql = []
+        self.todas_disparadas.clear()
+        status = []
+        registrar = self._registrar(tabela_reconstrucao)
+
+        def request():
+            try:
+                with connection.execute_wrapper(registrar):
+                    cliente = APIClient()
+                    cliente.force_authenticate(self.pessoa)
+                    status.append(cliente.get(url).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=request) for _ in range(self.REQUESTS_SIMULTANEOS)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        self.todas_disparadas.set()
+        for thread in threads:
+            thread.join()
+        return status, self.sql
+
+    def _medir(self, url, tabela_reconstrucao):
+        """SQL de um request com o cache vazio (reconstrução) e de um com o cache cheio"""
+        cache.clear()
+        _, reconstrucao = self._get(url, tabela_reconstrucao)
+        _, acerto = self._get(url, tabela_reconstrucao)
+        cache.clear()
+        return list(reconstrucao), list(acerto)
+
+    def _conferir(self, url, tabela_reconstrucao, expirar=None):
+        reconstrucao, acerto = self._medir(url, tabela_reconstrucao)
+        if expirar is not None:
+            self._get(url, tabela_reconstrucao)
+            expirar()
+
+        status, sql = self._disparar(url, tabela_reconstrucao)
+
+        self.assertEqual(status, [200] * self.REQUESTS_SIMULTANEOS)
+        consultas_reconstrucao = [c for c in sql if f'FROM "{tabela_reconstrucao}"' in c]
+        self.assertEqual(len(consultas_reconstrucao), 1)
+        # Um conjunto de reconstrução; os demais requests só o SQL de um acerto
+        self.assertEqual(Counter(sql), Counter(reconstrucao + acerto * (self.REQUESTS_SIMULTANEOS - 1)))
+
+    def test_listar_campanhas_cache_vazio(self):
+        self._conferir('/api/campanhas/listar/', Campanha._meta.db_table)
+
+    @override_settings(CACHE_TTL=1)
+    def test_listar_campanhas_pagina_expirada_servida_obsoleta(self):
+        self._conferir('/api/campanhas/listar/', Campanha._meta.db_table, expirar=lambda: time.sleep(1.1))
+
+    def test_primeira_pagina_de_doacoes_cache_vazio(self):
+        self._conferir(f'/api/doacoes/campanha/{self.campanhas[0].id}/', Doacao._meta.db_table)
+
+    def test_lock_expirado_nao_e_liberado_por_quem_o_perdeu(self):
+        def reconstrucao_longa():
+            # O lock venceu durante a reconstrução e outro worker o adquiriu
+            cache.delete('lock:teste_lock_token')
+            cache.add('lock:teste_lock_token', 'outro-worker', 30)
+            return {'results': [1]}
+
+        obter_ou_reconstruir('teste_lock_token', reconstrucao_longa, 60)
+        self.assertEqual(cache.get('lock:teste_lock_token'), 'outro-worker')
+
+
+class CriarCampanhaJWTTest(TestCase):
+    """O papel da pessoa vem das claims do token, sem buscar TipoUsuario/Pessoa"""
+
+    @classmethod
+    def setUpTestData(cls):
+        genero = Genero.objects.create(nome='Outro')
+        cls.doadora = criar_pessoa('doadora', TipoUsuario.objects.create(nome='Doadora'), genero, cpf='00000000001')
+        cls.beneficiaria = criar_pessoa('benef', TipoUsuario.objects.create(nome='Beneficiária'), genero, cpf='00000000002')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def _autenticar(self, pessoa):
+        token = PessoaRefreshToken.for_user(pessoa).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_somente_doadora_cria_campanha(self):
+        dados = {'titulo': 'Campanha', 'descricao': 'd', 'data_inicio': '2025-01-01'}
+
+        self._autenticar(self.beneficiaria)
+        with self.assertNumQueries(1):  # só o nome do tipo, para a mensagem de erro
+            resposta = self.client.post('/api/campanhas/criar/', dados, format='json')
+        self.assertEqual(resposta.status_code, 403)
+
+        self._autenticar(self.doadora)
+        resposta = self.client.post('/api/campanhas/criar/', dados, format='json')
+        self.assertEqual(resposta.status_code, 201)
+        self.assertTrue(resposta.data['organizadora_criada'])
+        self.assertTrue(Organizadora.objects.filter(pessoa=self.doadora).exists())
@@ -6,5 +6,6 @@ urlpatterns = [
     path('listar/', views.listar_campanhas, name='listar_campanhas'),
     path('minhas/', views.minhas_campanhas, name='minhas_campanhas'),
     path('beneficiaria/', views.campanhas_beneficiaria, name='campanhas_beneficiaria'),
+    path('<int:campanha_id>/resumo/', views.resumo_campanha, name='resumo_campanha'),
 ]
 
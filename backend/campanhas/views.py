@@ -2,15 +2,25 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 from django.core.cache import cache
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.db.models import Prefetch
 from django.conf import settings
+from django.utils import timezone
+from urllib.parse import urlencode
+import hashlib
+from backend.core.cache import (
+    NS_CAMPANHAS,
+    NS_PESSOAS,
+    ns_campanhas_pessoa,
+    chave_versionada,
+    obter_ou_reconstruir,
+)
 from .models import Organizadora, Campanha
-from .serializers import OrganizadoraSerializer, CampanhaSerializer
+from .pagination import CampanhaCursorPagination
+from .serializers import OrganizadoraSerializer, CampanhaSerializer, CampanhaCardSerializer
+from backend.doacoes.models import ResumoDoacoes
+from backend.doacoes.serializers import ResumoDoacoesSerializer
 
 @extend_schema(
     operation_id='criar_campanha',
@@ -27,44 +37,33 @@ from .serializers import OrganizadoraSerializer, CampanhaSerializer
 @permission_classes([IsAuthenticated])
 def criar_campanha(request):
     """API para criar campanha. Apenas Doadoras podem criar campanhas."""
-    from backend.pessoas.models import TipoUsuario
-    
-    # Verificar se o usuário é uma Doadora
-    try:
-        tipo_doadora = TipoUsuario.objects.get(codigo='doadora')
-        
-        if request.user.tipo_usuario != tipo_doadora:
-            return Response({
-                'error': 'Apenas Doadoras podem criar campanhas!',
-                'tipo_usuario_atual': request.user.tipo_usuario.nome,
-                'tipo_necessario': 'Doadora'
-            }, status=status.HTTP_403_FORBIDDEN)
-    except Exception as e:
+    # Verificar se o usuário é uma Doadora (código vem das claims do token)
+    if request.user.tipo_usuario_codigo != 'doadora':
         return Response({
-            'error': f'Erro ao verificar tipo de usuário: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            'error': 'Apenas Doadoras podem criar campanhas!',
+            'tipo_usuario_atual': request.user.tipo_usuario.nome,
+            'tipo_necessario': 'Doadora'
+        }, status=status.HTTP_403_FORBIDDEN)
     
     data = request.data.copy()
     
     # Criar ou obter perfil de organizadora automaticamente
-    organizadora, created = Organizadora.objects.get_or_create(
-        pessoa=request.user,
-        defaults={'ativo': True}
-    )
+    created = False
+    organizadora_id = request.user.organizadora_id
+    if organizadora_id is None:
+        organizadora, created = Organizadora.objects.get_or_create(
+            pessoa_id=request.user.id,
+            defaults={'ativo': True}
+        )
+        organizadora_id = organizadora.id
     
-    data['organizadora_id'] = organizadora.id
+    data['organizadora_id'] = organizadora_id
     
     serializer = CampanhaSerializer(data=data)
     if serializer.is_valid():
+        # O cache das listagens é invalidado pelos sinais de Campanha/Organizadora
         campanha = serializer.save()
         
-        # Invalidar cache de listagens
-        cache.delete_many([
-            'campanhas_all',
-            f'campanhas_user_{request.user.id}',
-            f'campanhas_beneficiaria_{request.user.id}'
-        ])
-        
         message = f'Campanha "{campanha.titulo}" criada com sucesso!'
         if created:
             message += ' 🎉 Você agora é uma Organizadora!'
@@ -79,37 +78,67 @@ def criar_campanha(request):
 
 @extend_schema(
     operation_id='listar_campanhas',
-    summary='Listar Todas as Campanhas',
-    description='Lista todas as campanhas do sistema com cache e otimizações.',
+    summary='Listar Campanhas',
+    description=(
+        'Lista as campanhas paginadas por cursor (mais recentes primeiro). '
+        'Cada página é cacheada separadamente.'
+    ),
     tags=['Campanhas'],
+    parameters=[
+        OpenApiParameter('cursor', OpenApiTypes.STR, description='Cursor retornado em next/previous'),
+        OpenApiParameter('page_size', OpenApiTypes.INT, description='Itens por página (máx. 100)'),
+        OpenApiParameter('ativas', OpenApiTypes.BOOL, description='Apenas campanhas em andamento'),
+        OpenApiParameter('cidade', OpenApiTypes.STR, description='Filtrar pela cidade da campanha'),
+        OpenApiParameter('categoria', OpenApiTypes.INT, description='Filtrar pelo ID da categoria'),
+    ],
     responses={
-        200: CampanhaSerializer(many=True),
+        200: CampanhaCardSerializer(many=True),
     }
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-@cache_page(settings.CACHE_TTL)  # Cache por 1 hora
 def listar_campanhas(request):
-    """API para listar campanhas com cache e otimizações"""
-    cache_key = 'campanhas_all'
-    cached_data = cache.get(cache_key)
-    
-    if cached_data is None:
-        # Query otimizada com select_related e prefetch_related
-        campanhas = Campanha.objects.select_related(
-            'organizadora__pessoa',
-            'beneficiaria'
-        ).prefetch_related(
-            'doacoes'
-        ).all()
-        
-        serializer = CampanhaSerializer(campanhas, many=True)
-        cached_data = serializer.data
-        
-        # Cache por 1 hora
-        cache.set(cache_key, cached_data, settings.CACHE_TTL)
-    
-    return Response(cached_data)
+    """API para listar campanhas com paginação por cursor e cache por página"""
+    params = request.query_params
+    filtros = {
+        chave: params.get(chave, '')
+        for chave in ('cursor', 'page_size', 'ativas', 'cidade', 'categoria')
+    }
+    ativas = filtros['ativas'].lower() in ('1', 'true')
+    hoje = timezone.localdate()
+    if ativas:
+        # "Em andamento" muda à meia-noite: a página de ontem não pode ser servida hoje
+        filtros['data'] = hoje.isoformat()
+    cache_key = chave_versionada(
+        'campanhas_pagina_' + hashlib.md5(urlencode(sorted(filtros.items())).encode()).hexdigest(),
+        NS_CAMPANHAS,
+        NS_PESSOAS,
+    )
+
+    reconstruida = []
+
+    def construir():
+        campanhas = CampanhaCardSerializer.otimizar_queryset(Campanha.objects.all())
+
+        if ativas:
+            campanhas = campanhas.filter(Campanha.filtro_ativas(hoje))
+        if filtros['cidade']:
+            campanhas = campanhas.filter(cidade=filtros['cidade'])
+        if filtros['categoria'].isdigit():
+            campanhas = campanhas.filter(categoria_id=int(filtros['categoria']))
+
+        paginator = CampanhaCursorPagination()
+        pagina = paginator.paginate_queryset(campanhas, request)
+        serializer = CampanhaCardSerializer(pagina, many=True)
+        reconstruida.append(True)
+        return paginator.get_paginated_response(serializer.data).data
+
+    # Apenas um worker reconstrói a página; os demais servem a versão anterior
+    dados = obter_ou_reconstruir(cache_key, construir, settings.CACHE_TTL)
+    if not reconstruida:
+        # Página do cache: números de doações atuais, sem invalidar a página a cada doação
+        CampanhaCardSerializer.atualizar_resumos(dados['results'])
+    return Response(dados)
 
 @extend_schema(
     operation_id='minhas_campanhas',
@@ -117,27 +146,30 @@ def listar_campanhas(request):
     description='Lista as campanhas criadas pelo usuário atual (organizadora) com cache.',
     tags=['Campanhas'],
     responses={
-        200: CampanhaSerializer(many=True),
+        200: CampanhaCardSerializer(many=True),
     }
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def minhas_campanhas(request):
     """API para listar campanhas do usuário atual com cache"""
-    cache_key = f'campanhas_user_{request.user.id}'
+    cache_key = chave_versionada(
+        f'campanhas_user_{request.user.id}',
+        ns_campanhas_pessoa(request.user.id),
+        NS_PESSOAS,
+    )
     cached_data = cache.get(cache_key)
     
     if cached_data is None:
         try:
-            organizadora = Organizadora.objects.get(pessoa=request.user)
-            campanhas = Campanha.objects.select_related(
-                'organizadora__pessoa',
-                'beneficiaria'
-            ).prefetch_related(
-                'doacoes'
-            ).filter(organizadora=organizadora)
+            organizadora_id = request.user.organizadora_id
+            if organizadora_id is None:
+                organizadora_id = Organizadora.objects.only('id').get(pessoa_id=request.user.id).id
+            campanhas = CampanhaCardSerializer.otimizar_queryset(
+                Campanha.objects.filter(organizadora_id=organizadora_id)
+            )
             
-            serializer = CampanhaSerializer(campanhas, many=True)
+            serializer = CampanhaCardSerializer(campanhas, many=True)
             cached_data = serializer.data
             
             # Cache por 30 minutos (dados do usuário mudam mais frequentemente)
@@ -149,6 +181,8 @@ def minhas_campanhas(request):
                 'campanhas': []
             }
             cache.set(cache_key, cached_data, settings.CACHE_TTL_SHORT)  # Cache curto para erro
+    elif isinstance(cached_data, list):
+        CampanhaCardSerializer.atualizar_resumos(cached_data)
     
     return Response(cached_data)
 
@@ -158,28 +192,57 @@ def minhas_campanhas(request):
     description='Lista as campanhas onde o usuário atual é beneficiária com cache.',
     tags=['Campanhas'],
     responses={
-        200: CampanhaSerializer(many=True),
+        200: CampanhaCardSerializer(many=True),
     }
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def campanhas_beneficiaria(request):
     """API para listar campanhas onde o usuário é beneficiária com cache"""
-    cache_key = f'campanhas_beneficiaria_{request.user.id}'
+    cache_key = chave_versionada(
+        f'campanhas_beneficiaria_{request.user.id}',
+        ns_campanhas_pessoa(request.user.id),
+        NS_PESSOAS,
+    )
     cached_data = cache.get(cache_key)
     
     if cached_data is None:
-        campanhas = Campanha.objects.select_related(
-            'organizadora__pessoa',
-            'beneficiaria'
-        ).prefetch_related(
-            'doacoes'
-        ).filter(beneficiaria=request.user)
+        campanhas = CampanhaCardSerializer.otimizar_queryset(
+            Campanha.objects.filter(beneficiaria_id=request.user.id)
+        )
         
-        serializer = CampanhaSerializer(campanhas, many=True)
+        serializer = CampanhaCardSerializer(campanhas, many=True)
         cached_data = serializer.data
         
         # Cache por 30 minutos
         cache.set(cache_key, cached_data, settings.CACHE_TTL_USER)
+    else:
+        CampanhaCardSerializer.atualizar_resumos(cached_data)
+    
+    return Response(cached_data)
+
+
+@extend_schema(
+    operation_id='resumo_campanha',
+    summary='Resumo de Doações da Campanha',
+    description=(
+        'Total de doações, contagem por tipo, doadores únicos e data da última '
+        'doação. Lido da tabela de resumo, sem percorrer as doações.'
+    ),
+    tags=['Campanhas'],
+    responses={
+        200: ResumoDoacoesSerializer,
+        404: OpenApiTypes.OBJECT,
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def resumo_campanha(request, campanha_id: int):
+    """API com os números agregados das doações de uma campanha"""
+    campanha = Campanha.objects.select_related('resumo_doacoes').only(
+        'id', *(f'resumo_doacoes__{campo}' for campo in ResumoDoacoes.CAMPOS_RESUMO)
+    ).filter(pk=campanha_id).first()
+    if campanha is None:
+        return Response({'error': 'Campanha não encontrada'}, status=status.HTTP_404_NOT_FOUND)
     
-    return Response(cached_data)
\ No newline at end of file
+    return Response({'campanha_id': campanha.pk, **ResumoDoacoesSerializer.para_campanha(campanha)})
\ No newline at end of file
@@ -0,0 +1,333 @@
+"""
+Cache versionado por namespace (invalidação por geração)
+
+Cada namespace (ex: 'campanhas', 'doacoes:campanha:42') tem um contador de
+versão no Redis. As chaves de cache incluem a versão atual de todos os
+namespaces de que dependem; invalidar um namespace é um único INCR, e todas
+as entradas antigas deixam de ser lidas (expiram sozinhas pelo TTL).
+
+Uso:
+    chave = chave_versionada('campanhas_pagina', NS_CAMPANHAS, NS_PESSOAS)
+    dados = obter_ou_reconstruir(chave, construir, settings.CACHE_TTL)
+    ...
+    invalidar(NS_CAMPANHAS)
+
+`obter_ou_reconstruir` protege contra "cache stampede": só um worker
+reconstrói o valor (lock no Redis via SET NX EX), os demais servem o valor
+obsoleto ou aguardam o resultado, e a reconstrução pode começar um pouco
+antes do vencimento (expiração antecipada probabilística, "XFetch").
+
+`obter_dois_niveis` adiciona um cache LRU em memória de cada processo na
+frente do Redis, para catálogos quase estáticos. A validade entre workers é
+garantida pela versão do namespace, consultada no Redis no máximo a cada
+INTERVALO_VERIFICACAO_VERSAO segundos.
+"""
+import math
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIXO_VERSAO = 'versao'
+
+# Namespaces compartilhados entre os apps
+NS_CAMPANHAS = 'campanhas'
+NS_PESSOAS = 'pessoas'
+NS_CATALOGOS = 'catalogos'
+
+
+def ns_campanhas_pessoa(pessoa_id):
+    """Listagens pessoais de campanhas (minhas / como beneficiária)"""
+    return f'campanhas:pessoa:{pessoa_id}'
+
+
+def ns_doacoes_campanha(campanha_id):
+    """Doações de uma campanha"""
+    return f'doacoes:campanha:{campanha_id}'
+
+
+def _chave_versao(namespace):
+    return f'{PREFIXO_VERSAO}:{namespace}'
+
+
+def _versao_inicial():
+    # Baseada no relógio: se o Redis descartar o contador (allkeys-lru),
+    # a nova versão nunca coincide com uma versão antiga ainda em cache
+    return int(time.time() * 1000)
+
+
+def obter_versoes(*namespaces):
+    """Retorna a versão atual de cada namespace (um único GET múltiplo)"""
+    chaves = [_chave_versao(ns) for ns in namespaces]
+    versoes = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in versoes:
+            cache.add(chave, _versao_inicial(), None)
+            versoes[chave] = cache.get(chave)
+    return [versoes[chave] for chave in chaves]
+
+
+def chave_versionada(nome, *namespaces):
+    """Monta a chave de cache de `nome` vinculada às versões dos namespaces"""
+    versoes = obter_versoes(*namespaces)
+    sufixo = ':'.join(f'{ns}@{versao}' for ns, versao in zip(namespaces, versoes))
+    return f'{nome}:{sufixo}'
+
+
+def invalidar(*namespaces):
+    """Incrementa a versão dos namespaces, invalidando todas as chaves dependentes"""
+    for namespace in namespaces:
+        _versoes_locais.pop(namespace, None)
+        chave = _chave_versao(namespace)
+        try:
+            cache.incr(chave)
+        except ValueError:
+            cache.set(chave, _versao_inicial(), None)
+
+
+def invalidar_apos_commit(*namespaces):
+    """
+    Invalida após o commit da transação atual, para que nenhum request
+    reconstrua o cache com dados ainda não commitados
+    """
+    transaction.on_commit(lambda: invalidar(*namespaces))
+
+
+# Intervalo entre leituras enquanto outro worker reconstrói um valor ausente
+INTERVALO_ESPERA = 0.05
+
+# Apaga o lock só se ainda guardar o token de quem o adquiriu
+SCRIPT_LIBERAR_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@lru_cache(maxsize=None)
+def _script_liberar_lock():
+    """Script de liberação registrado na conexão do cache padrão, ou None sem Redis"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default').register_script(SCRIPT_LIBERAR_LOCK)
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def _adquirir_lock(chave_lock, tempo_lock):
+    """SET NX EX com um token aleatório; retorna o token ou None se o lock estiver ocupado"""
+    token = secrets.token_hex(16)
+    return token if cache.add(chave_lock, token, tempo_lock) else None
+
+
+def _liberar_lock(chave_lock, token):
+    """
+    Libera o lock apenas se ainda for nosso: se `construir` demorou mais que
+    tempo_lock, o lock expirou e pode pertencer a outro worker agora
+    """
+    script = _script_liberar_lock()
+    if script is None:
+        # Sem Redis (ex: LocMemCache nos testes): sem atomicidade entre processos
+        if cache.get(chave_lock) == token:
+            cache.delete(chave_lock)
+        return
+    # Mesma chave e mesma codificação (serializer/compressor) usadas por cache.add
+    script(keys=[cache.client.make_key(chave_lock)], args=[cache.client.encode(token)])
+
+
+def _deve_reconstruir(envelope, agora, beta):
+    """
+    Expiração antecipada probabilística (XFetch): quanto mais caro o cálculo
+    (delta) e mais perto do vencimento, maior a chance de reconstruir antes
+    """
+    aleatorio = 1.0 - random.random()  # (0, 1]
+    return agora - envelope['delta'] * beta * math.log(aleatorio) >= envelope['expira_em']
+
+
+def _reconstruir(chave, construir, ttl, ttl_obsoleto):
+    inicio = time.time()
+    valor = construir()
+    fim = time.time()
+    envelope = {'valor': valor, 'expira_em': fim + ttl, 'delta': fim - inicio}
+    cache.set(chave, envelope, ttl + ttl_obsoleto)
+    return valor
+
+
+def obter_ou_reconstruir(chave, construir, ttl, ttl_obsoleto=None, beta=1.0, tempo_lock=30):
+    """
+    Lê `chave` do cache ou a reconstrói com `construir()`, garantindo que
+    apenas um worker por vez execute `construir` para a mesma chave.
+
+    Args:
+        chave (str): Chave de cache
+        construir (callable): Função sem argumentos que calcula o valor
+        ttl (int): Segundos em que o valor é considerado fresco
+        ttl_obsoleto (int): Segundos extras em que o valor obsoleto ainda é
+            servido enquanto outro worker reconstrói (padrão: igual a ttl)
+        beta (float): Agressividade da reconstrução antecipada (0 desativa)
+        tempo_lock (int): Validade do lock de reconstrução, em segundos
+    """
+    if ttl_obsoleto is None:
+        ttl_obsoleto = ttl
+    chave_lock = f'lock:{chave}'
+
+    envelope = cache.get(chave)
+    if envelope is not None and not _deve_reconstruir(envelope, time.time(), beta):
+        return envelope['valor']
+
+    limite = time.time() + tempo_lock
+    while True:
+        token = _adquirir_lock(chave_lock, tempo_lock)
+        if token is not None:
+            try:
+                # Outro worker pode ter reconstruído e liberado o lock entre
+                # a nossa leitura e a aquisição: não reconstruir de novo
+                atual = cache.get(chave)
+                if atual is not None and (envelope is None or atual['expira_em'] != envelope['expira_em']):
+                    return atual['valor']
+                return _reconstruir(chave, construir, ttl, ttl_obsoleto)
+            finally:
+                _liberar_lock(chave_lock, token)
+
+        # Outro worker está reconstruindo: servir o valor obsoleto, se houver
+        if envelope is not None:
+            return envelope['valor']
+
+        if time.time() >= limite:
+            # Lock preso além do esperado: calcular sem gravar no cache
+            return construir()
+        time.sleep(INTERVALO_ESPERA)
+        envelope = cache.get(chave)
+        if envelope is not None:
+            return envelope['valor']
+
+
+def atualizar_no_cache(chave, atualizar, ttl_obsoleto, tempo_lock=5):
+    """
+    Aplica `atualizar(valor)` ao valor gravado por obter_ou_reconstruir em
+    `chave`, sob o mesmo lock da reconstrução, mantendo o vencimento.
+
+    Retorna False se outro worker estiver com o lock (reconstruindo ou
+    atualizando): quem chama deve então invalidar o namespace da chave.
+    """
+    chave_lock = f'lock:{chave}'
+    token = _adquirir_lock(chave_lock, tempo_lock)
+    if token is None:
+        return False
+    try:
+        envelope = cache.get(chave)
+        if envelope is not None:
+            restante = math.ceil(envelope['expira_em'] - time.time()) + ttl_obsoleto
+            if restante > 0:
+                envelope['valor'] = atualizar(envelope['valor'])
+                cache.set(chave, envelope, restante)
+        return True
+    finally:
+        _liberar_lock(chave_lock, token)
+
+
+# ========== CACHE EM MEMÓRIA DO PROCESSO (SEGUNDO NÍVEL) ==========
+
+# Tempo máximo que um worker confia na versão local de um namespace
+INTERVALO_VERIFICACAO_VERSAO = 5
+
+
+class CacheLocal:
+    """Cache LRU com TTL, em memória do processo e seguro entre threads"""
+
+    def __init__(self, maximo=256):
+        self.maximo = maximo
+        self._dados = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        """Retorna (encontrado, valor)"""
+        with self._trava:
+            item = self._dados.get(chave)
+            if item is None:
+                return False, None
+            expira_em, valor = item
+            if time.monotonic() >= expira_em:
+                del self._dados[chave]
+                return False, None
+            self._dados.move_to_end(chave)
+            return True, valor
+
+    def definir(self, chave, valor, ttl):
+        with self._trava:
+            self._dados[chave] = (time.monotonic() + ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maximo:
+                self._dados.popitem(last=False)
+
+    def limpar(self):
+        with self._trava:
+            self._dados.clear()
+
+
+cache_local = CacheLocal()
+
+# namespace -> (versão, instante da última consulta ao Redis)
+_versoes_locais = {}
+
+
+def _versao_recente(namespace):
+    agora = time.monotonic()
+    registro = _versoes_locais.get(namespace)
+    if registro is not None and agora - registro[1] < INTERVALO_VERIFICACAO_VERSAO:
+        return registro[0]
+    versao = obter_versoes(namespace)[0]
+    _versoes_locais[namespace] = (versao, agora)
+    return versao
+
+
+def obter_dois_niveis(nome, namespace, construir, ttl, preparar=None):
+    """
+    Lê `nome` do cache em memória do processo e, se ausente, do Redis
+    (via obter_ou_reconstruir). O valor fica vinculado à versão de `namespace`.
+
+    Args:
+        nome (str): Nome base da chave
+        namespace (str): Namespace cuja versão invalida o valor
+        construir (callable): Calcula o valor serializável guardado no Redis
+        ttl (int): Validade em segundos (nos dois níveis)
+        preparar (callable): Transformação opcional aplicada uma única vez
+            antes de guardar em memória (ex: montar instâncias de modelo)
+    """
+    chave = f'{nome}:{namespace}@{_versao_recente(namespace)}'
+    encontrado, valor = cache_local.obter(chave)
+    if encontrado:
+        return valor
+
+    valor = obter_ou_reconstruir(chave, construir, ttl)
+    if preparar is not None:
+        valor = preparar(valor)
+    cache_local.definir(chave, valor, ttl)
+    return valor
+
+
+async def aobter_dois_niveis(nome, namespace, construir, ttl, preparar=None):
+    """
+    Versão async de obter_dois_niveis: um acerto no cache em memória com a
+    versão do namespace recente não sai do event loop; só a consulta da
+    versão e a leitura/reconstrução no Redis rodam numa thread.
+    """
+    registro = _versoes_locais.get(namespace)
+    if registro is not None and time.monotonic() - registro[1] < INTERVALO_VERIFICACAO_VERSAO:
+        encontrado, valor = cache_local.obter(f'{nome}:{namespace}@{registro[0]}')
+        if encontrado:
+            return valor
+    return await sync_to_async(obter_dois_niveis)(nome, namespace, construir, ttl, preparar)
+
+
+def limpar_cache_local():
+    """Descarta o cache em memória do processo (útil em testes)"""
+    cache_local.limpar()
+    _versoes_locais.clear()
@@ -0,0 +1,65 @@
+"""
+Middlewares de sessão, CSRF, autenticação e mensagens que não rodam na API
+
+A API autentica só por JWT (PessoaJWTAuthentication): sessão, cookie CSRF,
+request.user do Django e mensagens não são usados em /api/. Estas subclasses
+mantêm o comportamento original no admin e ignoram os caminhos que começam
+com settings.API_PREFIXO (nenhuma leitura de sessão no Redis por request).
+"""
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+
+
+def eh_requisicao_api(request):
+    return request.path_info.startswith(settings.API_PREFIXO)
+
+
+class SessionForaDaApiMiddleware(SessionMiddleware):
+
+    def process_request(self, request):
+        if not eh_requisicao_api(request):
+            super().process_request(request)
+
+    def process_response(self, request, response):
+        if eh_requisicao_api(request):
+            return response
+        return super().process_response(request, response)
+
+
+class CsrfForaDaApiMiddleware(CsrfViewMiddleware):
+
+    def process_request(self, request):
+        if not eh_requisicao_api(request):
+            super().process_request(request)
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if eh_requisicao_api(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+    def process_response(self, request, response):
+        if eh_requisicao_api(request):
+            return response
+        return super().process_response(request, response)
+
+
+class AuthenticationForaDaApiMiddleware(AuthenticationMiddleware):
+
+    def process_request(self, request):
+        if not eh_requisicao_api(request):
+            super().process_request(request)
+
+
+class MessageForaDaApiMiddleware(MessageMiddleware):
+
+    def process_request(self, request):
+        if not eh_requisicao_api(request):
+            super().process_request(request)
+
+    def process_response(self, request, response):
+        if eh_requisicao_api(request):
+            return response
+        return super().process_response(request, response)
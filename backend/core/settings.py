@@ -2,7 +2,7 @@ DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
 # Configurações do drf-spectacular para exibir endpoints JWT no Swagger
 SPECTACULAR_SETTINGS = {
     "AUTHENTICATION_WHITELIST": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "backend.pessoas.authentication.PessoaJWTAuthentication",
     ],
     "COMPONENTS": {
         "securitySchemes": {
@@ -19,7 +19,7 @@ SPECTACULAR_SETTINGS = {
     "SERVE_INCLUDE_SCHEMA": False,
     "SERVE_PERMISSIONS": ["rest_framework.permissions.AllowAny"],
     "SERVE_AUTHENTICATION": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "backend.pessoas.authentication.PessoaJWTAuthentication",
     ],
     "SWAGGER_UI_SETTINGS": {
         "persistAuthorization": True,
@@ -41,6 +41,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -78,13 +79,17 @@ INSTALLED_APPS = [
 
 ]
 
+# Sessão, CSRF, autenticação do Django e mensagens só rodam fora da API
+# (admin); em /api/ a autenticação é apenas JWT (ver backend/core/middleware.py)
+API_PREFIXO = '/api/'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'backend.core.middleware.SessionForaDaApiMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'backend.core.middleware.CsrfForaDaApiMiddleware',
+    'backend.core.middleware.AuthenticationForaDaApiMiddleware',
+    'backend.core.middleware.MessageForaDaApiMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -157,9 +162,10 @@ SESSION_COOKIE_AGE = 3600  # 1 hora
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-        "rest_framework.authentication.SessionAuthentication",
-        "rest_framework.authentication.BasicAuthentication",
+        # Apenas JWT: request.user montado das claims do token, sem SELECT em
+        # Pessoa nem leitura de sessão; Basic (hash de senha por request) e
+        # Session (sem middleware de sessão em /api/) ficam de fora
+        "backend.pessoas.authentication.PessoaJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -170,14 +176,20 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 20,
     "PAGE_SIZE_QUERY_PARAM": "page_size",
     "MAX_PAGE_SIZE": 100,
-    # Throttling para controlar requests
+    # Throttling para controlar requests (GCRA no Redis, ver core/throttling.py)
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "backend.core.throttling.AnonGCRAThrottle",
+        "backend.core.throttling.UserGCRAThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "anon": "100/min",
         "user": "200/min",
+        # Endpoints que enviam códigos ou conferem senhas (THROTTLES_OTP)
+        "otp_ip": "60/hour",
+        "otp_email": "10/hour",
+        "otp_email_tipo": "5/hour",
+        # Login (THROTTLES_LOGIN), separado dos endpoints de código
+        "login_email_ip": "10/hour",
     },
     # Renderers otimizados
     "DEFAULT_RENDERER_CLASSES": [
@@ -201,6 +213,54 @@ SPECTACULAR_SETTINGS = {
 
 AUTH_USER_MODEL = "pessoas.Pessoa"
 
+# Email ou username (admin, /api/token/), sempre com a senha conferida no pool
+# de hash; sem ModelBackend depois, que repetiria o hash na thread do request
+AUTHENTICATION_BACKENDS = [
+    'backend.pessoas.backends.EmailBackend',
+]
+
+
+
+# JWT: tokens emitidos em /api/token/ também levam as claims da pessoa
+SIMPLE_JWT = {
+    "TOKEN_OBTAIN_SERIALIZER": "backend.pessoas.tokens.PessoaTokenObtainPairSerializer",
+}
+
+# Hash de senhas: perfis selecionáveis por PERFIL_HASH_SENHA. O primeiro
+# hasher do perfil é usado nas senhas novas; os demais só reconhecem hashes
+# antigos, que são refeitos no perfil atual no próximo login.
+PERFIS_HASH_SENHA = {
+    'argon2': [
+        'backend.pessoas.hashers.Argon2PasswordHasher',
+        'backend.pessoas.hashers.PBKDF2PasswordHasher',
+        'backend.pessoas.hashers.BCryptSHA256PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ],
+    'bcrypt': [
+        'backend.pessoas.hashers.BCryptSHA256PasswordHasher',
+        'backend.pessoas.hashers.PBKDF2PasswordHasher',
+        'backend.pessoas.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ],
+    'pbkdf2': [
+        'backend.pessoas.hashers.PBKDF2PasswordHasher',
+        'backend.pessoas.hashers.Argon2PasswordHasher',
+        'backend.pessoas.hashers.BCryptSHA256PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ],
+}
+PERFIL_HASH_SENHA = 'argon2'
+PASSWORD_HASHERS = PERFIS_HASH_SENHA[PERFIL_HASH_SENHA]
+
+# Custo de cada algoritmo (ver `manage.py benchmark_senhas` para logins/s por núcleo)
+SENHA_HASH_CUSTO = {
+    'argon2': {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1},  # 19 MiB
+    'bcrypt': {'rounds': 12},
+    'pbkdf2': {'iterations': 1_000_000},
+}
+
+# Hashes simultâneos por processo (pool de threads de backend.pessoas.senhas)
+SENHA_HASH_THREADS = os.cpu_count() or 2
 
 
 # Password validation
@@ -272,3 +332,18 @@ SERVER_EMAIL = 'admin@conectades.com'
 # Configurações adicionais de email
 EMAIL_TIMEOUT = 10  # segundos
 EMAIL_USE_LOCALTIME = True
+
+# Fila de envio (outbox) consumida por `manage.py enviar_emails`
+# Para testar com um SMTP local: EMAIL_BACKEND smtp + EMAIL_HOST='localhost',
+# EMAIL_PORT=1025 e `python -m aiosmtpd -n -l localhost:1025`
+EMAIL_FILA_LOTE = 50  # emails por conexão SMTP
+EMAIL_FILA_MAX_TENTATIVAS = 5
+EMAIL_FILA_BACKOFF_BASE = 30  # segundos; dobra a cada falha
+EMAIL_FILA_TEMPO_RESERVA = 300  # segundos até um lote reservado voltar para a fila
+EMAIL_FILA_INTERVALO = 2  # segundos entre consultas à fila no modo contínuo
+
+# Códigos de verificação: Redis (TTL nativo, sem escrita no banco) ou banco
+# ('backend.pessoas.codigos.BancoCodigoStore')
+CODIGO_VERIFICACAO_STORE = 'backend.pessoas.codigos.RedisCodigoStore'
+# Com o store Redis, também grava os códigos em CodigoVerificacao para auditoria
+CODIGO_VERIFICACAO_AUDITORIA = False
@@ -0,0 +1,185 @@
+"""
+Throttles GCRA (Generic Cell Rate Algorithm) no Redis
+
+Os throttles padrão do DRF guardam a lista de timestamps de cada chave no
+cache e a regravam a cada request (custo O(n) em CPU e em payload). Aqui cada
+chave é um único número, o "TAT" (instante teórico da próxima chegada),
+atualizado atomicamente por um script Lua: O(1) por request e sem corrida
+entre workers. Com taxa N/período, o cliente pode fazer uma rajada de N
+requests e depois um a cada período/N.
+
+Além dos escopos por IP (anon) e por usuário (user), os endpoints que enviam
+códigos ou redefinem senhas usam THROTTLES_OTP, com limites por IP, por email
+de destino e por email + tipo do código: um mesmo inbox não pode ser inundado
+a partir de muitos IPs. O login usa THROTTLES_LOGIN (por IP e por email + IP):
+tentativas erradas de terceiros não esgotam o limite de login nem o da
+recuperação de senha da dona do email.
+
+Sem Redis (ex: testes com LocMemCache), o mesmo algoritmo roda sobre o cache
+do Django, sem a garantia de atomicidade.
+"""
+import math
+import time
+from functools import lru_cache
+
+from django.core.cache import cache
+from rest_framework.throttling import AnonRateThrottle, SimpleRateThrottle, UserRateThrottle
+
+# Retorna '0' se o request é permitido ou os segundos de espera
+SCRIPT_GCRA = """
+local t = redis.call('TIME')
+local agora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local intervalo = tonumber(ARGV[1])
+local periodo = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tat < agora then
+    tat = agora
+end
+local novo = tat + intervalo
+local excesso = novo - agora - periodo
+if excesso > 0 then
+    return tostring(excesso)
+end
+redis.call('SET', KEYS[1], tostring(novo), 'PX', math.ceil((novo - agora) * 1000))
+return '0'
+"""
+
+
+@lru_cache(maxsize=None)
+def _script_redis():
+    """Script GCRA registrado na conexão do cache padrão, ou None sem Redis"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default').register_script(SCRIPT_GCRA)
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def _gcra_cache(chave, intervalo, periodo):
+    agora = time.time()
+    tat = max(cache.get(chave, 0), agora)
+    novo = tat + intervalo
+    excesso = novo - agora - periodo
+    if excesso > 0:
+        return excesso
+    cache.set(chave, novo, math.ceil(novo - agora))
+    return 0.0
+
+
+def consumir(chave, num_requests, duracao):
+    """
+    Registra um request na chave com taxa num_requests/duracao.
+
+    Returns:
+        float: 0 se permitido, senão os segundos até o próximo permitido
+    """
+    intervalo = duracao / num_requests
+    script = _script_redis()
+    if script is None:
+        return _gcra_cache(chave, intervalo, duracao)
+    # Mesmo prefixo/versão das demais chaves do cache (KEY_PREFIX, VERSION)
+    return float(script(keys=[cache.client.make_key(chave)], args=[intervalo, duracao]))
+
+
+class GCRAThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle com estado O(1) por chave (taxas em DEFAULT_THROTTLE_RATES)"""
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.espera = consumir(self.key, self.num_requests, self.duration)
+        return self.espera == 0
+
+    def wait(self):
+        return self.espera
+
+
+class AnonGCRAThrottle(GCRAThrottle, AnonRateThrottle):
+    """Anônimos, por IP (escopo 'anon')"""
+
+
+class UserGCRAThrottle(GCRAThrottle, UserRateThrottle):
+    """Autenticados, por usuário; anônimos por IP (escopo 'user')"""
+
+
+# Tamanho máximo de um email (RFC 5321): limita o tamanho das chaves de cache
+TAMANHO_MAXIMO_EMAIL = 254
+
+
+def _email_do_request(request):
+    dados = request.data
+    if not hasattr(dados, 'get'):
+        return None
+    email = str(dados.get('email') or '').strip().lower()[:TAMANHO_MAXIMO_EMAIL]
+    return email or None
+
+
+@lru_cache(maxsize=None)
+def _tipos_codigo():
+    from backend.pessoas.models import CodigoVerificacao
+    return frozenset(valor for valor, _ in CodigoVerificacao._meta.get_field('tipo').choices)
+
+
+def _tipo_do_request(request):
+    """
+    Tipo do código: do corpo apenas em solicitar_codigo (e só se for um tipo
+    válido); nos demais endpoints, o nome da rota. Assim o cliente não cria
+    um balde novo a cada request trocando o tipo.
+    """
+    rota = request.resolver_match.url_name
+    if rota == 'solicitar_codigo':
+        tipo = request.data.get('tipo')
+        if tipo in _tipos_codigo():
+            return tipo
+    return rota
+
+
+class OTPIPThrottle(GCRAThrottle):
+    """Endpoints de código/senha, por IP"""
+    scope = 'otp_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class OTPEmailThrottle(GCRAThrottle):
+    """Endpoints de código/senha, por email de destino (qualquer IP)"""
+    scope = 'otp_email'
+
+    def get_cache_key(self, request, view):
+        email = _email_do_request(request)
+        if email is None:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': email}
+
+
+class OTPEmailTipoThrottle(GCRAThrottle):
+    """Endpoints de código/senha, por email + tipo (ver _tipo_do_request)"""
+    scope = 'otp_email_tipo'
+
+    def get_cache_key(self, request, view):
+        email = _email_do_request(request)
+        if email is None:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': f'{email}:{_tipo_do_request(request)}'}
+
+
+class LoginEmailIPThrottle(GCRAThrottle):
+    """Login, por email + IP: quem erra a senha de outra pessoa só esgota o próprio balde"""
+    scope = 'login_email_ip'
+
+    def get_cache_key(self, request, view):
+        email = _email_do_request(request)
+        if email is None:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': f'{email}:{self.get_ident(request)}'}
+
+
+THROTTLES_OTP = [OTPIPThrottle, OTPEmailThrottle, OTPEmailTipoThrottle]
+THROTTLES_LOGIN = [OTPIPThrottle, LoginEmailIPThrottle]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DoacoesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend.doacoes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def preencher_resumos(apps, schema_editor):
+    """Calcula os resumos das doações que já existem (uma agregação por campanha)"""
+    Doacao = apps.get_model('doacoes', 'Doacao')
+    ResumoDoacoes = apps.get_model('doacoes', 'ResumoDoacoes')
+    tipos = ['alimento', 'roupa', 'brinquedo', 'servico', 'outro']
+
+    linhas = Doacao.objects.values('campanha_id').annotate(
+        total=Count('id'),
+        doadores_unicos=Count('doador_id', distinct=True),
+        ultima_doacao=Max('data_doacao'),
+        **{f'total_{tipo}': Count('id', filter=Q(tipo=tipo)) for tipo in tipos},
+    ).order_by()
+    ResumoDoacoes.objects.bulk_create(
+        [ResumoDoacoes(**linha) for linha in linhas.iterator(chunk_size=2000)],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campanhas', '0002_campanha_categoria_cidade_indices'),
+        ('doacoes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoDoacoes',
+            fields=[
+                ('campanha', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumo_doacoes', serialize=False, to='campanhas.campanha')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('total_alimento', models.PositiveIntegerField(default=0)),
+                ('total_roupa', models.PositiveIntegerField(default=0)),
+                ('total_brinquedo', models.PositiveIntegerField(default=0)),
+                ('total_servico', models.PositiveIntegerField(default=0)),
+                ('total_outro', models.PositiveIntegerField(default=0)),
+                ('doadores_unicos', models.PositiveIntegerField(default=0)),
+                ('ultima_doacao', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
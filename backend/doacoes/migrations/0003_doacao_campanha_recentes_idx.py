@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campanhas', '0002_campanha_categoria_cidade_indices'),
+        ('doacoes', '0002_resumodoacoes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doacao',
+            index=models.Index(fields=['campanha', '-data_doacao', '-id'], name='doacao_campanha_recentes_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campanhas', '0003_campanha_indices_ativas_organizadora'),
+        ('doacoes', '0003_doacao_campanha_recentes_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='doacao',
+            options={'ordering': ['-data_doacao', '-id']},
+        ),
+        migrations.AlterField(
+            model_name='doacao',
+            name='campanha',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='doacoes', to='campanhas.campanha'),
+        ),
+    ]
@@ -11,11 +11,53 @@ class Doacao(models.Model):
         ("outro", "Outro"),
     ]
 
-    campanha = models.ForeignKey(Campanha, on_delete=models.CASCADE, related_name="doacoes")
+    # Sem índice próprio: coberto por doacao_campanha_recentes_idx
+    campanha = models.ForeignKey(Campanha, on_delete=models.CASCADE, related_name="doacoes", db_index=False)
     doador = models.ForeignKey(Pessoa, on_delete=models.CASCADE, related_name="doacoes")
     tipo = models.CharField(max_length=50, choices=TIPOS_DOACAO)
     descricao = models.TextField(blank=True, null=True)
     data_doacao = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Mesma ordem da paginação por cursor e de doacao_campanha_recentes_idx
+        ordering = ["-data_doacao", "-id"]
+        indexes = [
+            # Listagem por campanha, mais recentes primeiro (paginação por cursor)
+            models.Index(fields=["campanha", "-data_doacao", "-id"], name="doacao_campanha_recentes_idx"),
+        ]
+
     def __str__(self):
         return f"{self.tipo} - {self.doador.username}"
+
+
+class ResumoDoacoes(models.Model):
+    """
+    Contadores de doações por campanha, mantidos incrementalmente na mesma
+    transação que cria ou remove a doação (ver resumo.py): ler os números de
+    uma campanha é uma busca pela chave primária, sem varrer Doacao.
+    """
+    campanha = models.OneToOneField(
+        Campanha,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="resumo_doacoes",
+    )
+    total = models.PositiveIntegerField(default=0)
+    total_alimento = models.PositiveIntegerField(default=0)
+    total_roupa = models.PositiveIntegerField(default=0)
+    total_brinquedo = models.PositiveIntegerField(default=0)
+    total_servico = models.PositiveIntegerField(default=0)
+    total_outro = models.PositiveIntegerField(default=0)
+    doadores_unicos = models.PositiveIntegerField(default=0)
+    ultima_doacao = models.DateTimeField(blank=True, null=True)
+
+    # Coluna de contagem de cada Doacao.TIPOS_DOACAO
+    CAMPO_POR_TIPO = {tipo: f"total_{tipo}" for tipo, _ in Doacao.TIPOS_DOACAO}
+    CAMPOS_RESUMO = ("total", *CAMPO_POR_TIPO.values(), "doadores_unicos", "ultima_doacao")
+
+    def __str__(self):
+        return f"Resumo de doações - campanha {self.campanha_id}"
+
+    @property
+    def por_tipo(self):
+        return {tipo: getattr(self, campo) for tipo, campo in self.CAMPO_POR_TIPO.items()}
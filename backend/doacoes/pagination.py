@@ -0,0 +1,33 @@
+from rest_framework.pagination import CursorPagination
+
+
+class DoacaoCursorPagination(CursorPagination):
+    """
+    Paginação por cursor das doações de uma campanha, mais recentes primeiro.
+    Cada página é uma consulta no índice (campanha, data_doacao, id), sem OFFSET.
+    """
+    ordering = ('-data_doacao', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginar_lista(self, itens, request):
+        """
+        Primeira página a partir de uma lista já serializada e ordenada (ex:
+        as doações recentes em cache). `itens` precisa ter ao menos
+        page_size + 1 elementos quando houver próxima página, para que o
+        cursor seguinte seja calculado como em paginate_queryset.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = None
+        self.page = list(itens[:self.page_size])
+        self.has_next = len(itens) > self.page_size
+        self.has_previous = False
+        self.next_position = (
+            self._get_position_from_instance(itens[self.page_size], self.ordering)
+            if self.has_next else None
+        )
+        self.previous_position = None
+        return self.page
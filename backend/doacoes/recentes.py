@@ -0,0 +1,63 @@
+"""
+Cache das doações mais recentes de cada campanha (primeira página)
+
+Guarda as max_page_size + 1 doações mais novas já serializadas; qualquer
+page_size da primeira página sai dessa lista, e o item extra dá o cursor da
+próxima página. Uma doação nova é inserida na lista em cache depois do
+commit, em vez de invalidá-la: a campanha não reconstrói a página a cada
+doação. Remoções e edições (raras) continuam invalidando o namespace.
+"""
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from backend.core.cache import (
+    ns_doacoes_campanha,
+    chave_versionada,
+    obter_ou_reconstruir,
+    atualizar_no_cache,
+    invalidar,
+)
+from .models import Doacao
+from .pagination import DoacaoCursorPagination
+from .serializers import DoacaoSerializer
+
+TAMANHO_LISTA = DoacaoCursorPagination.max_page_size + 1
+
+
+def _chave(campanha_id):
+    return chave_versionada(f'doacoes_campanha_{campanha_id}_recentes', ns_doacoes_campanha(campanha_id))
+
+
+def _ordem(item):
+    return parse_datetime(item['data_doacao']), item['id']
+
+
+def obter_recentes(campanha_id):
+    """Doações mais recentes da campanha, serializadas, do cache ou do banco"""
+    def construir():
+        doacoes = DoacaoSerializer.otimizar_queryset(
+            Doacao.objects.filter(campanha_id=campanha_id)
+        ).order_by(*DoacaoCursorPagination.ordering)[:TAMANHO_LISTA]
+        return list(DoacaoSerializer(doacoes, many=True).data)
+
+    return obter_ou_reconstruir(_chave(campanha_id), construir, settings.CACHE_TTL_SHORT)
+
+
+def inserir_nas_recentes(doacoes):
+    """
+    Insere doações já commitadas nas listas em cache das suas campanhas.
+    Se a lista estiver sendo reconstruída ou atualizada por outro worker, a
+    reconstrução pode não enxergar estas doações: invalida a campanha.
+    """
+    por_campanha = {}
+    for doacao in doacoes:
+        por_campanha.setdefault(doacao.campanha_id, []).append(dict(DoacaoSerializer(doacao).data))
+
+    for campanha_id, novas in por_campanha.items():
+        def atualizar(itens, novas=novas):
+            ids = {item['id'] for item in novas}
+            itens = novas + [item for item in itens if item['id'] not in ids]
+            return sorted(itens, key=_ordem, reverse=True)[:TAMANHO_LISTA]
+
+        if not atualizar_no_cache(_chave(campanha_id), atualizar, settings.CACHE_TTL_SHORT):
+            invalidar(ns_doacoes_campanha(campanha_id))
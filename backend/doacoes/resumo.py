@@ -0,0 +1,84 @@
+"""
+Manutenção incremental de ResumoDoacoes
+
+Cada doação criada soma 1 ao total e à coluna do seu tipo com um UPDATE de
+expressões F (ou cria a linha do resumo, se for a primeira da campanha). O
+UPDATE trava a linha até o commit, então a checagem de "doador novo" que
+vem em seguida enxerga as doações já confirmadas por transações
+concorrentes da mesma campanha.
+
+Deve rodar dentro da transação que grava as doações (as views usam
+transaction.atomic); os sinais de Doacao chamam estas funções.
+"""
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Doacao, ResumoDoacoes
+
+
+def _somar(campanha_id, contagens):
+    """
+    Aplica os incrementos de `contagens` (campo -> quantidade) e atualiza
+    ultima_doacao; cria a linha do resumo se ainda não existir
+    """
+    ultima = contagens.pop('ultima_doacao')
+    atualizacao = {campo: F(campo) + quantidade for campo, quantidade in contagens.items()}
+    atualizacao['ultima_doacao'] = Greatest(Coalesce('ultima_doacao', Value(ultima)), Value(ultima))
+
+    if ResumoDoacoes.objects.filter(campanha_id=campanha_id).update(**atualizacao):
+        return
+    try:
+        with transaction.atomic():
+            ResumoDoacoes.objects.create(campanha_id=campanha_id, ultima_doacao=ultima, **contagens)
+    except IntegrityError:
+        # Outra transação criou o resumo ao mesmo tempo
+        ResumoDoacoes.objects.filter(campanha_id=campanha_id).update(**atualizacao)
+
+
+def registrar_doacoes(doacoes):
+    """
+    Soma doações recém-criadas aos resumos (um UPDATE por campanha, em ordem
+    crescente de campanha_id)
+    """
+    por_campanha = defaultdict(list)
+    for doacao in doacoes:
+        por_campanha[doacao.campanha_id].append(doacao)
+
+    # Ordem fixa de travamento das linhas de resumo: dois lotes concorrentes
+    # com as mesmas campanhas em ordens diferentes não entram em deadlock
+    for campanha_id in sorted(por_campanha):
+        novas = por_campanha[campanha_id]
+        contagens = Counter(ResumoDoacoes.CAMPO_POR_TIPO[doacao.tipo] for doacao in novas)
+        contagens['total'] = len(novas)
+        contagens['ultima_doacao'] = max(doacao.data_doacao for doacao in novas)
+        _somar(campanha_id, contagens)
+
+        # Doadores sem doação anterior nesta campanha (linha do resumo já travada)
+        doadores = {doacao.doador_id for doacao in novas}
+        anteriores = set(
+            Doacao.objects.filter(campanha_id=campanha_id, doador_id__in=doadores)
+            .exclude(pk__in=[doacao.pk for doacao in novas])
+            .values_list('doador_id', flat=True).order_by().distinct()
+        )
+        novos = len(doadores - anteriores)
+        if novos:
+            ResumoDoacoes.objects.filter(campanha_id=campanha_id).update(
+                doadores_unicos=F('doadores_unicos') + novos
+            )
+
+
+def remover_doacao(doacao):
+    """Desconta uma doação removida do resumo da campanha"""
+    resumo = ResumoDoacoes.objects.filter(campanha_id=doacao.campanha_id)
+    campo = ResumoDoacoes.CAMPO_POR_TIPO[doacao.tipo]
+    if not resumo.filter(total__gt=0).update(total=F('total') - 1, **{campo: F(campo) - 1}):
+        return  # campanha removida (cascata) ou resumo inexistente
+
+    restantes = Doacao.objects.filter(campanha_id=doacao.campanha_id)
+    if not restantes.filter(doador_id=doacao.doador_id).exists():
+        resumo.update(doadores_unicos=F('doadores_unicos') - 1)
+    if resumo.filter(ultima_doacao__lte=doacao.data_doacao).exists():
+        resumo.update(ultima_doacao=restantes.aggregate(ultima=Max('data_doacao'))['ultima'])
@@ -1,11 +1,17 @@
 from rest_framework import serializers
-from .models import Doacao
+from backend.campanhas.models import Campanha
+from backend.pessoas.models import Pessoa
+from .models import Doacao, ResumoDoacoes
 
 
 class DoacaoSerializer(serializers.ModelSerializer):
     doador_id = serializers.IntegerField(write_only=True, help_text="ID do doador (preenchido automaticamente)")
     campanha_id = serializers.IntegerField(write_only=True, help_text="ID da campanha")
 
+    # Colunas lidas na listagem (usar com .only()): campanha e doador saem
+    # como chaves primárias, sem JOIN
+    CAMPOS_CONSULTA = ('id', 'campanha_id', 'doador_id', 'tipo', 'descricao', 'data_doacao')
+
     class Meta:
         model = Doacao
         fields = ['id', 'campanha', 'campanha_id', 'doador', 'doador_id', 'tipo', 'descricao', 'data_doacao']
@@ -20,9 +26,96 @@ class DoacaoSerializer(serializers.ModelSerializer):
 
         return Doacao.objects.create(**validated_data)
 
+    @classmethod
+    def otimizar_queryset(cls, queryset):
+        """Aplica a projeção de colunas usada na listagem"""
+        return queryset.only(*cls.CAMPOS_CONSULTA)
+
+
+class DoacaoComDoadorSerializer(DoacaoSerializer):
+    """Doação com o nome de exibição do doador (?expandir=doador)"""
+    doador_nome = serializers.SerializerMethodField()
+
+    CAMPOS_CONSULTA = (
+        *DoacaoSerializer.CAMPOS_CONSULTA,
+        'doador__nome_social',
+        'doador__nome_completo',
+    )
+
+    class Meta(DoacaoSerializer.Meta):
+        fields = [*DoacaoSerializer.Meta.fields, 'doador_nome']
+
+    @classmethod
+    def otimizar_queryset(cls, queryset):
+        """Um JOIN com Pessoa trazendo apenas as colunas do nome"""
+        return queryset.select_related('doador').only(*cls.CAMPOS_CONSULTA)
+
+    @staticmethod
+    def expandir_doadores(itens):
+        """Acrescenta doador_nome a doações já serializadas (uma consulta)"""
+        if not itens:
+            return itens
+        pessoas = Pessoa.objects.only('nome_social', 'nome_completo').in_bulk(
+            {item['doador'] for item in itens}
+        )
+        for item in itens:
+            pessoa = pessoas.get(item['doador'])
+            item['doador_nome'] = pessoa.nome_exibicao if pessoa else None
+        return itens
+
+    def get_doador_nome(self, obj):
+        return obj.doador.nome_exibicao
 
 
+class ItemLoteDoacaoSerializer(serializers.Serializer):
+    campanha_id = serializers.IntegerField(help_text="ID da campanha")
+    tipo = serializers.ChoiceField(choices=Doacao.TIPOS_DOACAO)
+    descricao = serializers.CharField(required=False, allow_blank=True, allow_null=True)
 
 
+class LoteDoacoesSerializer(serializers.Serializer):
+    """
+    Várias doações, de uma ou mais campanhas, registradas de uma vez (ex:
+    itens de uma campanha de arrecadação). As campanhas são conferidas numa
+    única consulta e as doações gravadas com bulk_create.
+    """
+    MAX_ITENS = 500
 
+    doacoes = ItemLoteDoacaoSerializer(many=True, allow_empty=False, max_length=MAX_ITENS)
+
+    def validate_doacoes(self, doacoes):
+        ids = {item['campanha_id'] for item in doacoes}
+        existentes = set(Campanha.objects.filter(id__in=ids).values_list('id', flat=True))
+        erros = [
+            {'campanha_id': ['Campanha não encontrada.']} if item['campanha_id'] not in existentes else {}
+            for item in doacoes
+        ]
+        if any(erros):
+            raise serializers.ValidationError(erros)
+        return doacoes
+
+    def create(self, validated_data):
+        """Insere as doações num único INSERT (bulk_create não dispara sinais)"""
+        doador_id = validated_data['doador_id']
+        return Doacao.objects.bulk_create([
+            Doacao(doador_id=doador_id, **item) for item in validated_data['doacoes']
+        ])
+
+
+class ResumoDoacoesSerializer(serializers.ModelSerializer):
+    """Números agregados das doações de uma campanha"""
+    por_tipo = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta:
+        model = ResumoDoacoes
+        fields = ['total', 'por_tipo', 'doadores_unicos', 'ultima_doacao']
+        read_only_fields = fields
 
+    @classmethod
+    def para_campanha(cls, campanha):
+        """Resumo da campanha (já carregado com select_related) ou zerado"""
+        try:
+            resumo = campanha.resumo_doacoes
+        except ResumoDoacoes.DoesNotExist:
+            resumo = ResumoDoacoes(campanha_id=campanha.pk)
+        return cls(resumo).data
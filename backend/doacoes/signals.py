@@ -0,0 +1,38 @@
+"""
+Cache de doações e ResumoDoacoes mantidos a partir dos sinais do modelo
+(bulk_create não dispara sinais: quem cria em lote chama registrar_doacoes
+e inserir_nas_recentes diretamente).
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from backend.core.cache import ns_doacoes_campanha, invalidar_apos_commit
+from .models import Doacao
+from .recentes import inserir_nas_recentes
+from .resumo import registrar_doacoes, remover_doacao
+
+
+@receiver(post_save, sender=Doacao)
+def atualizar_cache_doacao(sender, instance, created, **kwargs):
+    if created:
+        # Doação nova entra na primeira página em cache, sem invalidá-la
+        transaction.on_commit(lambda: inserir_nas_recentes([instance]))
+    else:
+        invalidar_apos_commit(ns_doacoes_campanha(instance.campanha_id))
+
+
+@receiver(post_delete, sender=Doacao)
+def invalidar_cache_doacao(sender, instance, **kwargs):
+    invalidar_apos_commit(ns_doacoes_campanha(instance.campanha_id))
+
+
+@receiver(post_save, sender=Doacao)
+def somar_ao_resumo(sender, instance, created, **kwargs):
+    if created:
+        registrar_doacoes([instance])
+
+
+@receiver(post_delete, sender=Doacao)
+def descontar_do_resumo(sender, instance, **kwargs):
+    remover_doacao(instance)
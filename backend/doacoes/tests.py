@@ -1,3 +1,349 @@
+import json
+import os
+from datetime import date
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from backend.campanhas.models import Organizadora, Campanha
+from backend.campanhas.tests import criar_pessoa
+from backend.pessoas.models import Pessoa, TipoUsuario, Genero
+from . import resumo as resumo_doacoes
+from .models import Doacao, ResumoDoacoes
+from .serializers import DoacaoSerializer
+
+
+class DoacoesTestCase(TestCase):
+    """Base: uma campanha, a organizadora e duas pessoas doadoras"""
+
+    @classmethod
+    def setUpTestData(cls):
+        tipo = TipoUsuario.objects.create(nome='Doadora')
+        genero = Genero.objects.create(nome='Outro')
+        cls.organizadora_pessoa = criar_pessoa('org', tipo, genero, cpf='00000000001')
+        cls.doadora = criar_pessoa('doadora', tipo, genero, cpf='00000000002')
+        cls.outra = criar_pessoa('outra', tipo, genero, cpf='00000000003')
+        cls.organizadora = Organizadora.objects.create(pessoa=cls.organizadora_pessoa)
+        cls.campanha = Campanha.objects.create(
+            titulo='Inverno', descricao='d', organizadora=cls.organizadora, data_inicio=date(2025, 1, 1)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.doadora)
+
+    def _doar(self, tipo='roupa', campanha=None):
+        return self.client.post('/api/doacoes/criar/', {
+            'campanha_id': (campanha or self.campanha).id, 'tipo': tipo, 'descricao': 'Casacos',
+        }, format='json')
+
+
+class ResumoDoacoesTest(DoacoesTestCase):
+    """Contadores por campanha mantidos na transação que cria ou remove a doação"""
+
+    def test_criar_doacao_atualiza_resumo(self):
+        self.assertEqual(self._doar('roupa').status_code, 201)
+        self._doar('alimento')
+        self.client.force_authenticate(self.outra)
+        ultima = self._doar('roupa').data
+
+        resumo = ResumoDoacoes.objects.get(campanha=self.campanha)
+        self.assertEqual(resumo.total, 3)
+        self.assertEqual(resumo.por_tipo, {'alimento': 1, 'roupa': 2, 'brinquedo': 0, 'servico': 0, 'outro': 0})
+        self.assertEqual(resumo.doadores_unicos, 2)
+        self.assertEqual(resumo.ultima_doacao, Doacao.objects.get(pk=ultima['id']).data_doacao)
+
+    def test_remover_doacao_desconta_do_resumo(self):
+        self._doar('roupa')
+        primeira = Doacao.objects.get()
+        self._doar('alimento')
+
+        primeira.delete()
+        resumo = ResumoDoacoes.objects.get(campanha=self.campanha)
+        self.assertEqual((resumo.total, resumo.total_roupa, resumo.doadores_unicos), (1, 0, 1))
+
+        Doacao.objects.get().delete()
+        resumo.refresh_from_db()
+        self.assertEqual((resumo.total, resumo.doadores_unicos, resumo.ultima_doacao), (0, 0, None))
+
+    def test_endpoint_resumo_em_uma_consulta(self):
+        self._doar('brinquedo')
+
+        with self.assertNumQueries(1):
+            resposta = self.client.get(f'/api/campanhas/{self.campanha.id}/resumo/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['campanha_id'], self.campanha.id)
+        self.assertEqual(resposta.data['total'], 1)
+        self.assertEqual(resposta.data['por_tipo']['brinquedo'], 1)
+
+        sem_doacoes = Campanha.objects.create(
+            titulo='Nova', descricao='d', organizadora=self.organizadora, data_inicio=date(2025, 2, 1)
+        )
+        self.assertEqual(self.client.get(f'/api/campanhas/{sem_doacoes.id}/resumo/').data['total'], 0)
+        self.assertEqual(self.client.get('/api/campanhas/999999/resumo/').status_code, 404)
+
+    def test_card_em_cache_mostra_numeros_atuais(self):
+        card = self.client.get('/api/campanhas/listar/').data['results'][0]
+        self.assertEqual(card['resumo_doacoes']['total'], 0)
+
+        self._doar('servico')
+        card = self.client.get('/api/campanhas/listar/').data['results'][0]
+        self.assertEqual(card['resumo_doacoes']['total'], 1)
+        self.assertEqual(card['resumo_doacoes']['por_tipo']['servico'], 1)
+
+
+class ListagemDoacoesTest(DoacoesTestCase):
+    """Cursor (mais recentes primeiro), primeira página em cache e exportação NDJSON"""
+
+    def _doar_varias(self, quantidade):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(quantidade):
+                self._doar()
+        return list(Doacao.objects.order_by('-data_doacao', '-id').values_list('id', flat=True))
+
+    def _url(self, **params):
+        return f'/api/doacoes/campanha/{self.campanha.id}/?' + urlencode(params)
+
+    def test_paginas_por_cursor_mais_recentes_primeiro(self):
+        ids = self._doar_varias(5)
+
+        vistos = []
+        url = self._url(page_size=2)
+        while url:
+            resposta = self.client.get(url)
+            self.assertEqual(resposta.status_code, 200)
+            vistos += [item['id'] for item in resposta.data['results']]
+            url = resposta.data['next']
+        self.assertEqual(vistos, ids)
+
+    def test_nova_doacao_entra_na_primeira_pagina_em_cache(self):
+        self._doar_varias(3)
+        self.client.get(self._url(page_size=2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nova = self._doar().data
+
+        with self.assertNumQueries(0):
+            resposta = self.client.get(self._url(page_size=2))
+        self.assertEqual(resposta.data['results'][0]['id'], nova['id'])
+        self.assertEqual(len(resposta.data['results']), 2)
+
+        # O cursor da página em cache continua a partir do último item exibido
+        segunda = self.client.get(resposta.data['next']).data['results']
+        self.assertEqual(
+            [item['id'] for item in resposta.data['results'] + segunda],
+            list(Doacao.objects.order_by('-data_doacao', '-id').values_list('id', flat=True)[:4]),
+        )
+
+    def test_remover_doacao_invalida_primeira_pagina(self):
+        self._doar_varias(2)
+        self.client.get(self._url())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Doacao.objects.order_by('-id').first().delete()
+        self.assertEqual(len(self.client.get(self._url()).data['results']), 1)
+
+    def test_exportar_ndjson(self):
+        ids = self._doar_varias(3)
+
+        resposta = self.client.get(f'/api/doacoes/campanha/{self.campanha.id}/exportar/')
+        self.assertEqual(resposta['Content-Type'], 'application/x-ndjson')
+
+        async def coletar():
+            return b''.join([parte async for parte in resposta.streaming_content])
+
+        linhas = [json.loads(linha) for linha in async_to_sync(coletar)().decode().splitlines()]
+        self.assertEqual([linha['id'] for linha in linhas], ids)
+        self.assertEqual(linhas[0]['doador_id'], self.doadora.id)
+
+
+class LeituraDoacoesTest(DoacoesTestCase):
+    """Listagem lê só as colunas da doação; o nome do doador vem de um único JOIN"""
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                self._doar()
+        self.primeira = self.client.get(f'/api/doacoes/campanha/{self.campanha.id}/?page_size=1').data
+
+    def test_paginas_seguintes_sem_join_nem_colunas_extras(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(self.primeira['next'])
+        self.assertEqual(len(consultas), 1)
+        sql = consultas[0]['sql']
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('password', sql)
+        self.assertEqual(resposta.data['results'][0]['doador'], self.doadora.id)
+
+    def test_expandir_doador_com_um_join(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(self.primeira['next'] + '&expandir=doador')
+        self.assertEqual(len(consultas), 1)
+        self.assertIn('JOIN', consultas[0]['sql'])
+        self.assertNotIn('password', consultas[0]['sql'])
+        self.assertEqual(resposta.data['results'][0]['doador_nome'], self.doadora.nome_exibicao)
+
+        # Primeira página (cache): nomes atuais, uma consulta
+        self.doadora.nome_social = 'Nome novo'
+        self.doadora.save(update_fields=['nome_social'])
+        with self.assertNumQueries(1):
+            resposta = self.client.get(f'/api/doacoes/campanha/{self.campanha.id}/?expandir=doador')
+        self.assertEqual({item['doador_nome'] for item in resposta.data['results']}, {'Nome novo'})
+
+
+class LoteDoacoesTest(DoacoesTestCase):
+    """Lote: consultas constantes no tamanho do lote, resumo e cache atualizados por campanha"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.outra_campanha = Campanha.objects.create(
+            titulo='Natal', descricao='d', organizadora=cls.organizadora, data_inicio=date(2025, 3, 1)
+        )
+
+    def _lote(self, itens):
+        return self.client.post('/api/doacoes/lote/', {'doacoes': itens}, format='json')
+
+    def _itens(self, quantidade):
+        campanhas = [self.campanha.id, self.outra_campanha.id]
+        return [
+            {'campanha_id': campanhas[i % 2], 'tipo': 'roupa' if i % 3 else 'alimento', 'descricao': f'Item {i}'}
+            for i in range(quantidade)
+        ]
+
+    def test_consultas_nao_crescem_com_o_lote(self):
+        self._lote(self._itens(2))  # cria os resumos e registra a doadora nas duas campanhas
+
+        with CaptureQueriesContext(connection) as pequeno:
+            self.assertEqual(self._lote(self._itens(2)).status_code, 201)
+        with CaptureQueriesContext(connection) as grande:
+            resposta = self._lote(self._itens(40))
+        self.assertEqual(resposta.data['criadas'], 40)
+        self.assertEqual(len(grande), len(pequeno))
+
+    def test_resumo_e_primeira_pagina_em_cache(self):
+        self.client.get(f'/api/doacoes/campanha/{self.campanha.id}/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._lote(self._itens(6))
+
+        resumo = ResumoDoacoes.objects.get(campanha=self.campanha)
+        self.assertEqual((resumo.total, resumo.total_alimento, resumo.doadores_unicos), (3, 1, 1))
+        self.assertEqual(ResumoDoacoes.objects.get(campanha=self.outra_campanha).total, 3)
+
+        with self.assertNumQueries(0):
+            resposta = self.client.get(f'/api/doacoes/campanha/{self.campanha.id}/')
+        self.assertEqual(
+            [item['id'] for item in resposta.data['results']],
+            list(Doacao.objects.filter(campanha=self.campanha)
+                 .order_by('-data_doacao', '-id').values_list('id', flat=True)),
+        )
+
+    def test_resumos_travados_em_ordem_de_campanha(self):
+        # Lote com a campanha de id maior primeiro: os resumos são atualizados em ordem de id
+        itens = sorted(self._itens(4), key=lambda item: -item['campanha_id'])
+        with mock.patch('backend.doacoes.resumo._somar', wraps=resumo_doacoes._somar) as somar:
+            self.assertEqual(self._lote(itens).status_code, 201)
+        self.assertEqual(
+            [chamada.args[0] for chamada in somar.call_args_list],
+            sorted([self.campanha.id, self.outra_campanha.id]),
+        )
+
+    def test_campanha_inexistente_nao_grava_nada(self):
+        itens = self._itens(3)
+        itens[1]['campanha_id'] = 999999
+
+        resposta = self._lote(itens)
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(resposta.data['doacoes'][1]['campanha_id'][0], 'Campanha não encontrada.')
+        self.assertFalse(Doacao.objects.exists())
+
+
+@skipUnless(
+    connection.vendor == 'postgresql' and os.environ.get('TESTES_EXPLAIN'),
+    'EXPLAIN com 1M de doações: só no PostgreSQL, com TESTES_EXPLAIN=1',
+)
+class IndicesExplainTest(DoacoesTestCase):
+    """Os filtros quentes de Campanha e Doacao usam os índices compostos (plano do EXPLAIN)"""
+
+    DOACOES = 1_000_000
+    CAMPANHAS = 20_000
+    PESSOAS = 500
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        tipo, genero = cls.doadora.tipo_usuario_id, cls.doadora.genero_id
+        pessoas = Pessoa.objects.bulk_create([
+            Pessoa(
+                username=f'explain{i}', email=f'explain{i}@teste.com', cpf=f'9{i:010d}',
+                nome_completo=f'Pessoa {i}', tipo_usuario_id=tipo, genero_id=genero,
+            )
+            for i in range(cls.PESSOAS)
+        ])
+        organizadoras = Organizadora.objects.bulk_create([Organizadora(pessoa=pessoa) for pessoa in pessoas])
+        ids_pessoas = [pessoa.id for pessoa in pessoas]
+
+        with connection.cursor() as cursor:
+            # Campanhas de dez anos, ~2% em andamento hoje (metade sem data_fim)
+            cursor.execute(f'''
+                INSERT INTO {Campanha._meta.db_table}
+                    (titulo, descricao, cidade, organizadora_id, beneficiaria_id, data_inicio, data_fim)
+                SELECT 'Campanha ' || g, '', 'Recife',
+                       (%(organizadoras)s::int[])[1 + g %% %(n_org)s],
+                       CASE WHEN g %% 4 = 0 THEN (%(pessoas)s::int[])[1 + g %% %(n_pes)s] END,
+                       CASE WHEN g %% 50 = 0 THEN CURRENT_DATE - g %% 365 ELSE DATE '2015-01-01' + g %% 3650 END,
+                       CASE WHEN g %% 100 = 0 THEN NULL
+                            WHEN g %% 50 = 0 THEN CURRENT_DATE + 30
+                            ELSE DATE '2015-01-01' + g %% 3650 + 30 END
+                FROM generate_series(1, %(total)s) g
+            ''', {
+                'organizadoras': [o.id for o in organizadoras], 'n_org': len(organizadoras),
+                'pessoas': ids_pessoas, 'n_pes': len(ids_pessoas), 'total': cls.CAMPANHAS,
+            })
+            cursor.execute(f'''
+                INSERT INTO {Doacao._meta.db_table} (campanha_id, doador_id, tipo, data_doacao)
+                SELECT c.ids[1 + g %% array_length(c.ids, 1)],
+                       (%(pessoas)s::int[])[1 + g %% %(n_pes)s],
+                       'alimento', now() - g * interval '1 minute'
+                FROM generate_series(1, %(total)s) g,
+                     (SELECT array_agg(id) AS ids FROM {Campanha._meta.db_table}) c
+            ''', {'pessoas': ids_pessoas, 'n_pes': len(ids_pessoas), 'total': cls.DOACOES})
+            cursor.execute(f'ANALYZE {Campanha._meta.db_table}, {Doacao._meta.db_table}')
+
+        cls.organizadora_explain = organizadoras[7]
+        cls.beneficiaria_explain = pessoas[8]
+        cls.campanha_explain = Campanha.objects.filter(organizadora=cls.organizadora_explain).first()
+
+    def assertUsaIndice(self, queryset, indice):
+        plano = queryset.explain()
+        self.assertIn(indice, plano)
+        self.assertNotIn('Seq Scan', plano)
+
+    def test_doacoes_da_campanha_mais_recentes_primeiro(self):
+        # Sem order_by: Meta.ordering é a ordem do índice
+        doacoes = DoacaoSerializer.otimizar_queryset(Doacao.objects.filter(campanha=self.campanha_explain))
+        self.assertUsaIndice(doacoes[:21], 'doacao_campanha_recentes_idx')
+
+    def test_campanhas_da_organizadora_e_da_beneficiaria(self):
+        self.assertUsaIndice(
+            Campanha.objects.filter(organizadora=self.organizadora_explain)[:20], 'campanha_org_inicio_idx'
+        )
+        self.assertUsaIndice(
+            Campanha.objects.filter(beneficiaria=self.beneficiaria_explain)[:20], 'campanha_benef_inicio_idx'
+        )
 
-# Create your tests here.
+    def test_campanhas_ativas(self):
+        # Sem LIMIT: com LIMIT o planejador pode preferir percorrer campanha_inicio_id_idx
+        ativas = Campanha.objects.filter(Campanha.filtro_ativas(timezone.localdate()))
+        self.assertUsaIndice(ativas, 'campanha_ativas_idx')
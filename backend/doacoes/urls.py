@@ -3,7 +3,9 @@ from . import views
 
 urlpatterns = [
     path('criar/', views.criar_doacao, name='criar_doacao'),
+    path('lote/', views.criar_doacoes_em_lote, name='criar_doacoes_em_lote'),
     path('campanha/<int:campanha_id>/', views.listar_doacoes_por_campanha, name='listar_doacoes_por_campanha'),
+    path('campanha/<int:campanha_id>/exportar/', views.exportar_doacoes_por_campanha, name='exportar_doacoes_por_campanha'),
 ]
 
 
@@ -2,15 +2,20 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
-from django.core.cache import cache
-from django.views.decorators.cache import cache_page
-from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import StreamingHttpResponse
+import json
 from .models import Doacao
-from backend.campanhas.models import Campanha
-from backend.pessoas.models import Pessoa
-from .serializers import DoacaoSerializer
+from .pagination import DoacaoCursorPagination
+from .recentes import obter_recentes, inserir_nas_recentes
+from .resumo import registrar_doacoes
+from .serializers import DoacaoSerializer, DoacaoComDoadorSerializer, LoteDoacoesSerializer
+
+# Linhas lidas do banco por vez na exportação
+TAMANHO_LOTE_EXPORTACAO = 2000
 
 
 @extend_schema(
@@ -23,45 +28,112 @@ from .serializers import DoacaoSerializer
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def criar_doacao(request):
     data = request.data.copy()
     data['doador_id'] = request.user.id
     serializer = DoacaoSerializer(data=data)
     if serializer.is_valid():
+        # O resumo da campanha é atualizado e a doação entra no cache da
+        # primeira página pelos sinais de Doacao
         doacao = serializer.save()
         
-        # Invalidar cache de doações da campanha
-        campanha_id = doacao.campanha.id
-        cache.delete(f'doacoes_campanha_{campanha_id}')
-        
         return Response(DoacaoSerializer(doacao).data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@extend_schema(
+    operation_id='criar_doacoes_em_lote',
+    summary='Criar Doações em Lote',
+    description=(
+        'Registra várias doações de uma vez, de uma ou mais campanhas (até '
+        f'{LoteDoacoesSerializer.MAX_ITENS} itens). O doador é o usuário autenticado. '
+        'Se alguma campanha não existir, nada é gravado.'
+    ),
+    tags=['Doações'],
+    request=LoteDoacoesSerializer,
+    responses={201: OpenApiTypes.OBJECT, 400: OpenApiTypes.OBJECT}
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@transaction.atomic
+def criar_doacoes_em_lote(request):
+    serializer = LoteDoacoesSerializer(data=request.data)
+    if serializer.is_valid():
+        doacoes = serializer.save(doador_id=request.user.id)
+        
+        # Sem sinais no bulk_create: um UPDATE de resumo e uma atualização
+        # do cache por campanha
+        registrar_doacoes(doacoes)
+        transaction.on_commit(lambda: inserir_nas_recentes(doacoes))
+        
+        return Response({
+            'criadas': len(doacoes),
+            'doacoes': DoacaoSerializer(doacoes, many=True).data,
+        }, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 @extend_schema(
     operation_id='listar_doacoes_por_campanha',
     summary='Listar Doações por Campanha',
-    description='Lista todas as doações vinculadas a uma campanha com cache.',
+    description=(
+        'Lista as doações de uma campanha paginadas por cursor (mais recentes '
+        'primeiro). A primeira página vem do cache e recebe as doações novas '
+        'sem ser invalidada.'
+    ),
     tags=['Doações'],
+    parameters=[
+        OpenApiParameter('cursor', OpenApiTypes.STR, description='Cursor retornado em next/previous'),
+        OpenApiParameter('page_size', OpenApiTypes.INT, description='Itens por página (máx. 100)'),
+        OpenApiParameter('expandir', OpenApiTypes.STR, enum=['doador'], description='Incluir o nome de exibição do doador'),
+    ],
+    responses={200: DoacaoComDoadorSerializer(many=True)},
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def listar_doacoes_por_campanha(request, campanha_id: int):
-    cache_key = f'doacoes_campanha_{campanha_id}'
-    cached_data = cache.get(cache_key)
+    paginator = DoacaoCursorPagination()
+    expandir = request.query_params.get('expandir') == 'doador'
+    serializer_class = DoacaoComDoadorSerializer if expandir else DoacaoSerializer
     
-    if cached_data is None:
-        doacoes = Doacao.objects.select_related(
-            'doador',
-            'campanha'
-        ).filter(campanha_id=campanha_id)
-        
-        serializer = DoacaoSerializer(doacoes, many=True)
-        cached_data = serializer.data
-        
-        # Cache por 15 minutos (doações mudam mais frequentemente)
-        cache.set(cache_key, cached_data, settings.CACHE_TTL_SHORT)
+    if not request.query_params.get(paginator.cursor_query_param):
+        pagina = paginator.paginar_lista(obter_recentes(campanha_id), request)
+        if expandir:
+            # Nomes lidos na hora (mudam com a Pessoa), não guardados no cache
+            pagina = DoacaoComDoadorSerializer.expandir_doadores([dict(item) for item in pagina])
+        return paginator.get_paginated_response(pagina)
     
-    return Response(cached_data)
+    # Páginas seguintes: keyset no índice (campanha, data_doacao, id), sem cache
+    doacoes = serializer_class.otimizar_queryset(Doacao.objects.filter(campanha_id=campanha_id))
+    pagina = paginator.paginate_queryset(doacoes, request)
+    return paginator.get_paginated_response(serializer_class(pagina, many=True).data)
+
+
+async def _linhas_ndjson(doacoes):
+    async for doacao in doacoes.aiterator(chunk_size=TAMANHO_LOTE_EXPORTACAO):
+        yield json.dumps(doacao, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
 
-# Create your views here.
+@extend_schema(
+    operation_id='exportar_doacoes_por_campanha',
+    summary='Exportar Doações da Campanha',
+    description=(
+        'Todas as doações da campanha em NDJSON (um objeto JSON por linha), '
+        'mais recentes primeiro, transmitidas em partes conforme são lidas do banco.'
+    ),
+    tags=['Doações'],
+    responses={(200, 'application/x-ndjson'): OpenApiTypes.STR},
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def exportar_doacoes_por_campanha(request, campanha_id: int):
+    doacoes = Doacao.objects.filter(campanha_id=campanha_id).order_by(
+        *DoacaoCursorPagination.ordering
+    ).values(*DoacaoSerializer.CAMPOS_CONSULTA)
+    
+    # Gerador assíncrono: no ASGI (uvicorn) um iterador síncrono seria
+    # consumido inteiro antes do envio
+    response = StreamingHttpResponse(_linhas_ndjson(doacoes), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="doacoes_campanha_{campanha_id}.ndjson"'
+    return response
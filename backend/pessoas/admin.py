@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
-from .models import Pessoa, TipoUsuario, Genero, CategoriaInteresse, LocalizacaoInteresse, CodigoVerificacao
+from .models import Pessoa, TipoUsuario, Genero, CategoriaInteresse, LocalizacaoInteresse, CodigoVerificacao, EmailPendente
 
 
 @admin.register(TipoUsuario)
@@ -104,11 +104,9 @@ class PessoaAdmin(UserAdmin):
     
     def categorias_interesse_display(self, obj):
         """Exibe as categorias de interesse de forma legível"""
-        if obj.categorias_interesse.exists():
-            categorias = obj.get_categorias_interesse_display()
-            if isinstance(categorias, list):
-                return ', '.join(categorias)
-            return categorias
+        categorias = obj.get_categorias_interesse_display()
+        if isinstance(categorias, list):
+            return ', '.join(categorias)
         return "Nenhuma categoria selecionada"
     categorias_interesse_display.short_description = "Categorias de Interesse"
     
@@ -156,4 +154,32 @@ class CodigoVerificacaoAdmin(admin.ModelAdmin):
         CodigoVerificacao.objects.filter(data_criacao__lt=limite).delete()
         
         self.message_user(request, f'{count} código(s) expirado(s) removido(s)')
-    limpar_expirados.short_description = "Limpar códigos expirados (>24h)"
\ No newline at end of file
+    limpar_expirados.short_description = "Limpar códigos expirados (>24h)"
+
+
+@admin.register(EmailPendente)
+class EmailPendenteAdmin(admin.ModelAdmin):
+    list_display = ('destinatario', 'assunto', 'status', 'tentativas', 'proxima_tentativa', 'expira_em', 'data_criacao')
+    list_filter = ('status', 'data_criacao')
+    search_fields = ('destinatario', 'assunto')
+    readonly_fields = ('data_criacao', 'data_envio', 'expira_em', 'ultimo_erro')
+    # A mensagem pode conter um código de verificação válido
+    exclude = ('mensagem',)
+    date_hierarchy = 'data_criacao'
+    
+    actions = ['reenviar']
+    
+    def reenviar(self, request, queryset):
+        """Devolve emails com falha para a fila (exceto os sem mensagem ou expirados)"""
+        from django.db.models import Q
+        from django.utils import timezone
+        
+        count = queryset.exclude(status='enviado').exclude(mensagem='').filter(
+            Q(expira_em__isnull=True) | Q(expira_em__gt=timezone.now())
+        ).update(
+            status='pendente',
+            tentativas=0,
+            proxima_tentativa=timezone.now()
+        )
+        self.message_user(request, f'{count} email(s) devolvido(s) para a fila')
+    reenviar.short_description = "Reenviar emails selecionados"
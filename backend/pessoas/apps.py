@@ -5,3 +5,6 @@ class PessoasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend.pessoas'
     verbose_name = 'Usuáries'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,33 @@
+"""
+Autenticação JWT sem consulta ao banco por request
+"""
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import PessoaToken, token_revogado
+
+
+class PessoaJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    request.user é um PessoaToken montado com as claims do token. O único
+    acesso externo por request é a consulta à lista de revogação no Redis.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        usuario = PessoaToken(validated_token)
+        if token_revogado(usuario.id, validated_token.get('iat')):
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if 'ativo' in validated_token and not validated_token['ativo']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return usuario
+
+
+class PessoaJWTScheme(SimpleJWTScheme):
+    """Esquema Bearer JWT no OpenAPI (drf-spectacular)"""
+    target_class = 'backend.pessoas.authentication.PessoaJWTAuthentication'
@@ -0,0 +1,43 @@
+"""
+Backend de autenticação por email ou username
+
+Por email, busca a pessoa uma única vez pelo índice único LOWER(email), já
+com tipo de usuário, gênero, perfil de organizadora (claims do JWT) e
+interesses carregados para a resposta do login. Por username (/api/token/,
+admin), a busca é a do ModelBackend. Nos dois casos a senha é conferida no
+pool de hash (backend.pessoas.senhas), com rehash transparente.
+"""
+from django.contrib.auth.backends import ModelBackend
+from django.db.models.functions import Lower
+
+from .models import Pessoa
+from .senhas import gerar_hash, verificar_senha
+from .serializers import PessoaSerializer
+
+
+class EmailBackend(ModelBackend):
+    """authenticate(request, email=..., password=...) ou (request, username=..., password=...)"""
+
+    def authenticate(self, request, email=None, password=None, username=None, **kwargs):
+        if username is None:
+            username = kwargs.get(Pessoa.USERNAME_FIELD)
+        if password is None or (email is None and username is None):
+            return None
+
+        try:
+            if email is not None:
+                queryset = PessoaSerializer.otimizar_queryset(
+                    Pessoa.objects.select_related('tipo_usuario', 'genero', 'perfil_organizadora')
+                ).alias(email_normalizado=Lower('email'))
+                pessoa = queryset.get(email_normalizado=email.lower())
+            else:
+                pessoa = Pessoa._default_manager.get_by_natural_key(username)
+        except Pessoa.DoesNotExist:
+            # Calcula o hash mesmo assim, para não revelar pelo tempo de
+            # resposta se a conta existe
+            gerar_hash(password)
+            return None
+
+        if verificar_senha(pessoa, password) and self.user_can_authenticate(pessoa):
+            return pessoa
+        return None
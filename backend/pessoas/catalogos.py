@@ -0,0 +1,47 @@
+"""
+Catálogos de cadastro (tipos, gêneros, categorias e localizações) em cache
+de dois níveis: memória do processo + Redis, invalidados pelo namespace
+NS_CATALOGOS sempre que um registro é salvo ou removido.
+"""
+from django.db.models import DateTimeField
+
+from backend.core.cache import NS_CATALOGOS, obter_dois_niveis
+from .models import TipoUsuario, Genero, CategoriaInteresse, LocalizacaoInteresse
+
+# Catálogos mudam poucas vezes por ano; a versão do namespace cuida da invalidação
+CATALOGO_TTL = 60 * 60 * 24
+
+MODELOS_CATALOGO = (TipoUsuario, Genero, CategoriaInteresse, LocalizacaoInteresse)
+
+
+def _campos(modelo):
+    """Colunas serializáveis em JSON (datas ficam adiadas na instância)"""
+    return [
+        campo.attname for campo in modelo._meta.concrete_fields
+        if not isinstance(campo, DateTimeField)
+    ]
+
+
+def obter_catalogo(modelo):
+    """
+    Retorna {pk: instância} com todos os registros do catálogo, sem consultar
+    o banco quando o cache está quente
+    """
+    campos = _campos(modelo)
+
+    def construir():
+        return list(modelo.objects.values_list(*campos))
+
+    def preparar(linhas):
+        return {
+            linha[0]: modelo.from_db('default', campos, list(linha))
+            for linha in linhas
+        }
+
+    return obter_dois_niveis(
+        f'catalogo_{modelo._meta.label_lower}',
+        NS_CATALOGOS,
+        construir,
+        CATALOGO_TTL,
+        preparar=preparar,
+    )
@@ -0,0 +1,262 @@
+"""
+Armazenamento dos códigos de verificação (backends plugáveis)
+
+O backend é escolhido por settings.CODIGO_VERIFICACAO_STORE:
+- BancoCodigoStore: tabela CodigoVerificacao (comportamento original)
+- RedisCodigoStore: chaves com TTL nativo, tentativas com HINCRBY e consumo
+  atômico via script Lua (cliente redis.asyncio nas views async); o banco só recebe registros de auditoria se
+  settings.CODIGO_VERIFICACAO_AUDITORIA estiver ativo
+"""
+import asyncio
+import hmac
+import secrets
+import string
+import weakref
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import CodigoVerificacao
+
+VALIDADE_SEGUNDOS = 10 * 60
+MAX_TENTATIVAS = 3
+
+MENSAGEM_VALIDO = "Código verificado com sucesso"
+MENSAGEM_INVALIDO = "Código inválido"
+MENSAGEM_TENTATIVAS = "Número máximo de tentativas excedido"
+MENSAGEM_SEM_CODIGO_ATIVO = "Código expirado, já utilizado ou com tentativas esgotadas. Solicite um novo código"
+
+
+def gerar_codigo_aleatorio():
+    """Código de 6 dígitos gerado com fonte criptograficamente segura"""
+    return ''.join(secrets.choice(string.digits) for _ in range(6))
+
+
+class CodigoStore(ABC):
+    """
+    Interface dos backends de códigos de verificação. Um backend sem gerar ou
+    verificar falha ao ser instanciado, não no primeiro request.
+    """
+
+    @abstractmethod
+    def gerar(self, email, tipo):
+        """Gera um novo código (invalidando os anteriores) e o retorna"""
+
+    @abstractmethod
+    def verificar(self, email, codigo, tipo, consumir=False):
+        """
+        Verifica o código numa única operação atômica. Toda tentativa errada
+        conta para o código ativo do email; com consumir=True, o código
+        correto é marcado como usado na mesma operação.
+
+        Returns:
+            tuple: (valido: bool, mensagem: str)
+        """
+
+    def consumir(self, email, codigo, tipo):
+        """Verifica e consome o código (uso único)"""
+        return self.verificar(email, codigo, tipo, consumir=True)
+
+    # Versões async (views ASGI); por padrão, a versão sync numa thread
+    async def agerar(self, email, tipo):
+        return await sync_to_async(self.gerar)(email, tipo)
+
+    async def averificar(self, email, codigo, tipo, consumir=False):
+        return await sync_to_async(self.verificar)(email, codigo, tipo, consumir=consumir)
+
+
+class BancoCodigoStore(CodigoStore):
+    """
+    Códigos na tabela CodigoVerificacao. Como gerar_codigo invalida os
+    anteriores, há no máximo um código ativo por (email, tipo); a verificação
+    é um único UPDATE ... RETURNING sobre ele: conta a tentativa errada ou
+    consome o código certo numa só ida ao banco, sem SELECT antes.
+    """
+
+    SQL_VERIFICAR = """
+        UPDATE {tabela}
+           SET tentativas = tentativas + CASE WHEN codigo = %s THEN 0 ELSE 1 END,
+               usado = CASE WHEN codigo = %s THEN %s ELSE usado END
+         WHERE email = %s
+           AND tipo = %s
+           AND usado = %s
+           AND data_expiracao > %s
+           AND tentativas < %s
+        RETURNING codigo
+    """
+
+    def gerar(self, email, tipo):
+        return CodigoVerificacao.gerar_codigo(email, tipo).codigo
+
+    async def agerar(self, email, tipo):
+        await CodigoVerificacao.objects.filter(email=email, tipo=tipo, usado=False).aupdate(usado=True)
+        codigo_obj = await CodigoVerificacao.objects.acreate(email=email, tipo=tipo)
+        return codigo_obj.codigo
+
+    def verificar(self, email, codigo, tipo, consumir=False):
+        sql = self.SQL_VERIFICAR.format(
+            tabela=connection.ops.quote_name(CodigoVerificacao._meta.db_table)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [
+                codigo, codigo, consumir,
+                email, tipo, False, timezone.now(), MAX_TENTATIVAS,
+            ])
+            linha = cursor.fetchone()
+
+        if linha is None:
+            return False, MENSAGEM_SEM_CODIGO_ATIVO
+        # O UPDATE já contou a tentativa; aqui só se decide a resposta
+        if not hmac.compare_digest(linha[0], codigo):
+            return False, MENSAGEM_INVALIDO
+        return True, MENSAGEM_VALIDO
+
+
+class RedisCodigoStore(CodigoStore):
+    """
+    Um hash por (tipo, email) com o código e o contador de tentativas.
+    Gerar um novo código sobrescreve o anterior; a expiração é o TTL da chave.
+    """
+    PREFIXO = 'otp'
+
+    # Retornos: 1 válido, -1 inexistente/expirado, -2 tentativas esgotadas, -3 código errado
+    SCRIPT_VERIFICAR = """
+    local codigo = redis.call('HGET', KEYS[1], 'codigo')
+    if not codigo then
+        return -1
+    end
+    local tentativas = tonumber(redis.call('HGET', KEYS[1], 'tentativas') or '0')
+    if tentativas >= tonumber(ARGV[2]) then
+        return -2
+    end
+    if codigo ~= ARGV[1] then
+        redis.call('HINCRBY', KEYS[1], 'tentativas', 1)
+        return -3
+    end
+    if ARGV[3] == '1' then
+        redis.call('DEL', KEYS[1])
+    end
+    return 1
+    """
+
+    MENSAGENS = {
+        1: (True, MENSAGEM_VALIDO),
+        -1: (False, MENSAGEM_SEM_CODIGO_ATIVO),
+        -2: (False, MENSAGEM_TENTATIVAS),
+        -3: (False, MENSAGEM_INVALIDO),
+    }
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.redis = get_redis_connection('default')
+        self._script_verificar = self.redis.register_script(self.SCRIPT_VERIFICAR)
+        # Um cliente por event loop: conexões asyncio não podem ser
+        # compartilhadas entre loops (ex: views async servidas via WSGI)
+        self._clientes_async = weakref.WeakKeyDictionary()
+
+    def _async(self):
+        """
+        Cliente redis.asyncio no mesmo servidor/banco do cache padrão, e o
+        script de verificação registrado nele (criados no primeiro uso)
+        """
+        loop = asyncio.get_running_loop()
+        if loop not in self._clientes_async:
+            from redis.asyncio import from_url
+            cliente = from_url(self._url_cache(), **self._opcoes_conexao())
+            self._clientes_async[loop] = (cliente, cliente.register_script(self.SCRIPT_VERIFICAR))
+        return self._clientes_async[loop]
+
+    @staticmethod
+    def _url_cache():
+        """URL do servidor principal do cache (django_redis escreve no primeiro)"""
+        location = settings.CACHES['default']['LOCATION']
+        if isinstance(location, str):
+            location = location.split(',')
+        return location[0]
+
+    @staticmethod
+    def _opcoes_conexao():
+        """
+        Mesmas opções de conexão do cliente síncrono do django_redis; usuário,
+        senha, banco e SSL (rediss://) vêm da própria URL
+        """
+        opcoes = settings.CACHES['default'].get('OPTIONS', {})
+        kwargs = dict(opcoes.get('CONNECTION_POOL_KWARGS', {}))
+        for opcao, kwarg in (
+            ('PASSWORD', 'password'),
+            ('SOCKET_TIMEOUT', 'socket_timeout'),
+            ('SOCKET_CONNECT_TIMEOUT', 'socket_connect_timeout'),
+        ):
+            if opcao in opcoes:
+                kwargs[kwarg] = opcoes[opcao]
+        return kwargs
+
+    def _chave(self, email, tipo):
+        return f'{self.PREFIXO}:{tipo}:{email.lower()}'
+
+    def _gravar(self, pipe, email, tipo):
+        codigo = gerar_codigo_aleatorio()
+        chave = self._chave(email, tipo)
+        pipe.delete(chave)
+        pipe.hset(chave, mapping={'codigo': codigo, 'tentativas': 0})
+        pipe.expire(chave, VALIDADE_SEGUNDOS)
+        return codigo
+
+    def gerar(self, email, tipo):
+        pipe = self.redis.pipeline()
+        codigo = self._gravar(pipe, email, tipo)
+        pipe.execute()
+
+        if settings.CODIGO_VERIFICACAO_AUDITORIA:
+            CodigoVerificacao.objects.create(email=email, tipo=tipo, codigo=codigo)
+        return codigo
+
+    async def agerar(self, email, tipo):
+        cliente, _ = self._async()
+        pipe = cliente.pipeline()
+        codigo = self._gravar(pipe, email, tipo)
+        await pipe.execute()
+
+        if settings.CODIGO_VERIFICACAO_AUDITORIA:
+            await CodigoVerificacao.objects.acreate(email=email, tipo=tipo, codigo=codigo)
+        return codigo
+
+    def verificar(self, email, codigo, tipo, consumir=False):
+        resultado = self._script_verificar(
+            keys=[self._chave(email, tipo)],
+            args=[codigo, MAX_TENTATIVAS, '1' if consumir else '0'],
+        )
+        valido, mensagem = self.MENSAGENS[int(resultado)]
+        if valido and consumir and settings.CODIGO_VERIFICACAO_AUDITORIA:
+            CodigoVerificacao.objects.filter(
+                email=email, codigo=codigo, tipo=tipo, usado=False
+            ).update(usado=True)
+        return valido, mensagem
+
+    async def averificar(self, email, codigo, tipo, consumir=False):
+        _, script = self._async()
+        resultado = await script(
+            keys=[self._chave(email, tipo)],
+            args=[codigo, MAX_TENTATIVAS, '1' if consumir else '0'],
+        )
+        valido, mensagem = self.MENSAGENS[int(resultado)]
+        if valido and consumir and settings.CODIGO_VERIFICACAO_AUDITORIA:
+            await CodigoVerificacao.objects.filter(
+                email=email, codigo=codigo, tipo=tipo, usado=False
+            ).aupdate(usado=True)
+        return valido, mensagem
+
+
+@lru_cache(maxsize=None)
+def _instanciar_store(caminho):
+    return import_string(caminho)()
+
+
+def obter_codigo_store():
+    """Retorna o backend configurado em settings.CODIGO_VERIFICACAO_STORE"""
+    return _instanciar_store(settings.CODIGO_VERIFICACAO_STORE)
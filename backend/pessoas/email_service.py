@@ -1,9 +1,22 @@
 """
 Serviço para envio de emails de verificação
+
+Os emails não são enviados dentro do request: são gravados na fila
+EmailPendente e enviados em lote pelo comando `manage.py enviar_emails`,
+reaproveitando uma única conexão SMTP.
+
+Os emails de código expiram junto com o código: o worker descarta os que
+venceram na fila em vez de enviá-los, e nenhum código fica gravado depois
+do envio (a linha é removida) ou da desistência (a mensagem é apagada).
 """
-from django.core.mail import send_mail
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
-from .models import CodigoVerificacao
+from django.db import transaction
+from django.utils import timezone
+from .codigos import VALIDADE_SEGUNDOS, obter_codigo_store
+from .models import EmailPendente
 
 
 def enviar_codigo_verificacao(email, tipo='cadastro'):
@@ -15,28 +28,55 @@ def enviar_codigo_verificacao(email, tipo='cadastro'):
         tipo (str): Tipo do código ('cadastro', 'login', 'recuperacao')
     
     Returns:
-        tuple: (sucesso: bool, mensagem: str, codigo_obj: CodigoVerificacao ou None)
+        tuple: (sucesso: bool, mensagem: str, codigo: str ou None)
     """
     try:
-        # Gerar código
-        codigo_obj = CodigoVerificacao.gerar_codigo(email, tipo)
+        # Gerar código no backend configurado (Redis ou banco)
+        codigo = obter_codigo_store().gerar(email, tipo)
         
-        # Definir assunto e mensagem baseado no tipo
-        assuntos = {
-            'cadastro': '🌟 Conectades - Código de Verificação de Cadastro',
-            'login': '🔐 Conectades - Código de Verificação de Login',
-            'recuperacao': '🔑 Conectades - Código de Recuperação de Senha'
-        }
+        # Enfileirar email (enviado pelo worker enviar_emails)
+        enfileirar_email(email, *_montar_email(tipo, codigo), validade=VALIDADE_SEGUNDOS)
         
-        mensagens = {
-            'cadastro': f'''
+        return True, f"Código enviado para {email}", codigo
+    
+    except Exception as e:
+        return False, f"Erro ao enviar email: {str(e)}", None
+
+
+async def aenviar_codigo_verificacao(email, tipo='cadastro'):
+    """Versão async de enviar_codigo_verificacao (mesmo retorno)"""
+    try:
+        codigo = await obter_codigo_store().agerar(email, tipo)
+        await aenfileirar_email(email, *_montar_email(tipo, codigo), validade=VALIDADE_SEGUNDOS)
+        return True, f"Código enviado para {email}", codigo
+    
+    except Exception as e:
+        return False, f"Erro ao enviar email: {str(e)}", None
+
+
+def _montar_email(tipo, codigo):
+    """
+    Monta assunto e mensagem do email de código
+    
+    Returns:
+        tuple: (assunto: str, mensagem: str)
+    """
+    # Definir assunto e mensagem baseado no tipo
+    assuntos = {
+        'cadastro': '🌟 Conectades - Código de Verificação de Cadastro',
+        'login': '🔐 Conectades - Código de Verificação de Login',
+        'recuperacao': '🔑 Conectades - Código de Recuperação de Senha'
+    }
+    
+    mensagens = {
+        'cadastro': f'''
 Olá! 👋
 
 Bem-vinda à plataforma Conectades!
 
 Seu código de verificação é:
 
-    {codigo_obj.codigo}
+    {codigo}
 
 Este código é válido por 10 minutos e pode ser usado até 3 vezes.
 
@@ -46,12 +86,12 @@ Se você não solicitou este código, ignore este email.
 Conectades - Conectando pessoas e oportunidades
 Região Metropolitana do Recife - PE
             ''',
-            'login': f'''
+        'login': f'''
 Olá! 👋
 
 Seu código de verificação para login é:
 
-    {codigo_obj.codigo}
+    {codigo}
 
 Este código é válido por 10 minutos e pode ser usado até 3 vezes.
 
@@ -61,14 +101,14 @@ Se você não tentou fazer login, entre em contato conosco imediatamente.
 Conectades - Conectando pessoas e oportunidades
 Região Metropolitana do Recife - PE
             ''',
-            'recuperacao': f'''
+        'recuperacao': f'''
 Olá! 👋
 
 Você solicitou a recuperação de senha.
 
 Seu código de verificação é:
 
-    {codigo_obj.codigo}
+    {codigo}
 
 Este código é válido por 10 minutos e pode ser usado até 3 vezes.
 
@@ -80,60 +120,160 @@ Se você não solicitou a recuperação de senha, ignore este email.
 Conectades - Conectando pessoas e oportunidades
 Região Metropolitana do Recife - PE
             '''
-        }
-        
-        assunto = assuntos.get(tipo, assuntos['cadastro'])
-        mensagem = mensagens.get(tipo, mensagens['cadastro'])
-        
-        # Enviar email
-        send_mail(
-            subject=assunto,
-            message=mensagem,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-            fail_silently=False,
+    }
+    
+    assunto = assuntos.get(tipo, assuntos['cadastro'])
+    mensagem = mensagens.get(tipo, mensagens['cadastro'])
+    return assunto, mensagem
+
+
+def _expira_em(validade):
+    return timezone.now() + timedelta(seconds=validade) if validade else None
+
+
+def enfileirar_email(destinatario, assunto, mensagem, validade=None):
+    """
+    Grava o email na fila de envio. Retorna imediatamente.
+    
+    Args:
+        validade (int): Segundos após os quais o email é descartado sem envio
+            (ex: validade do código que ele contém); None não expira
+    
+    Returns:
+        EmailPendente: registro criado na fila
+    """
+    return EmailPendente.objects.create(
+        destinatario=destinatario,
+        assunto=assunto,
+        mensagem=mensagem,
+        expira_em=_expira_em(validade),
+    )
+
+
+async def aenfileirar_email(destinatario, assunto, mensagem, validade=None):
+    """Versão async de enfileirar_email"""
+    return await EmailPendente.objects.acreate(
+        destinatario=destinatario,
+        assunto=assunto,
+        mensagem=mensagem,
+        expira_em=_expira_em(validade),
+    )
+
+
+def _reservar_lote(tamanho_lote):
+    """
+    Reserva um lote de emails prontos para envio. Os registros reservados têm
+    a próxima tentativa adiada pelo tempo de reserva, para que outro worker
+    não os pegue; se este worker morrer, eles voltam para a fila sozinhos.
+    """
+    agora = timezone.now()
+    with transaction.atomic():
+        # Código vencido na fila: enviá-lo não serve para nada
+        EmailPendente.objects.filter(status='pendente', expira_em__lte=agora).delete()
+        lote = list(
+            EmailPendente.objects.select_for_update(skip_locked=True).filter(
+                status='pendente',
+                proxima_tentativa__lte=agora,
+            ).order_by('proxima_tentativa', 'id')[:tamanho_lote]
         )
-        
-        return True, f"Código enviado para {email}", codigo_obj
+        if lote:
+            EmailPendente.objects.filter(id__in=[email.id for email in lote]).update(
+                proxima_tentativa=agora + timedelta(seconds=settings.EMAIL_FILA_TEMPO_RESERVA)
+            )
+    return lote
+
+
+def _registrar_falha(email_pendente, erro):
+    """
+    Agenda nova tentativa com backoff exponencial ou desiste após o limite,
+    ou se a nova tentativa já seria depois da expiração do email
+    """
+    email_pendente.tentativas += 1
+    email_pendente.ultimo_erro = str(erro)
+    espera = settings.EMAIL_FILA_BACKOFF_BASE * (2 ** (email_pendente.tentativas - 1))
+    proxima_tentativa = timezone.now() + timedelta(seconds=espera)
+    if (
+        email_pendente.tentativas >= settings.EMAIL_FILA_MAX_TENTATIVAS
+        or (email_pendente.expira_em and proxima_tentativa >= email_pendente.expira_em)
+    ):
+        email_pendente.status = 'falhou'
+        email_pendente.mensagem = ''
+    else:
+        email_pendente.proxima_tentativa = proxima_tentativa
+    email_pendente.save(update_fields=['tentativas', 'ultimo_erro', 'status', 'mensagem', 'proxima_tentativa'])
+
+
+def processar_fila_emails(tamanho_lote=None):
+    """
+    Envia um lote da fila usando uma única conexão SMTP.
     
+    Returns:
+        tuple: (enviados: int, falhas: int)
+    """
+    lote = _reservar_lote(tamanho_lote or settings.EMAIL_FILA_LOTE)
+    if not lote:
+        return 0, 0
+    
+    enviados, falhas = 0, 0
+    conexao = get_connection(fail_silently=False)
+    try:
+        conexao.open()
     except Exception as e:
-        return False, f"Erro ao enviar email: {str(e)}", None
+        for email_pendente in lote:
+            _registrar_falha(email_pendente, e)
+        return 0, len(lote)
+    
+    enviados_ids = []
+    try:
+        for email_pendente in lote:
+            mensagem = EmailMessage(
+                subject=email_pendente.assunto,
+                body=email_pendente.mensagem,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[email_pendente.destinatario],
+                connection=conexao,
+            )
+            try:
+                conexao.send_messages([mensagem])
+            except Exception as e:
+                _registrar_falha(email_pendente, e)
+                falhas += 1
+                continue
+            
+            enviados_ids.append(email_pendente.id)
+            enviados += 1
+    finally:
+        conexao.close()
+        # Enviados saem da fila (um DELETE por lote): a mensagem com o código não fica no banco
+        if enviados_ids:
+            EmailPendente.objects.filter(id__in=enviados_ids).delete()
+    
+    return enviados, falhas
 
 
-def verificar_codigo(email, codigo, tipo='cadastro'):
+def verificar_codigo(email, codigo, tipo='cadastro', consumir=False):
     """
-    Verifica se o código é válido
+    Verifica o código numa única operação atômica
     
     Args:
         email (str): Email do usuário
         codigo (str): Código de 6 dígitos
         tipo (str): Tipo do código
+        consumir (bool): Marca o código como usado se ele for válido, na
+            mesma operação (evita que dois requests usem o mesmo código)
     
     Returns:
-        tuple: (valido: bool, mensagem: str, codigo_obj: CodigoVerificacao ou None)
+        tuple: (valido: bool, mensagem: str)
     """
     try:
-        # Buscar código mais recente
-        codigo_obj = CodigoVerificacao.objects.filter(
-            email=email,
-            codigo=codigo,
-            tipo=tipo,
-            usado=False
-        ).order_by('-data_criacao').first()
-        
-        if not codigo_obj:
-            return False, "Código inválido ou já utilizado", None
-        
-        # Verificar validade
-        valido, mensagem = codigo_obj.esta_valido()
-        
-        if not valido:
-            codigo_obj.incrementar_tentativa()
-            return False, mensagem, codigo_obj
-        
-        # Código válido
-        return True, "Código verificado com sucesso", codigo_obj
-    
+        return obter_codigo_store().verificar(email, codigo, tipo, consumir=consumir)
     except Exception as e:
-        return False, f"Erro ao verificar código: {str(e)}", None
+        return False, f"Erro ao verificar código: {str(e)}"
 
+
+async def averificar_codigo(email, codigo, tipo='cadastro', consumir=False):
+    """Versão async de verificar_codigo (mesmo retorno)"""
+    try:
+        return await obter_codigo_store().averificar(email, codigo, tipo, consumir=consumir)
+    except Exception as e:
+        return False, f"Erro ao verificar código: {str(e)}"
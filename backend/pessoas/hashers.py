@@ -0,0 +1,42 @@
+"""
+Hashers de senha com custo configurável em settings.SENHA_HASH_CUSTO
+
+Mantêm o mesmo `algorithm` dos hashers do Django, então reconhecem os hashes
+já gravados; quando o custo configurado muda, must_update() devolve True e a
+senha é refeita no próximo login bem-sucedido.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def _custo(algoritmo, parametro, padrao):
+    return settings.SENHA_HASH_CUSTO.get(algoritmo, {}).get(parametro, padrao)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+
+    @property
+    def time_cost(self):
+        return _custo('argon2', 'time_cost', 2)
+
+    @property
+    def memory_cost(self):
+        return _custo('argon2', 'memory_cost', 19456)
+
+    @property
+    def parallelism(self):
+        return _custo('argon2', 'parallelism', 1)
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+
+    @property
+    def rounds(self):
+        return _custo('bcrypt', 'rounds', 12)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return _custo('pbkdf2', 'iterations', hashers.PBKDF2PasswordHasher.iterations)
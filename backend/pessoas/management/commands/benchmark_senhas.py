@@ -0,0 +1,69 @@
+"""
+Comando Django para medir o custo de cada perfil de hash de senha
+Uso: python manage.py benchmark_senhas [--perfil argon2] [--duracao 3]
+
+Mede verificações de senha (o trabalho de um login) por segundo numa única
+thread (≈ logins/s por núcleo) e com o pool de SENHA_HASH_THREADS threads.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+SENHA_TESTE = 'senha-de-benchmark-123'
+
+
+class Command(BaseCommand):
+    help = 'Mede logins/s por núcleo para cada perfil de hash de senha'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--perfil',
+            action='append',
+            choices=sorted(settings.PERFIS_HASH_SENHA),
+            help='Perfil a medir (pode repetir; padrão: todos)',
+        )
+        parser.add_argument(
+            '--duracao',
+            type=float,
+            default=3.0,
+            help='Segundos de medição por perfil e modo',
+        )
+
+    def _medir(self, hasher, encoded, duracao, threads):
+        def verificar_por(segundos):
+            total = 0
+            fim = time.perf_counter() + segundos
+            while time.perf_counter() < fim:
+                hasher.verify(SENHA_TESTE, encoded)
+                total += 1
+            return total
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            total = sum(pool.map(verificar_por, [duracao] * threads))
+        return total / (time.perf_counter() - inicio)
+
+    def handle(self, *args, **options):
+        perfis = options['perfil'] or sorted(settings.PERFIS_HASH_SENHA)
+        threads = settings.SENHA_HASH_THREADS
+        self.stdout.write(f'Perfil atual: {settings.PERFIL_HASH_SENHA} | threads do pool: {threads}')
+
+        for perfil in perfis:
+            hasher = import_string(settings.PERFIS_HASH_SENHA[perfil][0])()
+            try:
+                encoded = hasher.encode(SENHA_TESTE, hasher.salt())
+            except ValueError as e:
+                # Biblioteca opcional ausente (argon2-cffi / bcrypt)
+                self.stdout.write(self.style.WARNING(f'{perfil}: ignorado ({e})'))
+                continue
+
+            por_nucleo = self._medir(hasher, encoded, options['duracao'], 1)
+            com_pool = self._medir(hasher, encoded, options['duracao'], threads)
+            self.stdout.write(
+                f'{perfil:>7}: {por_nucleo:8.1f} logins/s por núcleo | '
+                f'{com_pool:8.1f} logins/s com {threads} thread(s) | '
+                f'{1000 / por_nucleo:6.1f} ms por verificação'
+            )
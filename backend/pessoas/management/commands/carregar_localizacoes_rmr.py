@@ -1,14 +1,37 @@
 """
-Comando Django para carregar todas as localizações da Região Metropolitana do Recife
-Uso: python manage.py carregar_localizacoes_rmr
+Comando Django para carregar localizações (cidades e bairros) em lote
+Uso: python manage.py carregar_localizacoes_rmr [arquivo.csv|arquivo.json ...]
+
+Sem arquivos, carrega as cidades da Região Metropolitana do Recife e os
+bairros de Recife. Arquivos CSV (com cabeçalho) ou JSON (lista de objetos)
+têm as colunas tipo, nome, cidade e estado, e opcionalmente ordem e ativo;
+ex: municípios e bairros do IBGE.
+
+Os códigos são calculados em memória contra um único SELECT dos códigos
+existentes, e a gravação é um upsert (bulk_create com update_conflicts) por
+lote: recarregar o mesmo arquivo atualiza as linhas em vez de duplicá-las.
+Ordem e ativo só são sobrescritos quando o arquivo os traz; sem eles, valem
+para as localizações novas e as existentes mantêm os valores do admin.
 """
+import csv
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
 
-from django.core.management.base import BaseCommand
+from backend.core.cache import NS_CATALOGOS, invalidar_apos_commit
 from backend.pessoas.models import LocalizacaoInteresse
 
+CAMPOS_ATUALIZADOS = ['nome', 'tipo', 'cidade', 'estado']
+
+# Só sobrescritos quando o arquivo os traz: preservam o que foi ajustado no admin
+CAMPOS_OPCIONAIS = ('ordem', 'ativo')
+
 
 class Command(BaseCommand):
-    help = 'Carrega cidades e bairros da Região Metropolitana do Recife'
+    help = 'Carrega cidades e bairros da Região Metropolitana do Recife ou de arquivos CSV/JSON'
 
     # 15 Municípios da Região Metropolitana do Recife
     CIDADES_RMR = [
@@ -53,6 +76,11 @@ class Command(BaseCommand):
     ]
 
     def add_arguments(self, parser):
+        parser.add_argument(
+            'arquivos',
+            nargs='*',
+            help='Arquivos CSV/JSON com tipo, nome, cidade, estado[, ordem, ativo]',
+        )
         parser.add_argument(
             '--limpar',
             action='store_true',
@@ -68,64 +96,139 @@ class Command(BaseCommand):
             action='store_true',
             help='Carregar apenas bairros',
         )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Linhas por INSERT ... ON CONFLICT',
+        )
 
     def handle(self, *args, **options):
-        self.stdout.write(self.style.SUCCESS('🌍 Carregando localizações da RMR...'))
+        if options['arquivos']:
+            self.stdout.write(self.style.SUCCESS(f'🌍 Carregando localizações de {len(options["arquivos"])} arquivo(s)...'))
+            linhas = [linha for caminho in options['arquivos'] for linha in self.ler_arquivo(caminho)]
+        else:
+            self.stdout.write(self.style.SUCCESS('🌍 Carregando localizações da RMR...'))
+            linhas = self.linhas_rmr()
 
-        cidades_criadas = 0
-        bairros_criados = 0
-        
-        # Carregar cidades
-        if not options['apenas_bairros']:
-            if options['limpar']:
-                LocalizacaoInteresse.objects.filter(tipo='cidade', estado='PE').delete()
-            
-            self.stdout.write('📍 Carregando cidades da RMR...')
-            for ordem, cidade in enumerate(sorted(self.CIDADES_RMR), start=1):
-                obj, created = LocalizacaoInteresse.objects.get_or_create(
-                    nome=cidade,
-                    tipo='cidade',
-                    defaults={
-                        'cidade': cidade,
-                        'estado': 'PE',
-                        'ordem': ordem,
-                        'ativo': True,
-                    }
-                )
-                if created:
-                    cidades_criadas += 1
-        
-        # Carregar bairros
-        if not options['apenas_cidades']:
+        if options['apenas_cidades']:
+            linhas = [linha for linha in linhas if linha['tipo'] == 'cidade']
+        if options['apenas_bairros']:
+            linhas = [linha for linha in linhas if linha['tipo'] == 'bairro']
+
+        with transaction.atomic():
             if options['limpar']:
-                LocalizacaoInteresse.objects.filter(tipo='bairro', cidade='Recife').delete()
-            
-            self.stdout.write('🏘️  Carregando bairros de Recife...')
-            # Remover duplicatas e ordenar
-            bairros_unicos = sorted(set(self.BAIRROS_RECIFE))
-            
-            for ordem, bairro in enumerate(bairros_unicos, start=1):
-                obj, created = LocalizacaoInteresse.objects.get_or_create(
-                    nome=bairro,
-                    tipo='bairro',
-                    cidade='Recife',
-                    defaults={
-                        'estado': 'PE',
-                        'ordem': ordem,
-                        'ativo': True,
-                    }
-                )
-                if created:
-                    bairros_criados += 1
+                self.limpar(linhas)
+            criadas, atualizadas = self.carregar(linhas, options['lote'])
+            invalidar_apos_commit(NS_CATALOGOS)
 
         # Resumo
-        total_cidades = LocalizacaoInteresse.objects.filter(tipo='cidade', estado='PE').count()
-        total_bairros = LocalizacaoInteresse.objects.filter(tipo='bairro', cidade='Recife').count()
-        
         self.stdout.write(self.style.SUCCESS('\n📊 Resumo:'))
-        self.stdout.write(f'  ✅ Cidades criadas: {cidades_criadas}')
-        self.stdout.write(f'  ✅ Bairros criados: {bairros_criados}')
-        self.stdout.write(f'  📍 Total cidades: {total_cidades}')
-        self.stdout.write(f'  🏘️  Total bairros: {total_bairros}')
-        self.stdout.write(self.style.SUCCESS(f'\n🎉 Total: {total_cidades + total_bairros} localizações!'))
+        self.stdout.write(f'  ✅ Localizações criadas: {criadas}')
+        self.stdout.write(f'  🔄 Localizações atualizadas: {atualizadas}')
+        for tipo, total in LocalizacaoInteresse.objects.order_by().values_list('tipo').annotate(total=Count('id')):
+            self.stdout.write(f'  📍 Total {tipo}: {total}')
+        self.stdout.write(self.style.SUCCESS(f'\n🎉 Total: {LocalizacaoInteresse.objects.count()} localizações!'))
+
+    def linhas_rmr(self):
+        cidades = [
+            {'tipo': 'cidade', 'nome': cidade, 'cidade': cidade, 'estado': 'PE'}
+            for cidade in self.CIDADES_RMR
+        ]
+        bairros = [
+            {'tipo': 'bairro', 'nome': bairro, 'cidade': 'Recife', 'estado': 'PE'}
+            for bairro in set(self.BAIRROS_RECIFE)
+        ]
+        return cidades + bairros
+
+    def ler_arquivo(self, caminho):
+        try:
+            with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+                if caminho.endswith('.json'):
+                    registros = json.load(arquivo)
+                else:
+                    registros = list(csv.DictReader(arquivo))
+        except (OSError, ValueError) as erro:
+            raise CommandError(f'Não foi possível ler {caminho}: {erro}')
+
+        linhas = []
+        for numero, registro in enumerate(registros, start=1):
+            tipo = (registro.get('tipo') or '').strip() or 'bairro'
+            nome = (registro.get('nome') or '').strip()
+            if not nome or tipo not in ('bairro', 'cidade', 'regiao'):
+                raise CommandError(f'{caminho}, registro {numero}: nome vazio ou tipo inválido ({tipo})')
+            linha = {
+                'tipo': tipo,
+                'nome': nome,
+                'cidade': (registro.get('cidade') or '').strip() or None,
+                'estado': (registro.get('estado') or 'PE').strip().upper(),
+            }
+            if str(registro.get('ordem') or '').strip():
+                try:
+                    linha['ordem'] = int(registro['ordem'])
+                except ValueError:
+                    raise CommandError(f'{caminho}, registro {numero}: ordem inválida ({registro["ordem"]})')
+            if str(registro.get('ativo') or '').strip():
+                linha['ativo'] = str(registro['ativo']).strip().lower() in ('1', 'true', 'sim', 's')
+            linhas.append(linha)
+        return linhas
+
+    def limpar(self, linhas):
+        """Remove as cidades dos estados e os bairros das cidades presentes nas linhas"""
+        for tipo, estado, cidade in {
+            (linha['tipo'], linha['estado'], linha['cidade'] if linha['tipo'] == 'bairro' else None)
+            for linha in linhas
+        }:
+            filtro = {'tipo': tipo, 'estado': estado}
+            if cidade:
+                filtro['cidade'] = cidade
+            LocalizacaoInteresse.objects.filter(**filtro).delete()
+
+    def carregar(self, linhas, lote):
+        """Upsert das linhas; retorna (criadas, atualizadas)"""
+        # Um SELECT: código de cada localização existente pela chave natural
+        existentes = {}
+        codigos = set()
+        for codigo, tipo, nome, cidade, estado in LocalizacaoInteresse.objects.values_list(
+            'codigo', 'tipo', 'nome', 'cidade', 'estado'
+        ):
+            existentes[(tipo, nome, cidade, estado)] = codigo
+            codigos.add(codigo)
+
+        # Linhas repetidas nos arquivos: vale a última
+        por_chave = {(l['tipo'], l['nome'], l['cidade'], l['estado']): l for l in linhas}
+
+        # Ordem padrão: alfabética dentro de (tipo, cidade, estado), como antes
+        grupos = defaultdict(list)
+        for chave in por_chave:
+            grupos[(chave[0], chave[2], chave[3])].append(chave)
+        ordens = {}
+        for chaves in grupos.values():
+            for ordem, chave in enumerate(sorted(chaves, key=lambda c: c[1]), start=1):
+                ordens[chave] = ordem
+
+        # Um upsert por conjunto de campos opcionais presentes nas linhas
+        objetos = defaultdict(list)
+        criadas = 0
+        for chave, linha in por_chave.items():
+            objeto = LocalizacaoInteresse(
+                ordem=linha.get('ordem', ordens[chave]),
+                ativo=linha.get('ativo', True),
+                **{campo: linha[campo] for campo in ('tipo', 'nome', 'cidade', 'estado')},
+            )
+            objeto.codigo = existentes.get(chave)
+            if objeto.codigo is None:
+                objeto.codigo = objeto.gerar_codigo(codigos.__contains__)
+                codigos.add(objeto.codigo)
+                criadas += 1
+            objetos[tuple(campo for campo in CAMPOS_OPCIONAIS if campo in linha)].append(objeto)
 
+        for opcionais, grupo in objetos.items():
+            LocalizacaoInteresse.objects.bulk_create(
+                grupo,
+                batch_size=lote,
+                update_conflicts=True,
+                unique_fields=['codigo'],
+                update_fields=CAMPOS_ATUALIZADOS + list(opcionais),
+            )
+        return criadas, len(por_chave) - criadas
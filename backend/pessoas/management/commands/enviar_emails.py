@@ -0,0 +1,53 @@
+"""
+Comando Django para enviar os emails da fila (EmailPendente)
+Uso: python manage.py enviar_emails [--continuo]
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from backend.pessoas.email_service import processar_fila_emails
+
+
+class Command(BaseCommand):
+    help = 'Envia em lote os emails pendentes da fila, com nova tentativa e backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='Continuar consultando a fila indefinidamente (modo worker)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=settings.EMAIL_FILA_LOTE,
+            help='Quantidade de emails enviados por conexão SMTP',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=settings.EMAIL_FILA_INTERVALO,
+            help='Segundos de espera quando a fila está vazia (modo contínuo)',
+        )
+
+    def handle(self, *args, **options):
+        total_enviados, total_falhas = 0, 0
+
+        while True:
+            enviados, falhas = processar_fila_emails(options['lote'])
+            total_enviados += enviados
+            total_falhas += falhas
+
+            if enviados or falhas:
+                self.stdout.write(f'📧 Lote processado: {enviados} enviado(s), {falhas} falha(s)')
+                continue
+
+            # Fila vazia (ou apenas emails aguardando backoff)
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Total: {total_enviados} enviado(s), {total_falhas} falha(s)'
+        ))
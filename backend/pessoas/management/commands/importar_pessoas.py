@@ -0,0 +1,213 @@
+"""
+Comando Django para importar pessoas em lote (planilhas das ONGs parceiras)
+Uso: python manage.py importar_pessoas arquivo.csv|arquivo.jsonl [--lote 1000] [--processos N] [--erros erros.jsonl]
+
+O arquivo é lido em streaming, em lotes. Cada lote:
+1. valida as linhas com as regras de RegistroComCodigoSerializer (catálogos em cache)
+2. confere email, username e CPF numa única consulta (e contra o próprio arquivo)
+3. calcula os hashes de senha num pool de processos
+4. insere com bulk_create, inclusive as tabelas M2M de interesses
+
+No CSV, categorias_interesse e localizacoes_interesse são IDs separados por ';'.
+Linhas com erro são reportadas (stderr e, opcionalmente, um arquivo JSONL)
+sem interromper a importação.
+"""
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from backend.core.cache import NS_PESSOAS, invalidar_apos_commit
+from backend.pessoas.models import Pessoa
+from backend.pessoas.registro_pendente import compactar, instanciar_pessoa, vinculos_interesse
+from backend.pessoas.serializers import ImportacaoPessoaSerializer, normalizar_cpf
+
+CAMPOS_LISTA = ('categorias_interesse', 'localizacoes_interesse')
+
+
+def ler_csv(arquivo):
+    for numero, linha in enumerate(csv.DictReader(arquivo), start=2):
+        linha = {campo: (valor or '').strip() for campo, valor in linha.items() if campo}
+        for campo in CAMPOS_LISTA:
+            linha[campo] = [pk for pk in linha.get(campo, '').split(';') if pk.strip()]
+        if not linha.get('password'):
+            linha.pop('password', None)
+        yield numero, linha
+
+
+def ler_jsonl(arquivo):
+    for numero, texto in enumerate(arquivo, start=1):
+        if not texto.strip():
+            continue
+        try:
+            yield numero, json.loads(texto)
+        except ValueError:
+            yield numero, None
+
+
+class Command(BaseCommand):
+    help = 'Importa pessoas de um arquivo CSV ou JSONL com validação, hash e inserção em lote'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Arquivo .csv (com cabeçalho) ou .jsonl')
+        parser.add_argument(
+            '--formato',
+            choices=['csv', 'jsonl'],
+            help='Formato do arquivo (padrão: pela extensão)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Linhas validadas e inseridas por vez',
+        )
+        parser.add_argument(
+            '--processos',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processos para o hash das senhas (0 = no próprio processo)',
+        )
+        parser.add_argument(
+            '--erros',
+            help='Grava os erros por linha neste arquivo JSONL',
+        )
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or ('jsonl' if options['arquivo'].endswith(('.jsonl', '.json')) else 'csv')
+        leitor = ler_jsonl if formato == 'jsonl' else ler_csv
+        self.vistos = (set(), set(), set())  # emails, usernames e CPFs já aceitos no arquivo
+
+        self.pool = None
+        if options['processos'] > 0:
+            self.pool = ProcessPoolExecutor(max_workers=options['processos'], initializer=django.setup)
+
+        arquivo_erros = open(options['erros'], 'w', encoding='utf-8') if options['erros'] else None
+        total_importadas, total_erros = 0, 0
+        inicio = time.perf_counter()
+
+        try:
+            with open(options['arquivo'], newline='', encoding='utf-8-sig') as arquivo:
+                linhas = leitor(arquivo)
+                while lote := list(islice(linhas, options['lote'])):
+                    importadas, erros = self.importar_lote(lote)
+                    total_importadas += importadas
+                    total_erros += len(erros)
+                    for numero, erro in erros:
+                        self.stderr.write(f'Linha {numero}: {json.dumps(erro, ensure_ascii=False)}')
+                        if arquivo_erros:
+                            arquivo_erros.write(json.dumps({'linha': numero, 'erros': erro}, ensure_ascii=False) + '\n')
+                    self.stdout.write(f'📥 Lote: {importadas} importada(s), {len(erros)} erro(s)')
+        except OSError as erro:
+            raise CommandError(f'Não foi possível ler {options["arquivo"]}: {erro}')
+        finally:
+            if self.pool:
+                self.pool.shutdown()
+            if arquivo_erros:
+                arquivo_erros.close()
+
+        if total_importadas:
+            invalidar_apos_commit(NS_PESSOAS)
+
+        duracao = time.perf_counter() - inicio
+        por_segundo = (total_importadas + total_erros) / duracao if duracao else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Total: {total_importadas} importada(s), {total_erros} erro(s) '
+            f'em {duracao:.1f}s ({por_segundo:.0f} linhas/s)'
+        ))
+
+    def importar_lote(self, lote):
+        """Retorna (quantidade importada, [(linha, erros)])"""
+        validas, erros = self.validar(lote)
+        if not validas:
+            return 0, erros
+
+        hashes = self.calcular_hashes([dados.get('password') for _, dados in validas])
+        compactos = [(numero, compactar(dados, senha_hash)) for (numero, dados), senha_hash in zip(validas, hashes)]
+
+        try:
+            with transaction.atomic():
+                self.inserir([dados for _, dados in compactos])
+            return len(compactos), erros
+        except IntegrityError:
+            pass
+
+        # Conflito com um cadastro concorrente: inserir linha a linha para isolar
+        importadas = 0
+        for numero, dados in compactos:
+            try:
+                with transaction.atomic():
+                    self.inserir([dados])
+                importadas += 1
+            except IntegrityError:
+                erros.append((numero, {'non_field_errors': ['Email, nome de usuário ou CPF já cadastrado']}))
+        erros.sort(key=lambda item: item[0])
+        return importadas, erros
+
+    def calcular_hashes(self, senhas):
+        """make_password de cada senha (None = senha inutilizável), no pool de processos"""
+        if self.pool is None:
+            return [make_password(senha) for senha in senhas]
+        return list(self.pool.map(make_password, senhas, chunksize=64))
+
+    def validar(self, lote):
+        """Regras do serializer por linha e unicidade do lote numa consulta"""
+        validas, erros = [], []
+        for numero, dados in lote:
+            if not isinstance(dados, dict):
+                erros.append((numero, {'non_field_errors': ['Linha não é um objeto JSON válido']}))
+                continue
+            serializer = ImportacaoPessoaSerializer(data=dados)
+            if serializer.is_valid():
+                validas.append((numero, serializer.validated_data))
+            else:
+                erros.append((numero, serializer.errors))
+
+        chaves = [
+            (dados['email'].lower(), dados['username'], normalizar_cpf(dados['cpf']))
+            for _, dados in validas
+        ]
+        existentes = ImportacaoPessoaSerializer.consultar_existentes(*map(list, zip(*chaves))) if chaves else []
+        emails, usernames, cpfs = (set(conjunto) for conjunto in self.vistos)
+        for email, username, cpf in existentes:
+            emails.add(email.lower())
+            usernames.add(username)
+            cpfs.add(normalizar_cpf(cpf))
+
+        aceitas = []
+        for (numero, dados), (email, username, cpf) in zip(validas, chaves):
+            erro = {}
+            if email in emails:
+                erro['email'] = [ImportacaoPessoaSerializer.ERRO_EMAIL]
+            if username in usernames:
+                erro['username'] = [ImportacaoPessoaSerializer.ERRO_USERNAME]
+            if cpf in cpfs:
+                erro['cpf'] = [ImportacaoPessoaSerializer.ERRO_CPF]
+            if erro:
+                erros.append((numero, erro))
+                continue
+            for conjunto, valor in zip(self.vistos, (email, username, cpf)):
+                conjunto.add(valor)
+            emails.add(email)
+            usernames.add(username)
+            cpfs.add(cpf)
+            aceitas.append((numero, dados))
+
+        erros.sort(key=lambda item: item[0])
+        return aceitas, erros
+
+    def inserir(self, compactos):
+        pessoas = Pessoa.objects.bulk_create([instanciar_pessoa(dados) for dados in compactos])
+        categorias, localizacoes = [], []
+        for pessoa, dados in zip(pessoas, compactos):
+            linhas_categorias, linhas_localizacoes = vinculos_interesse(pessoa.pk, dados)
+            categorias += linhas_categorias
+            localizacoes += linhas_localizacoes
+        Pessoa.categorias_interesse.through.objects.bulk_create(categorias)
+        Pessoa.localizacoes_interesse.through.objects.bulk_create(localizacoes)
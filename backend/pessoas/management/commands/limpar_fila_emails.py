@@ -0,0 +1,32 @@
+"""
+Comando Django para limpar a fila de emails (EmailPendente)
+Uso: python manage.py limpar_fila_emails [--dias 7]
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from backend.pessoas.models import EmailPendente
+
+
+class Command(BaseCommand):
+    help = 'Remove da fila os emails expirados, enviados e com falha definitiva'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=7,
+            help='Manter por esse número de dias os emails com falha (para consulta no admin)',
+        )
+
+    def handle(self, *args, **options):
+        agora = timezone.now()
+        removidos, _ = EmailPendente.objects.filter(
+            Q(status='pendente', expira_em__lte=agora)
+            | Q(status='enviado')
+            | Q(status='falhou', data_criacao__lt=agora - timedelta(days=options['dias']))
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(f'✅ {removidos} email(s) removido(s) da fila'))
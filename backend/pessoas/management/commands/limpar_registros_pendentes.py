@@ -0,0 +1,31 @@
+"""
+Comando Django para remover avatares de registros pendentes abandonados
+Uso: python manage.py limpar_registros_pendentes
+"""
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from backend.pessoas.registro_pendente import PASTA_TEMPORARIA, VALIDADE_SEGUNDOS
+
+
+class Command(BaseCommand):
+    help = 'Remove os avatares temporários de registros que expiraram sem confirmação'
+
+    def handle(self, *args, **options):
+        if not default_storage.exists(PASTA_TEMPORARIA):
+            self.stdout.write('Nenhum avatar temporário')
+            return
+
+        limite = timezone.now() - timedelta(seconds=VALIDADE_SEGUNDOS)
+        _, arquivos = default_storage.listdir(PASTA_TEMPORARIA)
+        removidos = 0
+        for nome in arquivos:
+            caminho = f'{PASTA_TEMPORARIA}/{nome}'
+            if default_storage.get_modified_time(caminho) < limite:
+                default_storage.delete(caminho)
+                removidos += 1
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {removidos} avatar(es) temporário(s) removido(s)'))
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:39
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def verificar_emails_duplicados(apps, schema_editor):
+    """
+    Antes, o email era comparado com diferença de maiúsculas: 'Ana@x.com' e
+    'ana@x.com' podiam ser contas diferentes. Contas duplicadas não são
+    mescladas automaticamente; a migração para com a lista para correção manual.
+    """
+    Pessoa = apps.get_model('pessoas', 'Pessoa')
+    pessoas = Pessoa.objects.exclude(email='').annotate(
+        email_minusculo=django.db.models.functions.text.Lower('email')
+    ).order_by()
+    repetidos = (
+        pessoas.values('email_minusculo')
+        .annotate(total=models.Count('id'))
+        .filter(total__gt=1)
+        .values_list('email_minusculo', flat=True)
+    )
+    grupos = {}
+    for email, pk, username in pessoas.filter(email_minusculo__in=repetidos).values_list(
+        'email_minusculo', 'id', 'username'
+    ):
+        grupos.setdefault(email, []).append(f'{pk} ({username})')
+    if grupos:
+        linhas = '\n'.join(f'  - {", ".join(contas)}' for contas in grupos.values())
+        raise RuntimeError(
+            f'{len(grupos)} email(s) cadastrado(s) em mais de uma conta, variando só nas maiúsculas. '
+            'Mescle ou corrija as contas abaixo (id, username) e rode a migração de novo:\n' + linhas
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('pessoas', '0010_emailpendente'),
+    ]
+
+    operations = [
+        migrations.RunPython(verificar_emails_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='pessoa',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='pessoa_email_lower_unico'),
+        ),
+    ]
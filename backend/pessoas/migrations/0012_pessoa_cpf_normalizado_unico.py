@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:55
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def cpf_somente_digitos():
+    return django.db.models.functions.text.Replace(
+        django.db.models.functions.text.Replace(models.F('cpf'), models.Value('.'), models.Value('')),
+        models.Value('-'), models.Value(''),
+    )
+
+
+def verificar_cpfs_duplicados(apps, schema_editor):
+    """
+    Antes, o CPF era único só no texto exato: '123.456.789-00' e
+    '12345678900' podiam coexistir. Contas duplicadas não são mescladas
+    automaticamente; a migração para com a lista para correção manual.
+    """
+    Pessoa = apps.get_model('pessoas', 'Pessoa')
+    pessoas = Pessoa.objects.annotate(cpf_normalizado=cpf_somente_digitos()).order_by()
+    repetidos = (
+        pessoas.values('cpf_normalizado')
+        .annotate(total=models.Count('id'))
+        .filter(total__gt=1)
+        .values_list('cpf_normalizado', flat=True)
+    )
+    grupos = {}
+    for cpf, pk, username in pessoas.filter(cpf_normalizado__in=repetidos).values_list(
+        'cpf_normalizado', 'id', 'username'
+    ):
+        grupos.setdefault(cpf, []).append(f'{pk} ({username})')
+    if grupos:
+        linhas = '\n'.join(f'  - {", ".join(contas)}' for contas in grupos.values())
+        raise RuntimeError(
+            f'{len(grupos)} CPF(s) cadastrado(s) em mais de uma conta com pontuação diferente. '
+            'Mescle ou corrija as contas abaixo (id, username) e rode a migração de novo:\n' + linhas
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('pessoas', '0011_pessoa_email_lower_unico'),
+    ]
+
+    operations = [
+        migrations.RunPython(verificar_cpfs_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='pessoa',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Replace(django.db.models.functions.text.Replace(models.F('cpf'), models.Value('.'), models.Value('')), models.Value('-'), models.Value('')), name='pessoa_cpf_normalizado_unico'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pessoas', '0012_pessoa_cpf_normalizado_unico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailpendente',
+            name='expira_em',
+            field=models.DateTimeField(blank=True, help_text='Descartado sem envio depois deste horário (ex: códigos de verificação)', null=True, verbose_name='Expira em'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower, Replace
 from django.core.validators import MinLengthValidator
 from django.utils.text import slugify
 from django.utils import timezone
@@ -226,18 +227,47 @@ class LocalizacaoInteresse(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.codigo:
-            # Gera código diferenciado por tipo para evitar conflitos
-            # Para cidade: "recife-cidade"
-            # Para bairro: "recife-bairro" ou apenas "boa-viagem"
-            nome_normalizado = slugify(unicodedata.normalize('NFKD', self.nome).encode('ascii', 'ignore').decode('ascii'))
-            
-            # Se já existe com esse nome em outro tipo, adicionar sufixo
-            if LocalizacaoInteresse.objects.filter(codigo=nome_normalizado).exists():
-                self.codigo = f"{nome_normalizado}-{self.tipo}"
-            else:
-                self.codigo = nome_normalizado
+            self.codigo = self.gerar_codigo(
+                lambda codigo: LocalizacaoInteresse.objects.filter(codigo=codigo).exists()
+            )
         super().save(*args, **kwargs)
 
+    def gerar_codigo(self, em_uso):
+        """
+        Gera código diferenciado por tipo para evitar conflitos
+        Para cidade: "recife-cidade"
+        Para bairro: "recife-bairro" ou apenas "boa-viagem"
+        Bairros homônimos em outras cidades: "centro-bairro-olinda", ...
+
+        Args:
+            em_uso (callable): Recebe um código e diz se ele já existe (uma
+                consulta no save(), um set em memória na carga em lote)
+        """
+        nome_normalizado = slugify(unicodedata.normalize('NFKD', self.nome).encode('ascii', 'ignore').decode('ascii'))
+        candidatos = [nome_normalizado, f"{nome_normalizado}-{self.tipo}"]
+        if self.cidade and self.cidade != self.nome:
+            candidatos.append(f"{nome_normalizado}-{self.tipo}-{slugify(self.cidade)}")
+        candidatos.append(f"{candidatos[-1]}-{self.estado.lower()}")
+
+        for candidato in candidatos:
+            if not em_uso(candidato):
+                return candidato
+        sufixo = 2
+        while em_uso(f"{candidatos[-1]}-{sufixo}"):
+            sufixo += 1
+        return f"{candidatos[-1]}-{sufixo}"
+
+
+def cpf_somente_digitos():
+    """
+    Expressão do CPF sem pontuação, a mesma do índice pessoa_cpf_normalizado_unico
+    (consultas com .alias() sobre ela usam o índice)
+    """
+    return Replace(
+        Replace(models.F('cpf'), models.Value('.'), models.Value('')),
+        models.Value('-'), models.Value(''),
+    )
+
 
 class Pessoa(AbstractUser):
     # Campos básicos obrigatórios
@@ -319,6 +349,19 @@ class Pessoa(AbstractUser):
         verbose_name = "Pessoa"
         verbose_name_plural = "Pessoas"
         ordering = ['nome_completo']
+        constraints = [
+            # Login por email (EmailBackend) busca por LOWER(email)
+            models.UniqueConstraint(
+                Lower('email'),
+                condition=~models.Q(email=''),
+                name='pessoa_email_lower_unico',
+            ),
+            # "123.456.789-00" e "12345678900" são o mesmo CPF
+            models.UniqueConstraint(
+                cpf_somente_digitos(),
+                name='pessoa_cpf_normalizado_unico',
+            ),
+        ]
 
     def __str__(self):
         display_name = self.nome_social or self.nome_completo or self.username
@@ -329,17 +372,32 @@ class Pessoa(AbstractUser):
         """Retorna o nome que deve ser exibido publicamente"""
         return self.nome_social or self.nome_completo
     
+    @property
+    def tipo_usuario_codigo(self):
+        """Código do tipo de usuário (também presente nas claims do JWT)"""
+        return self.tipo_usuario.codigo
+    
+    @property
+    def organizadora_id(self):
+        """ID do perfil de organizadora, ou None (também presente nas claims do JWT)"""
+        perfil = getattr(self, 'perfil_organizadora', None)
+        return perfil.id if perfil else None
+    
     def get_categorias_interesse_display(self):
-        """Retorna as categorias de interesse formatadas"""
-        if not self.categorias_interesse.exists():
-            return "Nenhuma"
-        return [categoria.nome for categoria in self.categorias_interesse.all()]
+        """
+        Retorna as categorias de interesse formatadas.
+        Usa .all() para aproveitar o prefetch_related('categorias_interesse').
+        """
+        categorias = [categoria.nome for categoria in self.categorias_interesse.all()]
+        return categorias or "Nenhuma"
     
     def get_localizacoes_interesse_display(self):
-        """Retorna as localizações de interesse formatadas"""
-        if not self.localizacoes_interesse.exists():
-            return "Nenhuma"
-        return [localizacao.nome for localizacao in self.localizacoes_interesse.all()]
+        """
+        Retorna as localizações de interesse formatadas.
+        Usa .all() para aproveitar o prefetch_related('localizacoes_interesse').
+        """
+        localizacoes = [localizacao.nome for localizacao in self.localizacoes_interesse.all()]
+        return localizacoes or "Nenhuma"
 
 
 class CodigoVerificacao(models.Model):
@@ -445,4 +503,76 @@ class CodigoVerificacao(models.Model):
         
         # Criar novo código
         codigo = cls.objects.create(email=email, tipo=tipo)
-        return codigo
\ No newline at end of file
+        return codigo
+
+
+class EmailPendente(models.Model):
+    """
+    Fila (outbox) de emails a enviar fora do ciclo do request.
+    Preenchida pelo email_service e consumida pelo comando enviar_emails.
+    Emails enviados são removidos da fila; os que falham de vez ficam sem a
+    mensagem (que pode conter um código) até o comando limpar_fila_emails.
+    """
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('enviado', 'Enviado'),
+        ('falhou', 'Falhou'),
+    ]
+
+    destinatario = models.EmailField(
+        verbose_name="Destinatário"
+    )
+    assunto = models.CharField(
+        max_length=200,
+        verbose_name="Assunto"
+    )
+    mensagem = models.TextField(
+        verbose_name="Mensagem"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='pendente',
+        verbose_name="Status"
+    )
+    tentativas = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Tentativas",
+        help_text="Número de tentativas de envio"
+    )
+    proxima_tentativa = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Próxima Tentativa",
+        help_text="Não enviar antes deste horário (backoff entre falhas)"
+    )
+    expira_em = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Expira em",
+        help_text="Descartado sem envio depois deste horário (ex: códigos de verificação)"
+    )
+    ultimo_erro = models.TextField(
+        blank=True,
+        default='',
+        verbose_name="Último Erro"
+    )
+    data_criacao = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Data de Criação"
+    )
+    data_envio = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Data de Envio"
+    )
+
+    class Meta:
+        verbose_name = "Email Pendente"
+        verbose_name_plural = "Emails Pendentes"
+        ordering = ['proxima_tentativa', 'id']
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa']),
+        ]
+
+    def __str__(self):
+        return f"{self.destinatario} - {self.assunto} ({self.get_status_display()})"
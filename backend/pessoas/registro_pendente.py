@@ -0,0 +1,133 @@
+"""
+Registros pendentes (entre iniciar_registro e confirmar_registro)
+
+O cache guarda só campos primitivos, compatíveis com o JSONSerializer do
+Redis: a senha já vai como hash (calculado no pool de senhas.py ao iniciar o
+registro), relações como ids e o avatar como o caminho de um arquivo
+temporário no storage, em PASTA_TEMPORARIA. Na confirmação resta apenas o
+INSERT, sem calcular hash nem reprocessar o upload.
+
+Avatares de registros nunca confirmados são removidos pelo comando
+limpar_registros_pendentes.
+"""
+import os
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .models import Pessoa
+from .senhas import gerar_hash_async
+
+VALIDADE_SEGUNDOS = 15 * 60
+PASTA_TEMPORARIA = 'registros_pendentes'
+
+CAMPOS_TEXTO = (
+    'email', 'username', 'nome_completo', 'cpf', 'telefone',
+    'cidade', 'bairro', 'nome_social', 'mini_bio',
+)
+
+
+def _chave(email):
+    return f'registro_pendente_{email}'
+
+
+def _salvar_avatar_temporario(avatar):
+    extensao = os.path.splitext(avatar.name)[1].lower()
+    return default_storage.save(f'{PASTA_TEMPORARIA}/{uuid.uuid4().hex}{extensao}', avatar)
+
+
+def _remover_avatar_temporario(dados):
+    if dados and dados.get('avatar'):
+        default_storage.delete(dados['avatar'])
+
+
+def compactar(validated_data, senha_hash):
+    """Campos primitivos de um RegistroComCodigoSerializer validado (sem avatar)"""
+    dados = {campo: validated_data[campo] for campo in CAMPOS_TEXTO}
+    dados['password'] = senha_hash
+    dados['tipo_usuario_id'] = validated_data['tipo_usuario'].pk
+    dados['genero_id'] = validated_data['genero'].pk
+    dados['categorias_interesse'] = [c.pk for c in validated_data.get('categorias_interesse', [])]
+    dados['localizacoes_interesse'] = [l.pk for l in validated_data.get('localizacoes_interesse', [])]
+    return dados
+
+
+def instanciar_pessoa(dados):
+    """Pessoa ainda não salva, sem interesses nem avatar, a partir de compactar()"""
+    campos = {
+        campo: valor for campo, valor in dados.items()
+        if campo not in ('categorias_interesse', 'localizacoes_interesse', 'avatar')
+    }
+    pessoa = Pessoa(**campos)
+    pessoa.email = Pessoa.objects.normalize_email(pessoa.email)
+    pessoa.username = Pessoa.normalize_username(pessoa.username)
+    return pessoa
+
+
+def vinculos_interesse(pessoa_id, dados):
+    """Linhas das tabelas M2M de interesses de uma pessoa recém-criada"""
+    Categorias = Pessoa.categorias_interesse.through
+    Localizacoes = Pessoa.localizacoes_interesse.through
+    categorias = [
+        Categorias(pessoa_id=pessoa_id, categoriainteresse_id=pk)
+        for pk in dados.get('categorias_interesse', [])
+    ]
+    localizacoes = [
+        Localizacoes(pessoa_id=pessoa_id, localizacaointeresse_id=pk)
+        for pk in dados.get('localizacoes_interesse', [])
+    ]
+    return categorias, localizacoes
+
+
+async def asalvar_registro(validated_data):
+    """
+    Guarda os dados validados de RegistroComCodigoSerializer por
+    VALIDADE_SEGUNDOS, substituindo um registro pendente anterior do email
+    """
+    dados = compactar(validated_data, await gerar_hash_async(validated_data['password']))
+
+    avatar = validated_data.get('avatar')
+    if avatar:
+        dados['avatar'] = await sync_to_async(_salvar_avatar_temporario)(avatar)
+
+    chave = _chave(dados['email'])
+    anterior = await cache.aget(chave)
+    await cache.aset(chave, dados, VALIDADE_SEGUNDOS)
+    await sync_to_async(_remover_avatar_temporario)(anterior)
+    return dados
+
+
+def obter_registro(email):
+    """Dados pendentes do email, ou None se expiraram"""
+    return cache.get(_chave(email))
+
+
+def criar_pessoa(dados):
+    """
+    Cria a Pessoa a partir de um registro pendente, com o hash de senha já
+    calculado. O registro pendente e o avatar temporário são descartados
+    após o commit.
+    """
+    pessoa = instanciar_pessoa(dados)
+    caminho_avatar = dados.get('avatar')
+    if caminho_avatar:
+        with default_storage.open(caminho_avatar) as arquivo:
+            pessoa.avatar.save(os.path.basename(caminho_avatar), File(arquivo), save=False)
+    pessoa.save()
+
+    # Pessoa recém-criada: sem vínculos a conferir, um INSERT por relação
+    for linhas in vinculos_interesse(pessoa.pk, dados):
+        if linhas:
+            type(linhas[0]).objects.bulk_create(linhas)
+
+    def descartar():
+        cache.delete(_chave(dados['email']))
+        if caminho_avatar:
+            default_storage.delete(caminho_avatar)
+
+    transaction.on_commit(descartar)
+    return pessoa
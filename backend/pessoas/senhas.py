@@ -0,0 +1,65 @@
+"""
+Hash e verificação de senhas num pool de threads limitado
+
+O cálculo do hash (Argon2, bcrypt, PBKDF2) libera o GIL, mas é caro: sem
+limite, um pico de logins disputa todos os núcleos com o resto da API.
+Aqui no máximo settings.SENHA_HASH_THREADS hashes rodam ao mesmo tempo por
+processo; os demais aguardam na fila do pool. A versão async do hash (usada
+no registro) não ocupa o event loop enquanto espera.
+
+Só o cálculo roda no pool; a gravação do hash atualizado (rehash) acontece
+na thread de quem chamou, dentro da conexão/transação do request.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+_executor = None
+_trava = threading.Lock()
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _trava:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.SENHA_HASH_THREADS,
+                    thread_name_prefix='hash-senha',
+                )
+    return _executor
+
+
+def _conferir(senha, encoded):
+    """Retorna (valida, precisa_atualizar) sem tocar no banco"""
+    desatualizada = []
+    valida = check_password(senha, encoded, setter=desatualizada.append)
+    return valida, bool(desatualizada)
+
+
+def _salvar_rehash(pessoa, novo_hash):
+    pessoa.password = novo_hash
+    pessoa.save(update_fields=['password'])
+
+
+def gerar_hash(senha):
+    """make_password executado no pool"""
+    return _pool().submit(make_password, senha).result()
+
+
+def verificar_senha(pessoa, senha):
+    """
+    Confere a senha da pessoa. Se o hash gravado usa um algoritmo ou custo
+    antigo, grava o hash no perfil atual (rehash transparente no login).
+    """
+    valida, precisa_atualizar = _pool().submit(_conferir, senha, pessoa.password).result()
+    if valida and precisa_atualizar:
+        _salvar_rehash(pessoa, gerar_hash(senha))
+    return valida
+
+
+async def gerar_hash_async(senha):
+    return await asyncio.wrap_future(_pool().submit(make_password, senha))
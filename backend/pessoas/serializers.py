@@ -1,6 +1,68 @@
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 from django.contrib.auth import authenticate
-from .models import Pessoa, TipoUsuario, Genero, CategoriaInteresse, LocalizacaoInteresse
+from django.db.models import Q
+from django.db.models.functions import Lower
+from .models import Pessoa, TipoUsuario, Genero, CategoriaInteresse, LocalizacaoInteresse, cpf_somente_digitos
+from .catalogos import obter_catalogo
+
+
+def normalizar_cpf(cpf):
+    """CPF só com dígitos, como no índice pessoa_cpf_normalizado_unico"""
+    return cpf.replace('.', '').replace('-', '')
+
+
+class CatalogoPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField validado contra o catálogo em cache
+    (memória do processo + Redis), sem uma consulta ao banco por ID.
+    Com many=True a lista inteira é resolvida de uma vez (resolver).
+    """
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for chave in kwargs:
+            if chave in MANY_RELATION_KWARGS:
+                list_kwargs[chave] = kwargs[chave]
+        return CatalogoManyRelatedField(**list_kwargs)
+
+    def _pk(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    def resolver(self, dados):
+        """
+        Instâncias dos IDs em `dados`, na mesma ordem. Os IDs ausentes do
+        catálogo em cache (ex: registro criado há poucos segundos, ainda não
+        visto pelo cache do processo) são conferidos numa única consulta id__in.
+        """
+        pks = [self._pk(dado) for dado in dados]
+        catalogo = obter_catalogo(self.get_queryset().model)
+        encontrados = {pk: catalogo[pk] for pk in pks if pk in catalogo}
+        faltando = set(pks) - encontrados.keys()
+        if faltando:
+            encontrados.update(self.get_queryset().in_bulk(faltando))
+        for pk, dado in zip(pks, dados):
+            if pk not in encontrados:
+                self.fail('does_not_exist', pk_value=dado)
+        return [encontrados[pk] for pk in pks]
+
+    def to_internal_value(self, data):
+        return self.resolver([data])[0]
+
+
+class CatalogoManyRelatedField(serializers.ManyRelatedField):
+    """Lista de IDs de catálogo validada em lote (CatalogoPrimaryKeyRelatedField.resolver)"""
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        return self.child_relation.resolver(list(data))
 
 
 class TipoUsuarioSerializer(serializers.ModelSerializer):
@@ -100,8 +162,16 @@ class PessoaSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'date_joined', 'nome_exibicao', 'categorias_interesse_display']
     
+    @classmethod
+    def otimizar_queryset(cls, queryset):
+        """
+        Carrega as relações M2M usadas pelo serializer em 2 consultas,
+        independentemente de quantas pessoas forem serializadas
+        """
+        return queryset.prefetch_related('categorias_interesse', 'localizacoes_interesse')
+    
     def get_categorias_interesse_display(self, obj):
-        """Retorna as categorias de interesse formatadas"""
+        """Retorna as categorias de interesse formatadas (lidas do prefetch, se houver)"""
         return obj.get_categorias_interesse_display()
     
     def validate_cpf(self, value):
@@ -190,6 +260,10 @@ class RegistroComCodigoSerializer(serializers.Serializer):
     Serializer para registro de usuário (primeira etapa - sem código)
     O código será enviado por email após validação inicial
     """
+    ERRO_EMAIL = "Este email já está cadastrado"
+    ERRO_USERNAME = "Este nome de usuário já está em uso"
+    ERRO_CPF = "Este CPF já está cadastrado"
+    
     # Dados obrigatórios para cadastro
     email = serializers.EmailField(help_text="Email válido (receberá código de verificação)")
     username = serializers.CharField(
@@ -206,11 +280,11 @@ class RegistroComCodigoSerializer(serializers.Serializer):
     cpf = serializers.CharField(help_text="CPF (formato: 000.000.000-00)")
     telefone = serializers.CharField(help_text="Telefone com DDD")
     
-    tipo_usuario = serializers.PrimaryKeyRelatedField(
+    tipo_usuario = CatalogoPrimaryKeyRelatedField(
         queryset=TipoUsuario.objects.all(),
         help_text="ID do tipo de usuário (1=Beneficiária, 2=Doadora)"
     )
-    genero = serializers.PrimaryKeyRelatedField(
+    genero = CatalogoPrimaryKeyRelatedField(
         queryset=Genero.objects.all(),
         help_text="ID do gênero"
     )
@@ -222,39 +296,78 @@ class RegistroComCodigoSerializer(serializers.Serializer):
     
     # Campos opcionais
     avatar = serializers.ImageField(required=False, help_text="Foto de perfil")
-    categorias_interesse = serializers.PrimaryKeyRelatedField(
+    categorias_interesse = CatalogoPrimaryKeyRelatedField(
         many=True,
         queryset=CategoriaInteresse.objects.all(),
         required=False,
         help_text="IDs das categorias de interesse"
     )
-    localizacoes_interesse = serializers.PrimaryKeyRelatedField(
+    localizacoes_interesse = CatalogoPrimaryKeyRelatedField(
         many=True,
         queryset=LocalizacaoInteresse.objects.all(),
         required=False,
         help_text="IDs das localizações de interesse"
     )
     
-    def validate_email(self, value):
-        """Verifica se email já está em uso"""
-        if Pessoa.objects.filter(email=value).exists():
-            raise serializers.ValidationError("Este email já está cadastrado")
-        return value
-    
-    def validate_username(self, value):
-        """Verifica se username já está em uso"""
-        if Pessoa.objects.filter(username=value).exists():
-            raise serializers.ValidationError("Este nome de usuário já está em uso")
-        return value
-    
     def validate_cpf(self, value):
         """Valida formato do CPF"""
-        cpf_limpo = value.replace('.', '').replace('-', '')
+        cpf_limpo = normalizar_cpf(value)
         if len(cpf_limpo) != 11 or not cpf_limpo.isdigit():
             raise serializers.ValidationError("CPF inválido")
-        if Pessoa.objects.filter(cpf=value).exists():
-            raise serializers.ValidationError("Este CPF já está cadastrado")
         return value
+    
+    def validate(self, attrs):
+        """
+        Email, username e CPF já cadastrados, numa única consulta (índices de
+        LOWER(email), username e CPF só com dígitos)
+        """
+        email = attrs['email'].lower()
+        username = attrs['username']
+        cpf = normalizar_cpf(attrs['cpf'])
+        
+        existentes = self.consultar_existentes([email], [username], [cpf])[:3]
+        
+        erros = {}
+        for email_existente, username_existente, cpf_existente in existentes:
+            if email_existente.lower() == email:
+                erros['email'] = [self.ERRO_EMAIL]
+            if username_existente == username:
+                erros['username'] = [self.ERRO_USERNAME]
+            if normalizar_cpf(cpf_existente) == cpf:
+                erros['cpf'] = [self.ERRO_CPF]
+        if erros:
+            raise serializers.ValidationError(erros)
+        return attrs
+    
+    @staticmethod
+    def consultar_existentes(emails, usernames, cpfs):
+        """
+        (email, username, cpf) das pessoas que já usam algum dos emails
+        (minúsculos), usernames ou CPFs (só dígitos) informados
+        """
+        return (
+            Pessoa.objects
+            .alias(email_normalizado=Lower('email'), cpf_normalizado=cpf_somente_digitos())
+            .filter(
+                Q(email_normalizado__in=emails)
+                | Q(username__in=usernames)
+                | Q(cpf_normalizado__in=cpfs)
+            )
+            .order_by()
+            .values_list('email', 'username', 'cpf')
+        )
+
+
+class ImportacaoPessoaSerializer(RegistroComCodigoSerializer):
+    """
+    Mesmas regras do registro, para o comando importar_pessoas: a unicidade
+    é conferida por lote no comando e a senha é opcional (sem senha, a conta
+    fica com senha inutilizável até a recuperação de senha)
+    """
+    password = serializers.CharField(write_only=True, min_length=8, required=False)
+    
+    def validate(self, attrs):
+        return attrs
 
 
 class ConfirmarRegistroSerializer(serializers.Serializer):
@@ -284,19 +397,17 @@ class LoginComCodigoSerializer(serializers.Serializer):
         email = attrs.get('email')
         password = attrs.get('password')
         
-        try:
-            pessoa = Pessoa.objects.get(email=email)
-            user = authenticate(username=pessoa.username, password=password)
-            
-            if not user:
-                raise serializers.ValidationError("Email ou senha inválidos")
-            if not user.is_active:
-                raise serializers.ValidationError("Conta inativa. Entre em contato com o suporte")
-            
-            attrs['user'] = user
-            return attrs
-        except Pessoa.DoesNotExist:
+        # EmailBackend: uma consulta pelo índice de email, com os interesses
+        # já carregados para o PessoaSerializer da resposta
+        user = authenticate(self.context.get('request'), email=email, password=password)
+        
+        if not user:
             raise serializers.ValidationError("Email ou senha inválidos")
+        if not user.is_active:
+            raise serializers.ValidationError("Conta inativa. Entre em contato com o suporte")
+        
+        attrs['user'] = user
+        return attrs
 
 
 class SolicitarRecuperacaoSenhaSerializer(serializers.Serializer):
@@ -304,12 +415,7 @@ class SolicitarRecuperacaoSenhaSerializer(serializers.Serializer):
     Serializer para solicitar recuperação de senha
     """
     email = serializers.EmailField(help_text="Email cadastrado na conta")
-    
-    def validate_email(self, value):
-        """Verifica se o email existe no sistema"""
-        if not Pessoa.objects.filter(email=value).exists():
-            raise serializers.ValidationError("Email não encontrado")
-        return value
+    # A existência do email é verificada na view, com o ORM async
 
 
 class RedefinirSenhaSerializer(serializers.Serializer):
@@ -0,0 +1,72 @@
+"""
+Invalidação do cache de dados que exibem informações de Pessoa
+(nome e avatar nos cards de campanha) e dos catálogos de cadastro, e
+revogação dos tokens JWT de contas desativadas ou removidas.
+"""
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from backend.core.cache import NS_PESSOAS, NS_CATALOGOS, invalidar_apos_commit
+from .models import Pessoa
+from .catalogos import MODELOS_CATALOGO
+from .tokens import revogar_tokens
+
+# Campos de Pessoa exibidos nos cards cacheados (nome de exibição e avatar)
+CAMPOS_EXIBIDOS_NO_CACHE = ('nome_social', 'nome_completo', 'avatar')
+
+
+@receiver(pre_save, sender=Pessoa)
+def guardar_campos_exibidos_anteriores(sender, instance, update_fields=None, **kwargs):
+    """Guarda nome e avatar anteriores para só invalidar os cards se mudarem"""
+    instance._campos_exibidos_anteriores = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(CAMPOS_EXIBIDOS_NO_CACHE):
+        return
+    instance._campos_exibidos_anteriores = Pessoa.objects.filter(
+        pk=instance.pk
+    ).values_list(*CAMPOS_EXIBIDOS_NO_CACHE).first()
+
+
+@receiver(post_save, sender=Pessoa)
+def invalidar_cache_pessoa(sender, instance, created=False, **kwargs):
+    # Uma pessoa nova ainda não aparece em nenhum card
+    anteriores = getattr(instance, '_campos_exibidos_anteriores', None)
+    if created or anteriores is None:
+        return
+    atuais = tuple(getattr(instance, campo) for campo in CAMPOS_EXIBIDOS_NO_CACHE)
+    if atuais != anteriores:
+        invalidar_apos_commit(NS_PESSOAS)
+
+
+@receiver(post_delete, sender=Pessoa)
+def invalidar_cache_pessoa_removida(sender, instance, **kwargs):
+    invalidar_apos_commit(NS_PESSOAS)
+
+
+def revogar_tokens_apos_commit(pessoa_id):
+    """Revoga só se a transação confirmar: num rollback a conta segue ativa"""
+    transaction.on_commit(lambda: revogar_tokens(pessoa_id))
+
+
+@receiver(post_save, sender=Pessoa)
+def revogar_tokens_conta_desativada(sender, instance, **kwargs):
+    # Na reativação a marca de revogação fica: os tokens emitidos depois dela
+    # já passam (iat posterior) e os anteriores à desativação continuam recusados
+    if not instance.is_active:
+        revogar_tokens_apos_commit(instance.pk)
+
+
+@receiver(post_delete, sender=Pessoa)
+def revogar_tokens_pessoa_removida(sender, instance, **kwargs):
+    revogar_tokens_apos_commit(instance.pk)
+
+
+def invalidar_catalogos(sender, instance, **kwargs):
+    invalidar_apos_commit(NS_CATALOGOS)
+
+
+for modelo in MODELOS_CATALOGO:
+    post_save.connect(invalidar_catalogos, sender=modelo, dispatch_uid=f'catalogo_save_{modelo.__name__}')
+    post_delete.connect(invalidar_catalogos, sender=modelo, dispatch_uid=f'catalogo_delete_{modelo.__name__}')
@@ -1,3 +1,878 @@
-from django.test import TestCase
+import gzip
+import json
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from backend.core.cache import limpar_cache_local
+from backend.core.throttling import consumir
+from .authentication import PessoaJWTAuthentication
+from .catalogos import obter_catalogo
+from .codigos import (
+    BancoCodigoStore, CodigoStore, RedisCodigoStore, MAX_TENTATIVAS, MENSAGEM_INVALIDO, obter_codigo_store,
+)
+from .email_service import enviar_codigo_verificacao, enfileirar_email, processar_fila_emails
+from .registro_pendente import PASTA_TEMPORARIA, obter_registro
+from .models import Pessoa, TipoUsuario, Genero, CategoriaInteresse, LocalizacaoInteresse, EmailPendente, CodigoVerificacao
+from .serializers import PessoaSerializer, RegistroComCodigoSerializer
+from .tokens import PessoaRefreshToken
+
+
+class PessoaSerializerConsultasTest(TestCase):
+    """Serializar muitas pessoas deve custar um número fixo de consultas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        tipo = TipoUsuario.objects.create(nome='Doadora')
+        genero = Genero.objects.create(nome='Outro')
+        categorias = [CategoriaInteresse.objects.create(nome=f'Categoria {i}') for i in range(3)]
+        localizacao = LocalizacaoInteresse.objects.create(nome='Boa Viagem', cidade='Recife')
+
+        Pessoa.objects.bulk_create([
+            Pessoa(
+                username=f'pessoa{i}',
+                email=f'pessoa{i}@teste.com',
+                cpf=f'{i:011d}',
+                nome_completo=f'Pessoa {i}',
+                tipo_usuario=tipo,
+                genero=genero,
+            )
+            for i in range(1000)
+        ])
+        pessoas = list(Pessoa.objects.all())
+        Categorias = Pessoa.categorias_interesse.through
+        Localizacoes = Pessoa.localizacoes_interesse.through
+        Categorias.objects.bulk_create([
+            Categorias(pessoa_id=pessoa.id, categoriainteresse_id=categoria.id)
+            for pessoa in pessoas[::2]
+            for categoria in categorias
+        ])
+        Localizacoes.objects.bulk_create([
+            Localizacoes(pessoa_id=pessoa.id, localizacaointeresse_id=localizacao.id)
+            for pessoa in pessoas
+        ])
+
+    def test_serializar_mil_pessoas_em_consultas_limitadas(self):
+        queryset = PessoaSerializer.otimizar_queryset(Pessoa.objects.all())
+
+        # 1 consulta de pessoas + 1 prefetch por relação M2M
+        with self.assertNumQueries(3):
+            dados = PessoaSerializer(queryset, many=True).data
+
+        self.assertEqual(len(dados), 1000)
+        com_categorias = [d for d in dados if d['categorias_interesse']]
+        self.assertEqual(len(com_categorias), 500)
+        self.assertEqual(len(com_categorias[0]['categorias_interesse_display']), 3)
+        sem_categorias = [d for d in dados if not d['categorias_interesse']]
+        self.assertEqual(sem_categorias[0]['categorias_interesse_display'], 'Nenhuma')
+
+
+class CatalogoCacheTest(TestCase):
+    """Validação de IDs de catálogo no cadastro sem consultas por ID"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tipo = TipoUsuario.objects.create(nome='Doadora')
+        cls.genero = Genero.objects.create(nome='Outro')
+        cls.categorias = [CategoriaInteresse.objects.create(nome=f'Categoria {i}') for i in range(3)]
+        cls.localizacao = LocalizacaoInteresse.objects.create(nome='Boa Viagem', cidade='Recife')
+
+    def setUp(self):
+        cache.clear()
+        limpar_cache_local()
+
+    def _dados_registro(self, **extra):
+        dados = {
+            'email': 'nova@teste.com',
+            'username': 'nova',
+            'password': 'senha-forte-123',
+            'nome_completo': 'Nova Pessoa',
+            'cpf': '123.456.789-00',
+            'telefone': '(81) 99999-0000',
+            'tipo_usuario': self.tipo.id,
+            'genero': self.genero.id,
+            'cidade': 'Recife',
+            'bairro': 'Boa Viagem',
+            'nome_social': 'Nova',
+            'mini_bio': 'Bio',
+            'categorias_interesse': [c.id for c in self.categorias],
+            'localizacoes_interesse': [self.localizacao.id],
+        }
+        dados.update(extra)
+        return dados
+
+    def test_ids_de_catalogo_validados_sem_consultar_o_banco(self):
+        RegistroComCodigoSerializer(data=self._dados_registro()).is_valid()
+
+        # Catálogos quentes: só resta a verificação de unicidade (uma consulta)
+        with self.assertNumQueries(1):
+            serializer = RegistroComCodigoSerializer(data=self._dados_registro())
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        dados = serializer.validated_data
+        self.assertEqual(dados['tipo_usuario'].nome, 'Doadora')
+        self.assertEqual([c.nome for c in dados['categorias_interesse']], [c.nome for c in self.categorias])
+
+    def test_ids_fora_do_cache_conferidos_numa_consulta_id_in(self):
+        RegistroComCodigoSerializer(data=self._dados_registro()).is_valid()
+        # bulk_create não dispara sinais: o catálogo em cache não conhece as novas
+        novas = CategoriaInteresse.objects.bulk_create(
+            [CategoriaInteresse(nome='Nova 1', codigo='nova-1'), CategoriaInteresse(nome='Nova 2', codigo='nova-2')]
+        )
+        ids = [self.categorias[0].id, *(c.id for c in novas)]
+
+        with self.assertNumQueries(2):  # unicidade + um id__in para as duas novas
+            serializer = RegistroComCodigoSerializer(data=self._dados_registro(categorias_interesse=ids))
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual([c.id for c in serializer.validated_data['categorias_interesse']], ids)
+
+        serializer = RegistroComCodigoSerializer(data=self._dados_registro(categorias_interesse=[ids[0], 999999]))
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('999999', str(serializer.errors['categorias_interesse']))
+
+    def test_unicidade_de_email_username_e_cpf_numa_consulta(self):
+        Pessoa.objects.create(
+            username='existente', email='Existente@Teste.com', cpf='12345678900',
+            tipo_usuario=self.tipo, genero=self.genero,
+        )
+        dados = self._dados_registro(email='existente@teste.com', username='existente', cpf='123.456.789-00')
+        RegistroComCodigoSerializer(data=dados).is_valid()
+
+        with self.assertNumQueries(1):
+            serializer = RegistroComCodigoSerializer(data=dados)
+            self.assertFalse(serializer.is_valid())
+        self.assertEqual(set(serializer.errors), {'email', 'username', 'cpf'})
+
+        serializer = RegistroComCodigoSerializer(data=self._dados_registro(cpf='123.456.789-00'))
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(set(serializer.errors), {'cpf'})
+
+    def test_cpf_normalizado_unico_no_banco(self):
+        Pessoa.objects.create(username='a', email='a@teste.com', cpf='123.456.789-00',
+                              tipo_usuario=self.tipo, genero=self.genero)
+        with self.assertRaises(IntegrityError):
+            Pessoa.objects.create(username='b', email='b@teste.com', cpf='12345678900',
+                                  tipo_usuario=self.tipo, genero=self.genero)
+
+    def test_id_inexistente_e_rejeitado(self):
+        serializer = RegistroComCodigoSerializer(data=self._dados_registro(genero=9999))
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('genero', serializer.errors)
+
+    def test_alteracao_de_catalogo_invalida_o_cache(self):
+        self.client.get('/api/auth/opcoes/')
+        self.assertEqual(len(obter_catalogo(CategoriaInteresse)), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nova = CategoriaInteresse.objects.create(nome='Nova Categoria')
+
+        self.assertIn(nova.id, obter_catalogo(CategoriaInteresse))
+        resposta = self.client.get('/api/auth/opcoes/')
+        self.assertIn('Nova Categoria', [c['nome'] for c in resposta.json()['categorias_interesse']])
+
+    def test_opcoes_pre_renderizadas_com_etag_e_gzip(self):
+        resposta = self.client.get('/api/auth/opcoes/')
+        self.assertEqual(resposta.status_code, 200)
+        etag = resposta['ETag']
+        self.assertIn('max-age', resposta['Cache-Control'])
+
+        comprimida = self.client.get('/api/auth/opcoes/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(comprimida['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(comprimida.content), resposta.content)
+        self.assertEqual(comprimida['ETag'], etag)
+
+        with self.assertNumQueries(0):
+            nao_modificada = self.client.get('/api/auth/opcoes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(nao_modificada.status_code, 304)
+        self.assertEqual(nao_modificada.content, b'')
+
+
+class LoginPorEmailTest(TestCase):
+    """Login busca a pessoa uma única vez pelo índice de email"""
+
+    @classmethod
+    def setUpTestData(cls):
+        tipo = TipoUsuario.objects.create(nome='Doadora')
+        genero = Genero.objects.create(nome='Outro')
+        cls.pessoa = Pessoa.objects.create_user(
+            username='login', password='senha-de-teste', email='Login@Teste.com',
+            cpf='55500000000', nome_completo='Pessoa Login', nome_social='Login',
+            tipo_usuario=tipo, genero=genero,
+        )
+        cls.pessoa.categorias_interesse.add(CategoriaInteresse.objects.create(nome='Educação'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_login_em_uma_consulta_mais_interesses(self):
+        with self.assertNumQueries(3):  # pessoa + 2 prefetch dos interesses
+            resposta = self.client.post('/api/auth/login/', {
+                'email': 'login@teste.com', 'password': 'senha-de-teste',
+            }, content_type='application/json')
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['user']['id'], self.pessoa.id)
+        self.assertEqual(resposta.data['user']['categorias_interesse_display'], ['Educação'])
+
+    def test_senha_errada_ou_email_inexistente(self):
+        for email, senha in [('login@teste.com', 'errada'), ('ninguem@teste.com', 'senha-de-teste')]:
+            resposta = self.client.post('/api/auth/login/', {
+                'email': email, 'password': senha,
+            }, content_type='application/json')
+            self.assertEqual(resposta.status_code, 401)
+
+    @override_settings(
+        PASSWORD_HASHERS=[
+            'backend.pessoas.hashers.PBKDF2PasswordHasher',
+            'django.contrib.auth.hashers.MD5PasswordHasher',
+        ],
+        SENHA_HASH_CUSTO={'pbkdf2': {'iterations': 1000}},
+    )
+    def test_login_refaz_hash_antigo(self):
+        Pessoa.objects.filter(pk=self.pessoa.pk).update(
+            password=make_password('senha-de-teste', hasher='md5')
+        )
+        dados = {'email': 'login@teste.com', 'password': 'senha-de-teste'}
+
+        self.assertEqual(self.client.post('/api/auth/login/', dados, content_type='application/json').status_code, 200)
+        self.pessoa.refresh_from_db()
+        self.assertTrue(self.pessoa.password.startswith('pbkdf2_sha256$1000$'))
+
+        # Aumentar o custo configurado também refaz o hash no próximo login
+        with self.settings(SENHA_HASH_CUSTO={'pbkdf2': {'iterations': 1500}}):
+            self.assertEqual(self.client.post('/api/auth/login/', dados, content_type='application/json').status_code, 200)
+        self.pessoa.refresh_from_db()
+        self.assertTrue(self.pessoa.password.startswith('pbkdf2_sha256$1500$'))
+
+    def test_token_por_username_confere_a_senha_no_pool(self):
+        threads = []
+
+        def conferir(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return check_password(*args, **kwargs)
+
+        with mock.patch('backend.pessoas.senhas.check_password', side_effect=conferir), \
+                mock.patch('django.contrib.auth.base_user.check_password', side_effect=conferir):
+            resposta = self.client.post('/api/token/', {
+                'username': 'login', 'password': 'senha-de-teste',
+            }, content_type='application/json')
+            self.assertEqual(resposta.status_code, 200)
+            self.assertIn('access', resposta.data)
+
+            # Senha errada: um único hash, sem segunda tentativa por outro backend
+            resposta = self.client.post('/api/token/', {
+                'username': 'login', 'password': 'errada',
+            }, content_type='application/json')
+            self.assertEqual(resposta.status_code, 401)
+
+        self.assertEqual(len(threads), 2)
+        self.assertTrue(all(nome.startswith('hash-senha') for nome in threads), threads)
+
+    def test_email_unico_sem_diferenciar_maiusculas(self):
+        with self.assertRaises(IntegrityError):
+            Pessoa.objects.create_user(
+                username='outra', password='x', email='LOGIN@teste.com',
+                cpf='55500000001', tipo_usuario=self.pessoa.tipo_usuario,
+                genero=self.pessoa.genero,
+            )
+
+
+class AutenticacaoPorClaimsTest(TestCase):
+    """request.user vem das claims do JWT, sem SELECT em Pessoa"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tipo = TipoUsuario.objects.create(nome='Doadora')
+        cls.pessoa = Pessoa.objects.create_user(
+            username='claims', password='senha-de-teste', email='claims@teste.com',
+            cpf='66600000000', nome_completo='Pessoa Claims', nome_social='Claims',
+            tipo_usuario=cls.tipo, genero=Genero.objects.create(nome='Outro'),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+
+    def _autenticar(self, token):
+        requisicao = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return PessoaJWTAuthentication().authenticate(requisicao)[0]
+
+    def test_usuario_montado_das_claims(self):
+        token = PessoaRefreshToken.for_user(self.pessoa).access_token
+
+        with self.assertNumQueries(0):
+            usuario = self._autenticar(token)
+            self.assertEqual(usuario.id, self.pessoa.id)
+            self.assertEqual(usuario.tipo_usuario_codigo, 'doadora')
+            self.assertIsNone(usuario.organizadora_id)
+            self.assertTrue(usuario.is_authenticated)
+
+        # Atributo fora das claims: uma consulta, só na primeira vez
+        with self.assertNumQueries(1):
+            self.assertEqual(usuario.email, 'claims@teste.com')
+            self.assertEqual(usuario.nome_exibicao, 'Claims')
+
+    def test_conta_desativada_tem_tokens_revogados(self):
+        agora = timezone.now()
+        token = PessoaRefreshToken.for_user(self.pessoa).access_token
+        token.set_iat(at_time=agora - timedelta(seconds=10))
+
+        self.pessoa.is_active = False
+        with mock.patch('backend.pessoas.tokens.time.time', return_value=(agora - timedelta(seconds=5)).timestamp()):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.pessoa.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._autenticar(token)
+
+        # Reativar não devolve a validade dos tokens anteriores à desativação
+        self.pessoa.is_active = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pessoa.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._autenticar(token)
+
+        # Tokens emitidos depois da revogação valem
+        novo = PessoaRefreshToken.for_user(self.pessoa).access_token
+        self.assertEqual(self._autenticar(novo).id, self.pessoa.id)
+
+    def test_desativacao_desfeita_nao_revoga_tokens(self):
+        token = PessoaRefreshToken.for_user(self.pessoa).access_token
+
+        self.pessoa.is_active = False
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.pessoa.save()
+                raise RuntimeError('falha depois do save')
+        self.assertEqual(callbacks, [])
+
+        self.pessoa.refresh_from_db()
+        self.assertTrue(self.pessoa.is_active)
+        self.assertEqual(self._autenticar(token).id, self.pessoa.id)
+
+
+class PipelineApiTest(TestCase):
+    """Em /api/ não há sessão nem CSRF; o admin continua com os dois"""
+
+    def test_api_sem_sessao_e_admin_com_csrf(self):
+        resposta = self.client.get('/api/auth/opcoes/', HTTP_COOKIE='sessionid=abc')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertFalse(hasattr(resposta.wsgi_request, 'session'))
+        self.assertNotIn('Cookie', resposta.get('Vary', ''))
+
+        resposta = self.client.get('/admin/login/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(hasattr(resposta.wsgi_request, 'session'))
+        self.assertIn('csrftoken', resposta.cookies)
+
+    def test_api_recusa_basic_auth(self):
+        resposta = self.client.get('/api/auth/perfil/', HTTP_AUTHORIZATION='Basic dXNlcjpzZW5oYQ==')
+        self.assertEqual(resposta.status_code, 401)
+
+
+class BackendEmailFalho(BaseEmailBackend):
+    """Backend de teste que simula um relay SMTP indisponível"""
+    def send_messages(self, email_messages):
+        raise ConnectionError('relay indisponível')
+
+
+@override_settings(CODIGO_VERIFICACAO_STORE='backend.pessoas.codigos.BancoCodigoStore')
+class FilaEmailsTest(TestCase):
+    """Códigos são gravados na fila no request e enviados pelo worker"""
+
+    def test_codigo_enfileirado_e_enviado_pelo_worker(self):
+        with self.assertNumQueries(3):  # invalida anteriores + código + fila
+            sucesso, _, codigo = enviar_codigo_verificacao('fila@teste.com', tipo='cadastro')
+        self.assertTrue(sucesso)
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command('enviar_emails', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['fila@teste.com'])
+        self.assertIn(codigo, mail.outbox[0].body)
+        # Enviado sai da fila: o código não fica gravado em texto
+        self.assertFalse(EmailPendente.objects.exists())
+
+    def test_codigo_vencido_na_fila_nao_e_enviado(self):
+        enviar_codigo_verificacao('vencido@teste.com', tipo='login')
+        EmailPendente.objects.update(expira_em=timezone.now())
+
+        self.assertEqual(processar_fila_emails(), (0, 0))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(EmailPendente.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='backend.pessoas.tests.BackendEmailFalho')
+    def test_falha_sem_tempo_de_reenviar_antes_de_expirar(self):
+        email_pendente = enfileirar_email('otp@teste.com', 'Código', 'Seu código: 123456', validade=10)
+
+        self.assertEqual(processar_fila_emails(), (0, 1))
+        email_pendente.refresh_from_db()
+        self.assertEqual(email_pendente.status, 'falhou')
+        self.assertEqual(email_pendente.mensagem, '')
+
+    def test_limpeza_da_fila_e_admin_sem_mensagem(self):
+        antigo = timezone.now() - timedelta(days=30)
+        expirado = enfileirar_email('a@teste.com', 'Código', '111111', validade=10)
+        falha_antiga = enfileirar_email('b@teste.com', 'Código', '')
+        falha_recente = enfileirar_email('c@teste.com', 'Código', '')
+        pendente = enfileirar_email('d@teste.com', 'Código', '222222', validade=600)
+        EmailPendente.objects.filter(pk=expirado.pk).update(expira_em=antigo)
+        EmailPendente.objects.filter(pk__in=[falha_antiga.pk, falha_recente.pk]).update(status='falhou')
+        EmailPendente.objects.filter(pk=falha_antiga.pk).update(data_criacao=antigo)
+
+        call_command('limpar_fila_emails', stdout=StringIO())
+        self.assertEqual(
+            set(EmailPendente.objects.values_list('pk', flat=True)),
+            {falha_recente.pk, pendente.pk},
+        )
+
+        from django.contrib.admin.sites import site
+        formulario = site._registry[EmailPendente].get_form(mock.Mock())
+        self.assertNotIn('mensagem', formulario.base_fields)
+
+    def test_lote_reutiliza_uma_conexao(self):
+        for i in range(5):
+            enfileirar_email(f'lote{i}@teste.com', 'Assunto', 'Mensagem')
+
+        with mock.patch('backend.pessoas.email_service.get_connection', wraps=get_connection) as conexoes:
+            enviados, falhas = processar_fila_emails(tamanho_lote=10)
+
+        self.assertEqual((enviados, falhas), (5, 0))
+        self.assertEqual(conexoes.call_count, 1)
+        self.assertEqual(len(mail.outbox), 5)
+
+    @override_settings(
+        EMAIL_BACKEND='backend.pessoas.tests.BackendEmailFalho',
+        EMAIL_FILA_MAX_TENTATIVAS=2,
+    )
+    def test_falha_agenda_nova_tentativa_com_backoff(self):
+        email_pendente = enfileirar_email('falha@teste.com', 'Assunto', 'Mensagem')
+
+        self.assertEqual(processar_fila_emails(), (0, 1))
+        email_pendente.refresh_from_db()
+        self.assertEqual(email_pendente.status, 'pendente')
+        self.assertEqual(email_pendente.tentativas, 1)
+        self.assertGreater(email_pendente.proxima_tentativa, timezone.now())
+
+        # Ainda em backoff: não é reenviado
+        self.assertEqual(processar_fila_emails(), (0, 0))
+
+        EmailPendente.objects.update(proxima_tentativa=timezone.now())
+        self.assertEqual(processar_fila_emails(), (0, 1))
+        email_pendente.refresh_from_db()
+        self.assertEqual(email_pendente.status, 'falhou')
+        self.assertEqual(email_pendente.mensagem, '')
+
+
+@override_settings(CODIGO_VERIFICACAO_STORE='backend.pessoas.codigos.BancoCodigoStore')
+class RegistroPendenteTest(TestCase):
+    """Registro pendente compacto: hash da senha, ids e avatar temporário"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tipo = TipoUsuario.objects.create(nome='Doadora')
+        cls.genero = Genero.objects.create(nome='Outro')
+        cls.categoria = CategoriaInteresse.objects.create(nome='Educação')
+
+    def setUp(self):
+        cache.clear()
+        limpar_cache_local()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        configuracao = override_settings(MEDIA_ROOT=media)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def _avatar(self):
+        from PIL import Image
+        from io import BytesIO
+        buffer = BytesIO()
+        Image.new('RGB', (4, 4)).save(buffer, 'PNG')
+        return SimpleUploadedFile('foto.png', buffer.getvalue(), content_type='image/png')
+
+    def _iniciar(self):
+        return self.client.post('/api/auth/registro/iniciar/', {
+            'email': 'nova@teste.com', 'username': 'nova', 'password': 'senha-forte-123',
+            'nome_completo': 'Nova Pessoa', 'cpf': '123.456.789-09', 'telefone': '81999999999',
+            'tipo_usuario': self.tipo.id, 'genero': self.genero.id, 'cidade': 'Recife',
+            'bairro': 'Centro', 'nome_social': 'Nova', 'mini_bio': 'Oi',
+            'categorias_interesse': [self.categoria.id], 'avatar': self._avatar(),
+        })
+
+    def test_registro_pendente_guarda_apenas_primitivos(self):
+        self.assertEqual(self._iniciar().status_code, 200)
+
+        dados = obter_registro('nova@teste.com')
+        json.dumps(dados)
+        self.assertNotIn('senha-forte-123', json.dumps(dados))
+        self.assertEqual(dados['tipo_usuario_id'], self.tipo.id)
+        self.assertEqual(dados['categorias_interesse'], [self.categoria.id])
+        self.assertTrue(dados['avatar'].startswith(PASTA_TEMPORARIA + '/'))
+        self.assertTrue(default_storage.exists(dados['avatar']))
+
+    def test_confirmar_cria_conta_sem_recalcular_hash(self):
+        self._iniciar()
+        temporario = obter_registro('nova@teste.com')['avatar']
+        codigo = CodigoVerificacao.objects.get(email='nova@teste.com').codigo
+
+        with mock.patch('django.contrib.auth.base_user.make_password') as make_password_mock, \
+                mock.patch('backend.pessoas.senhas.make_password') as hash_pool_mock, \
+                self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.post(
+                '/api/auth/registro/confirmar/',
+                {'email': 'nova@teste.com', 'codigo': codigo},
+                content_type='application/json',
+            )
+        self.assertEqual(resposta.status_code, 201)
+        make_password_mock.assert_not_called()
+        hash_pool_mock.assert_not_called()
+
+        pessoa = Pessoa.objects.get(email='nova@teste.com')
+        self.assertTrue(pessoa.check_password('senha-forte-123'))
+        self.assertEqual(list(pessoa.categorias_interesse.all()), [self.categoria])
+        self.assertTrue(pessoa.avatar.name.startswith('avatars/'))
+        self.assertFalse(default_storage.exists(temporario))
+        self.assertIsNone(obter_registro('nova@teste.com'))
+
+
+class ImportarPessoasTest(TestCase):
+    """Importação em lote: validação, unicidade por lote e erros por linha"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tipo = TipoUsuario.objects.create(nome='Beneficiária')
+        cls.genero = Genero.objects.create(nome='Outro')
+        cls.categoria = CategoriaInteresse.objects.create(nome='Educação')
+        Pessoa.objects.create(username='existente', email='existente@teste.com', cpf='00000000099',
+                              tipo_usuario=cls.tipo, genero=cls.genero)
+
+    def setUp(self):
+        cache.clear()
+        limpar_cache_local()
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta, ignore_errors=True)
+
+    def _linha(self, i, **extra):
+        dados = {
+            'email': f'importada{i}@teste.com', 'username': f'importada{i}', 'nome_completo': f'Importada {i}',
+            'cpf': f'{i:011d}', 'telefone': '81999999999', 'tipo_usuario': self.tipo.id,
+            'genero': self.genero.id, 'cidade': 'Recife', 'bairro': 'Centro', 'nome_social': f'Imp {i}',
+            'mini_bio': 'Bio', 'categorias_interesse': [self.categoria.id],
+        }
+        dados.update(extra)
+        return dados
+
+    def _importar(self, nome, conteudo, *args):
+        caminho = f'{self.pasta}/{nome}'
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        erros = f'{self.pasta}/erros.jsonl'
+        call_command('importar_pessoas', caminho, '--processos', '0', '--erros', erros, *args,
+                     stdout=StringIO(), stderr=StringIO())
+        with open(erros, encoding='utf-8') as arquivo:
+            return [json.loads(linha) for linha in arquivo]
+
+    def test_importa_jsonl_e_reporta_erros_por_linha(self):
+        linhas = [
+            self._linha(1, password='senha-forte-123'),
+            self._linha(2),
+            self._linha(3, email='IMPORTADA1@teste.com'),  # repetido no próprio arquivo
+            self._linha(4, cpf='000.000.000-99'),  # CPF já cadastrado
+            self._linha(5, genero=9999),
+        ]
+        conteudo = '\n'.join(json.dumps(linha) for linha in linhas) + '\n{quebrada\n'
+        erros = self._importar('pessoas.jsonl', conteudo, '--lote', '2')
+
+        self.assertEqual([e['linha'] for e in erros], [3, 4, 5, 6])
+        self.assertIn('email', erros[0]['erros'])
+        self.assertIn('cpf', erros[1]['erros'])
+        self.assertIn('genero', erros[2]['erros'])
+
+        primeira = Pessoa.objects.get(email='importada1@teste.com')
+        self.assertTrue(primeira.check_password('senha-forte-123'))
+        self.assertEqual(list(primeira.categorias_interesse.all()), [self.categoria])
+        self.assertFalse(Pessoa.objects.get(email='importada2@teste.com').has_usable_password())
+
+    def test_importa_csv_com_ids_separados_por_ponto_e_virgula(self):
+        outra = CategoriaInteresse.objects.create(nome='Saúde')
+        linha = self._linha(7)
+        campos = [campo for campo in linha if campo != 'categorias_interesse']
+        conteudo = ','.join(campos + ['categorias_interesse']) + '\n'
+        conteudo += ','.join(str(linha[campo]) for campo in campos) + f',{self.categoria.id};{outra.id}\n'
+
+        self.assertEqual(self._importar('pessoas.csv', conteudo), [])
+        pessoa = Pessoa.objects.get(email='importada7@teste.com')
+        self.assertEqual(pessoa.categorias_interesse.count(), 2)
+
+
+class CarregarLocalizacoesTest(TestCase):
+    """Carga de localizações em lote com upsert e códigos calculados em memória"""
+
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta, ignore_errors=True)
+
+    def _carregar(self, *args):
+        call_command('carregar_localizacoes_rmr', *args, stdout=StringIO())
+
+    def test_carga_padrao_em_consultas_constantes_e_idempotente(self):
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(6):
+            self._carregar()
+        self.assertEqual(LocalizacaoInteresse.objects.count(), 106)
+        self.assertEqual(LocalizacaoInteresse.objects.get(tipo='cidade', nome='Recife').codigo, 'recife')
+        self.assertEqual(LocalizacaoInteresse.objects.get(tipo='bairro', nome='Recife').codigo, 'recife-bairro')
+
+        self._carregar()
+        self.assertEqual(LocalizacaoInteresse.objects.count(), 106)
+
+    def test_recarga_preserva_ordem_e_ativo_do_admin(self):
+        self._carregar('--apenas-cidades')
+        LocalizacaoInteresse.objects.filter(codigo='recife').update(ordem=0, ativo=False)
+
+        self._carregar('--apenas-cidades')
+        recife = LocalizacaoInteresse.objects.get(codigo='recife')
+        self.assertEqual((recife.ordem, recife.ativo), (0, False))
+
+        # Vindos do arquivo, ordem e ativo são atualizados
+        caminho = f'{self.pasta}/cidades.json'
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump([{'tipo': 'cidade', 'nome': 'Recife', 'cidade': 'Recife', 'ordem': 3, 'ativo': 'sim'}], arquivo)
+        self._carregar(caminho)
+        recife.refresh_from_db()
+        self.assertEqual((recife.ordem, recife.ativo), (3, True))
+
+    def test_arquivo_com_bairros_homonimos(self):
+        caminho = f'{self.pasta}/bairros.csv'
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write('tipo,nome,cidade,estado,ordem\n')
+            arquivo.write('bairro,Centro,Olinda,PE,\nbairro,Centro,Caruaru,PE,\nbairro,Centro,Paulista,PE,7\n')
+        self._carregar(caminho)
+        self._carregar(caminho)
+
+        centros = LocalizacaoInteresse.objects.filter(nome='Centro')
+        self.assertEqual(centros.count(), 3)
+        self.assertEqual(len({c.codigo for c in centros}), 3)
+        self.assertEqual(centros.get(cidade='Paulista').ordem, 7)
+
+        # save() individual segue a mesma regra de códigos
+        outro = LocalizacaoInteresse.objects.create(nome='Centro', cidade='Igarassu')
+        self.assertEqual(outro.codigo, 'centro-bairro-igarassu')
+
+
+@override_settings(CODIGO_VERIFICACAO_STORE='backend.pessoas.codigos.BancoCodigoStore')
+class ThrottleOTPTest(TestCase):
+    """Limites GCRA por IP, por email e por email + tipo nos endpoints de código"""
+
+    def setUp(self):
+        cache.clear()
+
+    def _solicitar(self, email, tipo, ip):
+        return self.client.post(
+            '/api/auth/codigo/solicitar/', {'email': email, 'tipo': tipo},
+            content_type='application/json', REMOTE_ADDR=ip,
+        )
+
+    def test_gcra_permite_rajada_e_depois_espera(self):
+        for _ in range(3):
+            self.assertEqual(consumir('throttle:teste:gcra', 3, 60), 0)
+        espera = consumir('throttle:teste:gcra', 3, 60)
+        self.assertGreater(espera, 0)
+        self.assertLessEqual(espera, 20)
+
+    def test_limite_por_email_e_tipo_vale_para_qualquer_ip(self):
+        for i in range(5):
+            resposta = self._solicitar('alvo@teste.com', 'login', f'10.0.0.{i}')
+            self.assertEqual(resposta.status_code, 200)
+
+        resposta = self._solicitar('alvo@teste.com', 'login', '10.0.1.1')
+        self.assertEqual(resposta.status_code, 429)
+        self.assertIn('Retry-After', resposta)
+
+        # Outro tipo e outro email têm limites próprios
+        self.assertEqual(self._solicitar('alvo@teste.com', 'cadastro', '10.0.1.1').status_code, 200)
+        self.assertEqual(self._solicitar('outro@teste.com', 'login', '10.0.1.1').status_code, 200)
+
+    def test_limite_por_email(self):
+        for i, tipo in enumerate(['login'] * 5 + ['cadastro'] * 5):
+            self.assertEqual(self._solicitar('ALVO@teste.com', tipo, f'10.0.0.{i}').status_code, 200)
+        self.assertEqual(self._solicitar('alvo@teste.com', 'recuperacao', '10.0.2.1').status_code, 429)
+
+    def test_tipo_invalido_nao_cria_balde_novo(self):
+        for i in range(5):
+            self._solicitar('alvo@teste.com', f'x{i}', f'10.0.0.{i}')
+        self.assertEqual(self._solicitar('alvo@teste.com', 'x9', '10.0.1.1').status_code, 429)
+        self.assertEqual(self._solicitar('alvo@teste.com', 'login', '10.0.1.1').status_code, 200)
+
+    def test_login_errado_de_terceiros_nao_bloqueia_a_dona_do_email(self):
+        dados = {'email': 'alvo@teste.com', 'password': 'errada', 'tipo': 'x'}
+        for i in range(10):
+            dados['tipo'] = f'x{i}'  # trocar o tipo não cria balde novo
+            self.client.post('/api/auth/login/', dados, content_type='application/json', REMOTE_ADDR='10.9.9.9')
+        bloqueado = self.client.post('/api/auth/login/', dados, content_type='application/json', REMOTE_ADDR='10.9.9.9')
+        self.assertEqual(bloqueado.status_code, 429)
+
+        # Login de outro IP e recuperação de senha continuam disponíveis
+        outro_ip = self.client.post('/api/auth/login/', dados, content_type='application/json', REMOTE_ADDR='10.0.0.1')
+        self.assertNotEqual(outro_ip.status_code, 429)
+        self.assertEqual(self._solicitar('alvo@teste.com', 'recuperacao', '10.0.0.1').status_code, 200)
+
+
+@override_settings(CODIGO_VERIFICACAO_STORE='backend.pessoas.codigos.BancoCodigoStore')
+class FluxoCodigoAsyncTest(TestCase):
+    """Views async do fluxo de código (ORM async + store async)"""
+
+    def setUp(self):
+        # Baldes dos throttles OTP: num cache Redis persistiriam entre execuções
+        cache.clear()
+
+    def _post(self, url, dados):
+        return self.client.post(url, dados, content_type='application/json')
+
+    def test_solicitar_e_verificar_codigo(self):
+        resposta = self._post('/api/auth/codigo/solicitar/', {'email': 'async@teste.com', 'tipo': 'login'})
+        self.assertEqual(resposta.status_code, 200)
+        codigo = CodigoVerificacao.objects.get(email='async@teste.com').codigo
+        self.assertIn(codigo, EmailPendente.objects.get().mensagem)
+
+        dados = {'email': 'async@teste.com', 'codigo': codigo, 'tipo': 'login'}
+        self.assertEqual(self._post('/api/auth/codigo/verificar/', dados).status_code, 200)
+        dados['codigo'] = '000000' if codigo != '000000' else '111111'
+        self.assertEqual(self._post('/api/auth/codigo/verificar/', dados).status_code, 400)
+
+    def test_recuperacao_para_email_inexistente(self):
+        resposta = self._post('/api/auth/senha/recuperar/', {'email': 'ninguem@teste.com'})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('email', resposta.data)
+        self.assertFalse(EmailPendente.objects.exists())
+
+
+class StoreSemVerificar(CodigoStore):
+    """Backend mal configurado: não implementa verificar"""
+    def gerar(self, email, tipo):
+        return '123456'
+
+
+class CodigoStoreInterfaceTest(SimpleTestCase):
+
+    @override_settings(CODIGO_VERIFICACAO_STORE='backend.pessoas.tests.StoreSemVerificar')
+    def test_backend_incompleto_falha_ao_instanciar(self):
+        with self.assertRaisesMessage(TypeError, 'verificar'):
+            obter_codigo_store()
+
+
+class BancoCodigoStoreTest(TestCase):
+    """Contrato dos backends de códigos de verificação"""
+    email = 'otp@teste.com'
+
+    def criar_store(self):
+        return BancoCodigoStore()
+
+    def setUp(self):
+        self.store = self.criar_store()
+
+    def _codigo_errado(self, codigo):
+        return '000000' if codigo != '000000' else '111111'
+
+    def test_codigo_de_uso_unico(self):
+        codigo = self.store.gerar(self.email, 'cadastro')
+        self.assertTrue(self.store.verificar(self.email, codigo, 'cadastro')[0])
+        self.assertFalse(self.store.verificar(self.email, codigo, 'login')[0])
+
+        self.assertTrue(self.store.consumir(self.email, codigo, 'cadastro')[0])
+        self.assertFalse(self.store.consumir(self.email, codigo, 'cadastro')[0])
+        self.assertFalse(self.store.verificar(self.email, codigo, 'cadastro')[0])
+
+    def test_novo_codigo_invalida_o_anterior(self):
+        antigo = self.store.gerar(self.email, 'cadastro')
+        novo = self.store.gerar(self.email, 'cadastro')
+        if antigo != novo:
+            self.assertFalse(self.store.verificar(self.email, antigo, 'cadastro')[0])
+        self.assertTrue(self.store.verificar(self.email, novo, 'cadastro')[0])
+
+    def test_tentativas_erradas_bloqueiam_o_codigo(self):
+        codigo = self.store.gerar(self.email, 'cadastro')
+        errado = self._codigo_errado(codigo)
+        for _ in range(MAX_TENTATIVAS):
+            self.assertEqual(self.store.verificar(self.email, errado, 'cadastro'), (False, MENSAGEM_INVALIDO))
+        self.assertFalse(self.store.consumir(self.email, codigo, 'cadastro')[0])
+
+    def test_verificacao_em_uma_consulta(self):
+        codigo = self.store.gerar(self.email, 'cadastro')
+        with self.assertNumQueries(1):
+            self.assertFalse(self.store.verificar(self.email, self._codigo_errado(codigo), 'cadastro')[0])
+        with self.assertNumQueries(1):
+            self.assertTrue(self.store.consumir(self.email, codigo, 'cadastro')[0])
+
+        codigo_obj = CodigoVerificacao.objects.get()
+        self.assertTrue(codigo_obj.usado)
+        self.assertEqual(codigo_obj.tentativas, 1)
+
+    def test_codigo_expirado(self):
+        codigo = self.store.gerar(self.email, 'cadastro')
+        CodigoVerificacao.objects.update(data_expiracao=timezone.now())
+        self.assertFalse(self.store.consumir(self.email, codigo, 'cadastro')[0])
+
+
+def _redis_disponivel():
+    try:
+        RedisCodigoStore().redis.ping()
+    except Exception:
+        return False
+    return True
+
+
+@skipUnless(_redis_disponivel(), 'Redis indisponível')
+@override_settings(CODIGO_VERIFICACAO_AUDITORIA=False)
+class RedisCodigoStoreTest(BancoCodigoStoreTest):
+    email = 'otp-redis@teste.com'
+
+    def criar_store(self):
+        return RedisCodigoStore()
+
+    def setUp(self):
+        super().setUp()
+        self.store.redis.delete(self.store._chave(self.email, 'cadastro'))
+
+    def test_verificacao_em_uma_consulta(self):
+        with self.assertNumQueries(0):
+            codigo = self.store.gerar(self.email, 'cadastro')
+            self.assertTrue(self.store.consumir(self.email, codigo, 'cadastro')[0])
+        self.assertFalse(CodigoVerificacao.objects.exists())
+
+    def test_codigo_expirado(self):
+        codigo = self.store.gerar(self.email, 'cadastro')
+        self.assertGreater(self.store.redis.ttl(self.store._chave(self.email, 'cadastro')), 0)
+        self.store.redis.delete(self.store._chave(self.email, 'cadastro'))
+        self.assertFalse(self.store.consumir(self.email, codigo, 'cadastro')[0])
+
+
+@skipUnless(_redis_disponivel(), 'Redis indisponível')
+@override_settings(
+    CODIGO_VERIFICACAO_STORE='backend.pessoas.codigos.RedisCodigoStore',
+    CODIGO_VERIFICACAO_AUDITORIA=True,
+)
+class FluxoCodigoAsyncRedisTest(FluxoCodigoAsyncTest):
+    """Mesmo fluxo com o store Redis: cliente redis.asyncio montado a partir de CACHES"""
+
+    def setUp(self):
+        super().setUp()
+        store = RedisCodigoStore()
+        store.redis.delete(store._chave('async@teste.com', 'login'))
@@ -0,0 +1,108 @@
+"""
+Tokens JWT com os dados de autorização da pessoa nas claims
+
+O access token carrega id, código do tipo de usuário, situação da conta e id
+da organizadora. PessoaJWTAuthentication monta um PessoaToken a partir
+dessas claims, sem SELECT em Pessoa; o banco só é consultado se a view usar
+um atributo que não está no token.
+
+Contas desativadas ou removidas entram numa lista de revogação no Redis:
+tokens emitidos antes da revogação são recusados até expirarem.
+"""
+import time
+
+from django.core.cache import cache
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Pessoa
+
+# claim -> atributo do PessoaToken
+CLAIMS_PESSOA = {
+    'tipo_usuario': 'tipo_usuario_codigo',
+    'ativo': 'is_active',
+    'organizadora_id': 'organizadora_id',
+}
+
+
+class PessoaRefreshToken(RefreshToken):
+    """RefreshToken com as claims de CLAIMS_PESSOA (copiadas para o access token)"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim, atributo in CLAIMS_PESSOA.items():
+            token[claim] = getattr(user, atributo)
+        return token
+
+
+class PessoaTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """/api/token/ emitindo tokens com as claims da pessoa"""
+    token_class = PessoaRefreshToken
+
+
+class PessoaToken:
+    """
+    Usuário autenticado montado a partir das claims do token.
+
+    Atributos fora das claims (nome, email, avatar...) carregam a Pessoa do
+    banco uma única vez, no primeiro acesso.
+    """
+    __slots__ = ('id', 'token', '_pessoa', *CLAIMS_PESSOA.values())
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token):
+        self._pessoa = None
+        self.token = token
+        self.id = Pessoa._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+        for claim, atributo in CLAIMS_PESSOA.items():
+            # Tokens antigos, sem a claim: o atributo vem do banco (__getattr__)
+            if claim in token:
+                setattr(self, atributo, token[claim])
+
+    @property
+    def pk(self):
+        return self.id
+
+    def carregar(self):
+        """Retorna a instância de Pessoa (uma consulta, no máximo)"""
+        if self._pessoa is None:
+            self._pessoa = Pessoa.objects.select_related('tipo_usuario', 'genero').get(pk=self.id)
+        return self._pessoa
+
+    def __getattr__(self, nome):
+        # Só é chamado para atributos ausentes (inclusive slots não preenchidos)
+        if nome.startswith('__'):
+            raise AttributeError(nome)
+        return getattr(self.carregar(), nome)
+
+    def __eq__(self, outro):
+        if isinstance(outro, (PessoaToken, Pessoa)):
+            return self.id == outro.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __str__(self):
+        return f'PessoaToken {self.id}'
+
+
+# ========== LISTA DE REVOGAÇÃO ==========
+
+def _chave_revogacao(pessoa_id):
+    return f'tokens_revogados:pessoa:{pessoa_id}'
+
+
+def revogar_tokens(pessoa_id):
+    """Recusa todos os tokens da pessoa emitidos até agora"""
+    validade = int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    cache.set(_chave_revogacao(pessoa_id), int(time.time()), validade)
+
+
+def token_revogado(pessoa_id, emitido_em):
+    revogado_em = cache.get(_chave_revogacao(pessoa_id))
+    return revogado_em is not None and (emitido_em is None or emitido_em <= revogado_em)
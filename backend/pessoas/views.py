@@ -1,11 +1,15 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from adrf.decorators import api_view as api_view_async
 from drf_spectacular.utils import extend_schema, OpenApiResponse
-from django.core.cache import cache
-from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
 from .models import Pessoa, CodigoVerificacao
 from .serializers import (
     PessoaSerializer,
@@ -21,7 +25,19 @@ from .serializers import (
     CategoriaInteresseSerializer,
     LocalizacaoInteresseSerializer,
 )
-from .email_service import enviar_codigo_verificacao, verificar_codigo
+from backend.core.cache import NS_CATALOGOS, aobter_dois_niveis
+from backend.core.throttling import THROTTLES_OTP, THROTTLES_LOGIN
+from .senhas import gerar_hash
+from .registro_pendente import asalvar_registro, criar_pessoa, obter_registro
+from .tokens import PessoaRefreshToken
+from .email_service import aenviar_codigo_verificacao, averificar_codigo, verificar_codigo
+import gzip
+import hashlib
+import re
+
+# Catálogos mudam raramente; clientes e o nginx revalidam com If-None-Match
+OPCOES_CACHE_CONTROL = 'public, max-age=86400, stale-while-revalidate=604800'
+ACEITA_GZIP = re.compile(r'\bgzip\b')
 
 
 # ============== ENDPOINTS PÚBLICOS (SEM AUTENTICAÇÃO) ==============
@@ -33,46 +49,80 @@ from .email_service import enviar_codigo_verificacao, verificar_codigo
     tags=['Cadastro - Público'],
     responses={200: OpenApiResponse(description="Opções disponíveis")}
 )
-@api_view(['GET'])
+@api_view_async(['GET'])
 @permission_classes([AllowAny])
-def listar_opcoes_cadastro(request):
+async def listar_opcoes_cadastro(request):
     """
     Lista todas as opções disponíveis para o cadastro
     ENDPOINT PÚBLICO - não requer autenticação
     """
     from .models import TipoUsuario, Genero, CategoriaInteresse, LocalizacaoInteresse
     
-    # Tentar buscar do cache primeiro
-    cache_key = 'opcoes_cadastro_completo'
-    dados_cache = cache.get(cache_key)
-    
-    if dados_cache:
-        return Response(dados_cache)
-    
-    # Se não estiver em cache, buscar do banco
-    dados = {
-        'tipos_usuario': TipoUsuarioSerializer(
-            TipoUsuario.objects.filter(ativo=True),
-            many=True
-        ).data,
-        'generos': GeneroSerializer(
-            Genero.objects.filter(ativo=True),
-            many=True
-        ).data,
-        'categorias_interesse': CategoriaInteresseSerializer(
-            CategoriaInteresse.objects.filter(ativo=True),
-            many=True
-        ).data,
-        'localizacoes_interesse': LocalizacaoInteresseSerializer(
-            LocalizacaoInteresse.objects.filter(ativo=True),
-            many=True
-        ).data,
-    }
-    
-    # Armazenar em cache por 1 hora
-    cache.set(cache_key, dados, 60 * 60)
+    def construir():
+        dados = {
+            'tipos_usuario': TipoUsuarioSerializer(
+                TipoUsuario.objects.filter(ativo=True),
+                many=True
+            ).data,
+            'generos': GeneroSerializer(
+                Genero.objects.filter(ativo=True),
+                many=True
+            ).data,
+            'categorias_interesse': CategoriaInteresseSerializer(
+                CategoriaInteresse.objects.filter(ativo=True),
+                many=True
+            ).data,
+            'localizacoes_interesse': LocalizacaoInteresseSerializer(
+                LocalizacaoInteresse.objects.filter(ativo=True),
+                many=True
+            ).data,
+        }
+        # JSON já renderizado: nenhum hit precisa passar pelo JSONRenderer
+        return JSONRenderer().render(dados).decode('utf-8')
+    
+    # Cache em memória do processo + Redis, invalidado quando um catálogo muda;
+    # o acerto em memória responde sem sair do event loop
+    conteudo = await aobter_dois_niveis(
+        'opcoes_cadastro_json',
+        NS_CATALOGOS,
+        construir,
+        60 * 60,
+        preparar=_preparar_conteudo,
+    )
     
-    return Response(dados)
+    return _resposta_pre_renderizada(request, conteudo)
+
+
+def _preparar_conteudo(texto):
+    """Gera corpo, variante gzip e ETag (hash do conteúdo) uma vez por processo"""
+    corpo = texto.encode('utf-8')
+    return {
+        'corpo': corpo,
+        'gzip': gzip.compress(corpo, compresslevel=9, mtime=0),
+        'etag': '"%s"' % hashlib.sha256(corpo).hexdigest()[:32],
+    }
+
+
+def _resposta_pre_renderizada(request, conteudo):
+    """
+    Responde com os bytes pré-renderizados, 304 se o cliente já tem a versão
+    atual (If-None-Match) e a variante gzip se o cliente aceitar
+    """
+    etag = conteudo['etag']
+    etags_cliente = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    
+    if etag in etags_cliente or f'W/{etag}' in etags_cliente or '*' in etags_cliente:
+        resposta = HttpResponseNotModified()
+    elif ACEITA_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        resposta = HttpResponse(conteudo['gzip'], content_type='application/json')
+        resposta['Content-Encoding'] = 'gzip'
+    else:
+        resposta = HttpResponse(conteudo['corpo'], content_type='application/json')
+    
+    resposta['ETag'] = etag
+    resposta['Cache-Control'] = OPCOES_CACHE_CONTROL
+    patch_vary_headers(resposta, ['Accept-Encoding'])
+    return resposta
 
 
 @extend_schema(
@@ -96,26 +146,27 @@ def listar_opcoes_cadastro(request):
         400: OpenApiResponse(description="Erro de validação")
     }
 )
-@api_view(['POST'])
+@api_view_async(['POST'])
 @permission_classes([AllowAny])
-def iniciar_registro(request):
+@throttle_classes(THROTTLES_OTP)
+async def iniciar_registro(request):
     """
     ETAPA 1: Valida dados e envia código de verificação por email
     ENDPOINT PÚBLICO - não requer autenticação
     """
     serializer = RegistroComCodigoSerializer(data=request.data)
     
-    if not serializer.is_valid():
+    # A validação consulta o banco (unicidade) com o ORM sync: roda numa thread
+    if not await sync_to_async(serializer.is_valid)():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     email = serializer.validated_data['email']
     
-    # Armazenar dados temporariamente em cache (expira em 15 minutos)
-    cache_key = f'registro_pendente_{email}'
-    cache.set(cache_key, serializer.validated_data, 60 * 15)
+    # Guardar o registro pendente (senha já em hash, expira em 15 minutos)
+    await asalvar_registro(serializer.validated_data)
     
     # Enviar código de verificação
-    sucesso, mensagem, codigo_obj = enviar_codigo_verificacao(email, tipo='cadastro')
+    sucesso, mensagem, _ = await aenviar_codigo_verificacao(email, tipo='cadastro')
     
     if not sucesso:
         return Response(
@@ -168,46 +219,27 @@ def confirmar_registro(request):
     email = serializer.validated_data['email']
     codigo = serializer.validated_data['codigo']
     
-    # Verificar código
-    valido, mensagem, codigo_obj = verificar_codigo(email, codigo, tipo='cadastro')
-    
-    if not valido:
-        return Response({'error': mensagem}, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Recuperar dados do registro do cache
-    cache_key = f'registro_pendente_{email}'
-    dados_registro = cache.get(cache_key)
+    # Recuperar o registro pendente
+    dados_registro = obter_registro(email)
     
     if not dados_registro:
         return Response({
             'error': 'Dados de registro expirados. Inicie o registro novamente.'
         }, status=status.HTTP_400_BAD_REQUEST)
     
+    # Verificar e consumir o código numa única operação atômica
+    valido, mensagem = verificar_codigo(email, codigo, tipo='cadastro', consumir=True)
+    
+    if not valido:
+        return Response({'error': mensagem}, status=status.HTTP_400_BAD_REQUEST)
+    
     try:
-        # Criar usuário
-        password = dados_registro.pop('password')
-        categorias = dados_registro.pop('categorias_interesse', [])
-        localizacoes = dados_registro.pop('localizacoes_interesse', [])
-        
-        pessoa = Pessoa.objects.create_user(
-            password=password,
-            **dados_registro
-        )
-        
-        # Adicionar relações ManyToMany
-        if categorias:
-            pessoa.categorias_interesse.set(categorias)
-        if localizacoes:
-            pessoa.localizacoes_interesse.set(localizacoes)
-        
-        # Marcar código como usado
-        codigo_obj.marcar_como_usado()
-        
-        # Limpar cache
-        cache.delete(cache_key)
+        # Criar usuário (hash da senha calculado ao iniciar o registro)
+        with transaction.atomic():
+            pessoa = criar_pessoa(dados_registro)
         
         # Gerar tokens JWT
-        refresh = RefreshToken.for_user(pessoa)
+        refresh = PessoaRefreshToken.for_user(pessoa)
         
         return Response({
             'message': f'🎉 Conta criada com sucesso! Bem-vinda, {pessoa.nome_exibicao}!',
@@ -218,6 +250,12 @@ def confirmar_registro(request):
             }
         }, status=status.HTTP_201_CREATED)
     
+    except IntegrityError:
+        # Outro cadastro com o mesmo email, username ou CPF entre as duas etapas
+        return Response(
+            {'error': 'Email, nome de usuário ou CPF já cadastrado. Inicie o registro novamente.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except Exception as e:
         return Response(
             {'error': f'Erro ao criar conta: {str(e)}'},
@@ -246,12 +284,13 @@ def confirmar_registro(request):
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(THROTTLES_LOGIN)
 def login(request):
     """
     Login com email e senha
     ENDPOINT PÚBLICO - não requer autenticação
     """
-    serializer = LoginComCodigoSerializer(data=request.data)
+    serializer = LoginComCodigoSerializer(data=request.data, context={'request': request})
     
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
@@ -259,7 +298,7 @@ def login(request):
     user = serializer.validated_data['user']
     
     # Gerar tokens JWT
-    refresh = RefreshToken.for_user(user)
+    refresh = PessoaRefreshToken.for_user(user)
     
     return Response({
         'message': f'Bem-vinda de volta, {user.nome_exibicao}!',
@@ -291,9 +330,10 @@ def login(request):
         400: OpenApiResponse(description="Email inválido")
     }
 )
-@api_view(['POST'])
+@api_view_async(['POST'])
 @permission_classes([AllowAny])
-def solicitar_codigo(request):
+@throttle_classes(THROTTLES_OTP)
+async def solicitar_codigo(request):
     """
     Solicita envio de código de verificação
     ENDPOINT PÚBLICO - não requer autenticação
@@ -307,7 +347,7 @@ def solicitar_codigo(request):
     tipo = serializer.validated_data['tipo']
     
     # Enviar código
-    sucesso, mensagem, codigo_obj = enviar_codigo_verificacao(email, tipo=tipo)
+    sucesso, mensagem, _ = await aenviar_codigo_verificacao(email, tipo=tipo)
     
     if not sucesso:
         return Response(
@@ -338,9 +378,9 @@ def solicitar_codigo(request):
         400: OpenApiResponse(description="Código inválido ou expirado")
     }
 )
-@api_view(['POST'])
+@api_view_async(['POST'])
 @permission_classes([AllowAny])
-def verificar_codigo_view(request):
+async def verificar_codigo_view(request):
     """
     Verifica código de verificação
     ENDPOINT PÚBLICO - não requer autenticação
@@ -355,7 +395,7 @@ def verificar_codigo_view(request):
     tipo = serializer.validated_data['tipo']
     
     # Verificar código
-    valido, mensagem, codigo_obj = verificar_codigo(email, codigo, tipo=tipo)
+    valido, mensagem = await averificar_codigo(email, codigo, tipo=tipo)
     
     if not valido:
         return Response({'error': mensagem}, status=status.HTTP_400_BAD_REQUEST)
@@ -387,9 +427,10 @@ def verificar_codigo_view(request):
         404: OpenApiResponse(description="Email não encontrado")
     }
 )
-@api_view(['POST'])
+@api_view_async(['POST'])
 @permission_classes([AllowAny])
-def solicitar_recuperacao_senha(request):
+@throttle_classes(THROTTLES_OTP)
+async def solicitar_recuperacao_senha(request):
     """
     ETAPA 1: Solicita recuperação de senha e envia código por email
     ENDPOINT PÚBLICO - não requer autenticação
@@ -401,8 +442,11 @@ def solicitar_recuperacao_senha(request):
     
     email = serializer.validated_data['email']
     
+    if not await Pessoa.objects.filter(email=email).aexists():
+        return Response({'email': ['Email não encontrado']}, status=status.HTTP_400_BAD_REQUEST)
+    
     # Enviar código de verificação
-    sucesso, mensagem, codigo_obj = enviar_codigo_verificacao(email, tipo='recuperacao')
+    sucesso, mensagem, _ = await aenviar_codigo_verificacao(email, tipo='recuperacao')
     
     if not sucesso:
         return Response(
@@ -442,6 +486,7 @@ def solicitar_recuperacao_senha(request):
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(THROTTLES_OTP)
 @transaction.atomic
 def redefinir_senha(request):
     """
@@ -457,25 +502,22 @@ def redefinir_senha(request):
     codigo = serializer.validated_data['codigo']
     nova_senha = serializer.validated_data['nova_senha']
     
-    # Verificar código
-    valido, mensagem, codigo_obj = verificar_codigo(email, codigo, tipo='recuperacao')
+    # Verificar e consumir o código numa única operação atômica
+    valido, mensagem = verificar_codigo(email, codigo, tipo='recuperacao', consumir=True)
     
     if not valido:
         return Response({'error': mensagem}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
         # Buscar usuário pelo email
-        pessoa = Pessoa.objects.get(email=email)
+        pessoa = Pessoa.objects.select_related('tipo_usuario', 'perfil_organizadora').get(email=email)
         
         # Redefinir senha
-        pessoa.set_password(nova_senha)
-        pessoa.save()
-        
-        # Marcar código como usado
-        codigo_obj.marcar_como_usado()
+        pessoa.password = gerar_hash(nova_senha)
+        pessoa.save(update_fields=['password'])
         
         # Gerar tokens JWT para login automático
-        refresh = RefreshToken.for_user(pessoa)
+        refresh = PessoaRefreshToken.for_user(pessoa)
         
         return Response({
             'message': f'✅ Senha redefinida com sucesso! Você já está logada, {pessoa.nome_exibicao}!',
@@ -513,7 +555,8 @@ def meu_perfil(request):
     Retorna dados do usuário logado
     ENDPOINT PROTEGIDO - requer autenticação JWT
     """
-    return Response(PessoaSerializer(request.user).data)
+    pessoa = PessoaSerializer.otimizar_queryset(Pessoa.objects.all()).get(pk=request.user.id)
+    return Response(PessoaSerializer(pessoa).data)
 
 
 @extend_schema(
@@ -532,7 +575,7 @@ def atualizar_perfil(request):
     ENDPOINT PROTEGIDO - requer autenticação JWT
     """
     serializer = PessoaSerializer(
-        request.user,
+        Pessoa.objects.get(pk=request.user.id),
         data=request.data,
         partial=True
     )
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark de requests simultâneos por worker: view DRF sync x view async (adrf)
+
+Uso (na raiz do projeto, com os serviços do docker-compose no ar):
+    docker-compose exec web python docs/benchmark_async.py [--espera-ms 20] [--requests 400]
+
+O app ASGI do Django é chamado no próprio processo, como o uvicorn faria, com
+N requests em voo ao mesmo tempo. As duas views fazem o mesmo trabalho: uma
+espera de I/O (simulando Redis/SMTP/banco) e uma resposta JSON pequena. No
+ASGI, views sync rodam numa única thread (thread_sensitive), então as esperas
+se enfileiram; a view async libera o event loop durante a espera.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(RAIZ), str(RAIZ / 'backend')]
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.core.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from adrf.decorators import api_view as api_view_async  # noqa: E402
+from django.core.handlers.asgi import ASGIHandler  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.urls import path  # noqa: E402
+from rest_framework.decorators import api_view, permission_classes, throttle_classes  # noqa: E402
+from rest_framework.permissions import AllowAny  # noqa: E402
+from rest_framework.response import Response  # noqa: E402
+
+ESPERA = 0.02
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@throttle_classes([])
+def view_sync(request):
+    time.sleep(ESPERA)
+    return Response({'ok': True})
+
+
+@api_view_async(['GET'])
+@permission_classes([AllowAny])
+@throttle_classes([])
+async def view_async(request):
+    await asyncio.sleep(ESPERA)
+    return Response({'ok': True})
+
+
+urlpatterns = [
+    path('api/benchmark/sync/', view_sync),
+    path('api/benchmark/async/', view_async),
+]
+
+
+async def chamar(app, caminho):
+    """Um request GET pelo protocolo ASGI; retorna o status HTTP"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': caminho, 'raw_path': caminho.encode(),
+        'query_string': b'', 'root_path': '', 'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 12345), 'server': ('localhost', 80),
+    }
+    enviado = False
+    status = None
+
+    async def receive():
+        nonlocal enviado
+        if not enviado:
+            enviado = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Future()  # cliente nunca desconecta
+
+    async def send(mensagem):
+        nonlocal status
+        if mensagem['type'] == 'http.response.start':
+            status = mensagem['status']
+
+    await app(scope, receive, send)
+    return status
+
+
+async def medir(app, caminho, concorrencia, total):
+    limite = asyncio.Semaphore(concorrencia)
+
+    async def um():
+        async with limite:
+            return await chamar(app, caminho)
+
+    await asyncio.gather(*(um() for _ in range(min(total, 20))))  # aquecimento
+    inicio = time.perf_counter()
+    status = await asyncio.gather(*(um() for _ in range(total)))
+    duracao = time.perf_counter() - inicio
+    assert set(status) == {200}, set(status)
+    return total / duracao
+
+
+def main():
+    global ESPERA
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--espera-ms', type=float, default=20)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concorrencia', type=int, nargs='+', default=[1, 10, 50, 100])
+    args = parser.parse_args()
+    ESPERA = args.espera_ms / 1000
+
+    with override_settings(ROOT_URLCONF=__name__):
+        app = ASGIHandler()
+        print(f'{"concorrência":>12} {"sync (req/s)":>14} {"async (req/s)":>14}')
+        for concorrencia in args.concorrencia:
+            sync = asyncio.run(medir(app, '/api/benchmark/sync/', concorrencia, args.requests))
+            assincrona = asyncio.run(medir(app, '/api/benchmark/async/', concorrencia, args.requests))
+            print(f'{concorrencia:>12} {sync:>14.0f} {assincrona:>14.0f}')
+
+
+if __name__ == '__main__':
+    main()
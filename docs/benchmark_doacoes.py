@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark da leitura de doações de uma campanha: consultas, bytes e tempo
+
+Uso (na raiz do projeto, com os serviços do docker-compose no ar):
+    docker-compose exec web python docs/benchmark_doacoes.py [--doacoes 50000]
+
+Cria uma campanha com N doações e lê todas elas de três formas:
+- antes: select_related('doador', 'campanha') (o que a listagem fazia)
+- only(): só as colunas da doação, campanha e doador como chaves primárias
+- only() + doador_nome: um JOIN com Pessoa trazendo apenas as colunas do nome
+
+Para cada uma mostra o número de consultas, os bytes das colunas vindas do
+banco, os bytes do JSON serializado e o tempo. Tudo roda dentro de uma
+transação desfeita no final: nada fica no banco.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(RAIZ), str(RAIZ / 'backend')]
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.core.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from backend.campanhas.models import Campanha, Organizadora  # noqa: E402
+from backend.doacoes.models import Doacao  # noqa: E402
+from backend.doacoes.serializers import DoacaoSerializer, DoacaoComDoadorSerializer  # noqa: E402
+from backend.pessoas.models import Genero, Pessoa, TipoUsuario  # noqa: E402
+
+
+class Desfazer(Exception):
+    pass
+
+
+def bytes_do_banco(queryset):
+    """Soma o tamanho das colunas devolvidas pela consulta do queryset"""
+    sql, params = queryset.query.sql_with_params()
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for linha in cursor.fetchall():
+            total += sum(len(str(valor).encode()) for valor in linha if valor is not None)
+    return total
+
+
+def medir(queryset, serializer_class):
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        corpo = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        tempo = time.perf_counter() - inicio
+    return len(consultas), bytes_do_banco(queryset), len(corpo), tempo
+
+
+def criar_campanha(quantidade):
+    tipo = TipoUsuario.objects.first() or TipoUsuario.objects.create(nome='Benchmark')
+    genero = Genero.objects.first() or Genero.objects.create(nome='Benchmark')
+    doadores = [
+        Pessoa.objects.create_user(
+            username=f'benchmark_doador_{i}', email=f'doador{i}@benchmark.local', password=None,
+            cpf=f'7{i:010d}', nome_completo=f'Doador {i}', mini_bio='Bio ' * 60,
+            tipo_usuario=tipo, genero=genero,
+        )
+        for i in range(50)
+    ]
+    organizadora = Organizadora.objects.create(pessoa=doadores[0])
+    campanha = Campanha.objects.create(
+        titulo='Benchmark', descricao='Descrição longa da campanha. ' * 100,
+        organizadora=organizadora, data_inicio=date.today(),
+    )
+    Doacao.objects.bulk_create(
+        [
+            Doacao(campanha=campanha, doador=doadores[i % len(doadores)], tipo='alimento',
+                   descricao=f'Cesta básica {i}')
+            for i in range(quantidade)
+        ],
+        batch_size=5000,
+    )
+    return campanha
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--doacoes', type=int, default=50000)
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            campanha = criar_campanha(args.doacoes)
+            doacoes = Doacao.objects.filter(campanha=campanha).order_by('-data_doacao', '-id')
+            cenarios = [
+                ('antes: select_related(doador, campanha)',
+                 doacoes.select_related('doador', 'campanha'), DoacaoSerializer),
+                ('only()', DoacaoSerializer.otimizar_queryset(doacoes), DoacaoSerializer),
+                ('only() + doador_nome (1 JOIN)',
+                 DoacaoComDoadorSerializer.otimizar_queryset(doacoes), DoacaoComDoadorSerializer),
+            ]
+
+            print(f'{args.doacoes} doações numa campanha\n')
+            print(f'{"":<42} {"consultas":>9} {"bytes banco":>12} {"bytes JSON":>11} {"tempo":>8}')
+            for nome, queryset, serializer_class in cenarios:
+                consultas, banco, corpo, tempo = medir(queryset, serializer_class)
+                print(f'{nome:<42} {consultas:>9} {banco:>12} {corpo:>11} {tempo:>7.2f}s')
+            raise Desfazer
+    except Desfazer:
+        pass
+
+
+if __name__ == '__main__':
+    main()
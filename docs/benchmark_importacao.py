@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark de linhas/s na importação de pessoas: cadastro linha a linha x importar_pessoas
+
+Uso (na raiz do projeto, com os serviços do docker-compose no ar):
+    docker-compose exec web python docs/benchmark_importacao.py [--linhas 5000] [--amostra 200]
+
+Gera um CSV sintético e mede:
+- linha a linha: RegistroComCodigoSerializer + create_user + .set() (o que o
+  fluxo iniciar/confirmar registro faz por pessoa), numa amostra
+- importar_pessoas: o arquivo inteiro, em lotes
+
+Tudo roda dentro de uma transação desfeita no final: nada fica no banco.
+Metade das linhas tem senha (hash no perfil configurado em PERFIL_HASH_SENHA).
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(RAIZ), str(RAIZ / 'backend')]
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.core.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import transaction  # noqa: E402
+
+from backend.pessoas.models import CategoriaInteresse, Genero, Pessoa, TipoUsuario  # noqa: E402
+from backend.pessoas.serializers import RegistroComCodigoSerializer  # noqa: E402
+
+CAMPOS = [
+    'email', 'username', 'password', 'nome_completo', 'cpf', 'telefone', 'tipo_usuario',
+    'genero', 'cidade', 'bairro', 'nome_social', 'mini_bio', 'categorias_interesse',
+]
+
+
+class Desfazer(Exception):
+    pass
+
+
+def linha(i, prefixo, tipo, genero, categorias):
+    return {
+        'email': f'{prefixo}{i}@benchmark.local', 'username': f'{prefixo}{i}',
+        'password': 'senha-benchmark-1' if i % 2 else '', 'nome_completo': f'Pessoa {i}',
+        'cpf': f'9{i:010d}' if prefixo == 'lote' else f'8{i:010d}', 'telefone': '81999999999',
+        'tipo_usuario': tipo.id, 'genero': genero.id, 'cidade': 'Recife', 'bairro': 'Centro',
+        'nome_social': f'P{i}', 'mini_bio': 'Importada pelo benchmark',
+        'categorias_interesse': [c.id for c in categorias],
+    }
+
+
+def linha_a_linha(linhas):
+    inicio = time.perf_counter()
+    for dados in linhas:
+        dados = dict(dados, password=dados['password'] or 'senha-benchmark-1')
+        serializer = RegistroComCodigoSerializer(data=dados)
+        serializer.is_valid(raise_exception=True)
+        validados = dict(serializer.validated_data)
+        categorias = validados.pop('categorias_interesse', [])
+        validados.pop('localizacoes_interesse', None)
+        pessoa = Pessoa.objects.create_user(**validados)
+        pessoa.categorias_interesse.set(categorias)
+    return len(linhas) / (time.perf_counter() - inicio)
+
+
+def em_lote(linhas, lote, processos):
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', delete=False) as arquivo:
+        escritor = csv.DictWriter(arquivo, CAMPOS)
+        escritor.writeheader()
+        for dados in linhas:
+            escritor.writerow(dict(dados, categorias_interesse=';'.join(map(str, dados['categorias_interesse']))))
+    try:
+        inicio = time.perf_counter()
+        call_command('importar_pessoas', arquivo.name, '--lote', str(lote), '--processos', str(processos),
+                     stdout=io.StringIO())
+        return len(linhas) / (time.perf_counter() - inicio)
+    finally:
+        os.unlink(arquivo.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--linhas', type=int, default=5000)
+    parser.add_argument('--amostra', type=int, default=200, help='Linhas do cenário linha a linha')
+    parser.add_argument('--lote', type=int, default=1000)
+    parser.add_argument('--processos', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            tipo = TipoUsuario.objects.first() or TipoUsuario.objects.create(nome='Benchmark')
+            genero = Genero.objects.first() or Genero.objects.create(nome='Benchmark')
+            categorias = list(CategoriaInteresse.objects.all()[:2]) or [CategoriaInteresse.objects.create(nome='Benchmark')]
+
+            amostra = [linha(i, 'unitaria', tipo, genero, categorias) for i in range(args.amostra)]
+            completo = [linha(i, 'lote', tipo, genero, categorias) for i in range(args.linhas)]
+
+            unitario = linha_a_linha(amostra)
+            print(f'{"linha a linha (serializer + create_user)":<44} {unitario:8.0f} linhas/s')
+            lote = em_lote(completo, args.lote, args.processos)
+            print(f'{"importar_pessoas":<44} {lote:8.0f} linhas/s ({lote / unitario:.1f}x)')
+            raise Desfazer
+    except Desfazer:
+        pass
+
+
+if __name__ == '__main__':
+    main()
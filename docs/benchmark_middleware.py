@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark do custo por request da pilha de middlewares + autenticação
+do DRF, antes e depois de restringir /api/ a JWT (sem sessão/CSRF/mensagens)
+
+Uso (na raiz do projeto, com os serviços do docker-compose no ar):
+    docker-compose exec web python docs/benchmark_middleware.py [--requests 20000]
+
+Cada cenário chama uma view DRF trivial (AllowAny, lê request.user) pelo
+handler do Django, sem rede e sem banco; a diferença entre os cenários é só
+o que roda em volta da view.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(RAIZ), str(RAIZ / 'backend')]
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.core.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.test import Client, override_settings  # noqa: E402
+from django.urls import path  # noqa: E402
+from rest_framework.decorators import api_view, permission_classes, throttle_classes  # noqa: E402
+from rest_framework.permissions import AllowAny  # noqa: E402
+from rest_framework.response import Response  # noqa: E402
+from rest_framework.settings import api_settings  # noqa: E402
+
+MIDDLEWARE_ANTES = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+AUTENTICACAO_ANTES = [
+    'rest_framework_simplejwt.authentication.JWTAuthentication',
+    'rest_framework.authentication.SessionAuthentication',
+    'rest_framework.authentication.BasicAuthentication',
+]
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@throttle_classes([])
+def view_benchmark(request):
+    return Response({'autenticado': request.user.is_authenticated})
+
+
+urlpatterns = [path('api/benchmark/', view_benchmark)]
+
+
+def medir(cliente, total):
+    for _ in range(200):  # aquecimento
+        cliente.get('/api/benchmark/')
+    inicio = time.perf_counter()
+    for _ in range(total):
+        cliente.get('/api/benchmark/')
+    return (time.perf_counter() - inicio) / total * 1e6  # µs por request
+
+
+def cenario(nome, middleware, autenticacao, total, cookies):
+    from django.conf import settings
+    rest = dict(settings.REST_FRAMEWORK, DEFAULT_AUTHENTICATION_CLASSES=autenticacao)
+    with override_settings(ROOT_URLCONF=__name__, MIDDLEWARE=middleware, REST_FRAMEWORK=rest):
+        api_settings.reload()
+        cliente = Client(HTTP_HOST='localhost')
+        if cookies:
+            # Navegador que já passou pelo admin: sessão e CSRF em todo request
+            cliente.cookies['sessionid'] = 'sessao-inexistente'
+            cliente.cookies['csrftoken'] = 'x' * 32
+        resultado = medir(cliente, total)
+    api_settings.reload()
+    print(f'{nome:<52} {resultado:8.1f} µs/request')
+    return resultado
+
+
+def main():
+    from django.conf import settings
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    for cookies in (False, True):
+        sufixo = ' (com cookies)' if cookies else ''
+        antes = cenario('antes: sessão/CSRF + JWT/Session/Basic' + sufixo,
+                        MIDDLEWARE_ANTES, AUTENTICACAO_ANTES, args.requests, cookies)
+        depois = cenario('depois: apenas JWT em /api/' + sufixo,
+                         settings.MIDDLEWARE, settings.REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'],
+                         args.requests, cookies)
+        print(f'{"redução":<52} {antes - depois:8.1f} µs/request ({(1 - depois / antes) * 100:.0f}%)\n')
+
+
+if __name__ == '__main__':
+    main()